@@ -3,6 +3,9 @@ from flask_cors import CORS
 
 def create_app():
     app = Flask(__name__)
+    
+    from api.json_provider import make_json_provider
+    app.json = make_json_provider(app)
     CORS(app, origins=["http://localhost:3000", "http://localhost:5173"])
     
     from api.routes import register_routes
@@ -0,0 +1,397 @@
+"""
+All eight chatbot analytics computed from one read of the data.
+
+/api/analytics/all reads products joined with product_stats once
+(PRODUCT_ROWS_SQL), plus one grouped pass over reviews
+(LENGTH_GROUPS_SQL) when the review-length section is asked for, and
+derives each section here. Every section returns what its own
+/api/analytics/<section> route returns.
+
+Averages follow MySQL's DECIMAL division: the quotient of a value with
+s decimals gets s + 4 decimals, rounded half up. Ranking uses those
+rounded values, so ties break the same way as in SQL (avg DESC, count
+DESC, id). String tie-breaks compare case-insensitively like MySQL's
+default collation.
+"""
+
+import math
+from collections import OrderedDict
+from decimal import ROUND_HALF_UP, Context, Decimal
+from typing import Dict, List, Optional
+
+PRODUCT_ROWS_SQL = """
+    SELECT
+        p.product_id,
+        p.product_name,
+        p.category,
+        p.top_category,
+        p.price_range,
+        p.discount_range,
+        p.discounted_price_usd,
+        s.review_count,
+        s.rating_count,
+        s.rating_sum,
+        s.rating_sum_sq,
+        s.rating_min,
+        s.rating_max,
+        s.sentiment_count,
+        s.sentiment_sum,
+        s.paired_count,
+        s.paired_rating_sum,
+        s.paired_sentiment_sum
+    FROM products p
+    JOIN product_stats s ON p.product_id = s.product_id
+"""
+
+LENGTH_GROUPS_SQL = """
+    SELECT
+        CASE
+            WHEN review_length < 100 THEN 'Short (<100 chars)'
+            WHEN review_length < 500 THEN 'Medium (100-500 chars)'
+            WHEN review_length < 1000 THEN 'Long (500-1000 chars)'
+            ELSE 'Very Long (1000+ chars)'
+        END as length_category,
+        product_id,
+        SUM(rating) as rating_sum,
+        COUNT(review_id) as review_count,
+        SUM(sentiment_score) as sentiment_sum,
+        COUNT(sentiment_score) as sentiment_count,
+        SUM(review_length) as length_sum
+    FROM reviews
+    WHERE review_length IS NOT NULL AND rating IS NOT NULL
+    GROUP BY length_category, product_id
+"""
+
+PRICE_RANGES = ['$0-$50', '$50-$150', '$150-$300', '$300-$500', '$500+']
+DISCOUNT_RANGES = ['0-25% off', '25-50% off', '50-75% off', '75%+ off']
+LENGTH_CATEGORIES = [
+    'Short (<100 chars)', 'Medium (100-500 chars)', 'Long (500-1000 chars)', 'Very Long (1000+ chars)',
+]
+
+# Decimals of the summed columns (see product_stats in the schema)
+RATING_SCALE = 2
+SENTIMENT_SCALE = 3
+# MySQL's div_precision_increment
+DIV_PRECISION_INCREMENT = 4
+
+_context = Context(prec=60)
+
+
+def _dec(value) -> Decimal:
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    return Decimal(value)
+
+
+def mysql_div(numerator, denominator, scale: int) -> Optional[Decimal]:
+    """numerator / denominator as MySQL returns it for a DECIMAL with `scale` decimals; None for x / 0."""
+    if numerator is None or denominator is None or not denominator:
+        return None
+    quotient = _context.divide(_dec(numerator), _dec(denominator))
+    return quotient.quantize(Decimal(1).scaleb(-(scale + DIV_PRECISION_INCREMENT)), rounding=ROUND_HALF_UP)
+
+
+def _total(rows, field) -> Optional[Decimal]:
+    """SUM() over rows: None when every value is NULL."""
+    values = [_dec(row[field]) for row in rows if row[field] is not None]
+    return sum(values, Decimal(0)) if values else None
+
+
+def _float(value) -> float:
+    return float(value) if value else 0.0
+
+
+def _int(value) -> int:
+    return int(value) if value else 0
+
+
+def _desc_nulls_last(value):
+    # MySQL sorts NULL last in DESC order
+    return (value is None, -(value or 0))
+
+
+def _collate(text):
+    return text.casefold() if isinstance(text, str) else text
+
+
+def _bucketed(rows, bucket_field, bucket_of, summarize, avg_of, count_of, top_n):
+    """
+    Group rows into buckets and keep each bucket's top_n products by
+    (avg DESC, count DESC, product_id), like the windowed SQL does.
+    """
+    buckets = OrderedDict()
+    for row in rows:
+        buckets.setdefault(bucket_of(row), []).append(row)
+
+    results = []
+    for bucket, members in buckets.items():
+        ranked = sorted(
+            members,
+            key=lambda row: (*_desc_nulls_last(avg_of(row)), -_int(count_of(row)), _collate(row['product_id'])),
+        )
+        result = {bucket_field: bucket}
+        result.update(summarize(members))
+        result['top_products'] = [
+            {
+                'product_id': row['product_id'],
+                'product_name': row['product_name'],
+                'avg_rating': _float(avg_of(row)),
+                'review_count': _int(count_of(row)),
+            }
+            for row in ranked[:top_n]
+        ]
+        results.append((result, members))
+    return results
+
+
+def _in_order(results, bucket_field, order):
+    position = {bucket: i for i, bucket in enumerate(order)}
+    return sorted(results, key=lambda result: position.get(result[bucket_field], len(order)))
+
+
+def top_rated_by_category(products, top_n=5):
+    rows = [p for p in products if p['top_category'] is not None and _int(p['review_count']) >= 1]
+
+    def summarize(members):
+        avg = mysql_div(_total(members, 'rating_sum'), _total(members, 'rating_count'), RATING_SCALE)
+        return {
+            'avg_rating': _float(avg),
+            'review_count': _int(_total(members, 'review_count')),
+            'product_count': len(members),
+            '_sort': avg,
+        }
+
+    buckets = _bucketed(
+        rows, 'category', lambda p: p['top_category'], summarize,
+        lambda p: mysql_div(p['rating_sum'], p['rating_count'], RATING_SCALE),
+        lambda p: p['review_count'], top_n,
+    )
+    results = [result for result, _ in buckets]
+    results.sort(key=lambda r: (*_desc_nulls_last(r['_sort']), _collate(r['category'])))
+    for result in results:
+        del result['_sort']
+    return results
+
+
+def sentiment_by_price_range(products, top_n=5):
+    rows = [p for p in products if p['price_range'] is not None and _int(p['review_count']) >= 1]
+
+    def summarize(members):
+        return {
+            'avg_sentiment': _float(mysql_div(
+                _total(members, 'sentiment_sum'), _total(members, 'sentiment_count'), SENTIMENT_SCALE)),
+            'avg_rating': _float(mysql_div(
+                _total(members, 'paired_rating_sum'), _total(members, 'paired_count'), RATING_SCALE)),
+            'review_count': _int(_total(members, 'sentiment_count')),
+        }
+
+    buckets = _bucketed(
+        rows, 'price_range', lambda p: p['price_range'], summarize,
+        lambda p: mysql_div(p['rating_sum'], p['rating_count'], RATING_SCALE),
+        lambda p: p['review_count'], top_n,
+    )
+    # A range only appears if it has sentiment-scored reviews
+    results = [result for result, _ in buckets if result['review_count'] >= 1]
+    return _in_order(results, 'price_range', PRICE_RANGES)
+
+
+def best_value_products(products, limit=5):
+    rows = []
+    for p in products:
+        price = p['discounted_price_usd']
+        if price is None or _dec(price) <= 0 or _int(p['rating_count']) < 1:
+            continue
+        avg = mysql_div(p['rating_sum'], p['rating_count'], RATING_SCALE)
+        # avg / price is rounded to the scale of avg plus 4, like the SQL's value_score
+        value_score = mysql_div(avg, price, RATING_SCALE + DIV_PRECISION_INCREMENT) * 1000
+        rows.append((p, avg, value_score))
+    rows.sort(key=lambda item: (-item[2], -item[1]))
+    return [
+        {
+            'product_id': p['product_id'],
+            'product_name': p['product_name'],
+            'category': p['category'],
+            'discounted_price_usd': _float(p['discounted_price_usd']),
+            'avg_rating': _float(avg),
+            'review_count': _int(p['rating_count']),
+            'value_score': _float(value_score),
+        }
+        for p, avg, value_score in rows[:limit]
+    ]
+
+
+def review_length_rating(length_groups, products, top_n=5):
+    names = {p['product_id']: p['product_name'] for p in products}
+    rows = [
+        dict(group, product_name=names[group['product_id']])
+        for group in length_groups
+        if group['product_id'] in names
+    ]
+
+    def summarize(members):
+        review_count = _total(members, 'review_count')
+        return {
+            'avg_rating': _float(mysql_div(_total(members, 'rating_sum'), review_count, RATING_SCALE)),
+            'avg_sentiment': _float(mysql_div(
+                _total(members, 'sentiment_sum'), _total(members, 'sentiment_count'), SENTIMENT_SCALE)),
+            'avg_length': _float(mysql_div(_total(members, 'length_sum'), review_count, 0)),
+            'review_count': _int(review_count),
+        }
+
+    buckets = _bucketed(
+        rows, 'length_category', lambda g: g['length_category'], summarize,
+        lambda g: mysql_div(g['rating_sum'], g['review_count'], RATING_SCALE),
+        lambda g: g['review_count'], top_n,
+    )
+    return _in_order([result for result, _ in buckets], 'length_category', LENGTH_CATEGORIES)
+
+
+def sentiment_by_category(products, top_n=5):
+    rows = [p for p in products if p['top_category'] is not None and _int(p['sentiment_count']) >= 1]
+
+    def summarize(members):
+        avg_sentiment = mysql_div(
+            _total(members, 'sentiment_sum'), _total(members, 'sentiment_count'), SENTIMENT_SCALE)
+        return {
+            'avg_sentiment': _float(avg_sentiment),
+            'avg_rating': _float(mysql_div(
+                _total(members, 'paired_rating_sum'), _total(members, 'paired_count'), RATING_SCALE)),
+            'review_count': _int(_total(members, 'sentiment_count')),
+            'product_count': len(members),
+            '_sort': avg_sentiment,
+        }
+
+    buckets = _bucketed(
+        rows, 'category', lambda p: p['top_category'], summarize,
+        lambda p: mysql_div(p['paired_rating_sum'], p['paired_count'], RATING_SCALE),
+        lambda p: p['sentiment_count'], top_n,
+    )
+    results = [result for result, _ in buckets]
+    results.sort(key=lambda r: (*_desc_nulls_last(r['_sort']), _collate(r['category'])))
+    for result in results:
+        del result['_sort']
+    return results
+
+
+def discount_review_quality(products, top_n=5):
+    rows = [p for p in products if p['discount_range'] is not None and _int(p['rating_count']) >= 1]
+
+    def summarize(members):
+        return {
+            'avg_rating': _float(mysql_div(
+                _total(members, 'rating_sum'), _total(members, 'rating_count'), RATING_SCALE)),
+            'avg_sentiment': _float(mysql_div(
+                _total(members, 'paired_sentiment_sum'), _total(members, 'paired_count'), SENTIMENT_SCALE)),
+            'review_count': _int(_total(members, 'rating_count')),
+            'product_count': len(members),
+        }
+
+    buckets = _bucketed(
+        rows, 'discount_range', lambda p: p['discount_range'], summarize,
+        lambda p: mysql_div(p['rating_sum'], p['rating_count'], RATING_SCALE),
+        lambda p: p['rating_count'], top_n,
+    )
+    return _in_order([result for result, _ in buckets], 'discount_range', DISCOUNT_RANGES)
+
+
+def rating_variance(products, limit=20):
+    rows = []
+    for p in products:
+        n = _int(p['rating_count'])
+        if n < 1:
+            continue
+        total, total_sq = _dec(p['rating_sum']), _dec(p['rating_sum_sq'])
+        # Same exact DECIMAL variance as the SQL, then SQRT() in double
+        variance = mysql_div(n * total_sq - total * total, n * n, 2 * RATING_SCALE)
+        stddev = math.sqrt(max(float(variance), 0.0))
+        rows.append((p, mysql_div(total, n, RATING_SCALE), stddev))
+    rows.sort(key=lambda item: (item[2], -item[1]))
+    return [
+        {
+            'product_id': p['product_id'],
+            'product_name': p['product_name'],
+            'category': p['category'],
+            'avg_rating': _float(avg),
+            'rating_stddev': _float(stddev),
+            'review_count': _int(p['rating_count']),
+            'min_rating': _float(p['rating_min']),
+            'max_rating': _float(p['rating_max']),
+        }
+        for p, avg, stddev in rows[:limit]
+    ]
+
+
+def sentiment_rating_comparison(products, limit=30):
+    rows = []
+    for p in products:
+        n = _int(p['paired_count'])
+        if n < 1:
+            continue
+        avg_rating = mysql_div(p['paired_rating_sum'], n, RATING_SCALE)
+        avg_sentiment = mysql_div(p['paired_sentiment_sum'], n, SENTIMENT_SCALE)
+        scaled = avg_rating / 5
+        if avg_sentiment > scaled:
+            comparison = 'Sentiment Higher'
+        elif avg_sentiment < scaled * Decimal('0.8'):
+            comparison = 'Rating Higher'
+        else:
+            comparison = 'Aligned'
+        rows.append((p, avg_rating, avg_sentiment, comparison, abs(avg_sentiment - scaled)))
+    rows.sort(key=lambda item: -item[4])
+    return [
+        {
+            'product_id': p['product_id'],
+            'product_name': p['product_name'],
+            'category': p['category'],
+            'avg_rating': _float(avg_rating),
+            'avg_sentiment': _float(avg_sentiment),
+            'review_count': _int(p['paired_count']),
+            'comparison': comparison,
+        }
+        for p, avg_rating, avg_sentiment, comparison, _ in rows[:limit]
+    ]
+
+
+# Rows the flat (non-bucketed) sections return unless ?limit= says otherwise
+DEFAULT_LIMITS = {
+    'best-value-products': 5,
+    'rating-variance': 20,
+    'sentiment-rating-comparison': 30,
+}
+
+# Section name (the /api/analytics/<name> route it mirrors) ->
+# (compute(products, length_groups, top_n, limit), needs the reviews pass)
+SECTIONS: Dict[str, tuple] = OrderedDict([
+    ('top-rated-by-category', (lambda p, g, n, limit: top_rated_by_category(p, n), False)),
+    ('sentiment-by-price-range', (lambda p, g, n, limit: sentiment_by_price_range(p, n), False)),
+    ('best-value-products', (lambda p, g, n, limit: best_value_products(p, limit), False)),
+    ('review-length-rating', (lambda p, g, n, limit: review_length_rating(g, p, n), True)),
+    ('sentiment-by-category', (lambda p, g, n, limit: sentiment_by_category(p, n), False)),
+    ('discount-review-quality', (lambda p, g, n, limit: discount_review_quality(p, n), False)),
+    ('rating-variance', (lambda p, g, n, limit: rating_variance(p, limit), False)),
+    ('sentiment-rating-comparison', (lambda p, g, n, limit: sentiment_rating_comparison(p, limit), False)),
+])
+
+
+def compute_sections(sections: List[str], products, length_groups, top_n=5, limit=None) -> Dict[str, list]:
+    """`limit` (default DEFAULT_LIMITS) applies to the flat sections, `top_n` to the bucketed ones."""
+    return {
+        name: SECTIONS[name][0](products, length_groups, top_n, limit or DEFAULT_LIMITS.get(name))
+        for name in sections
+    }
+
+
+def needs_length_groups(sections: List[str]) -> bool:
+    return any(SECTIONS[name][1] for name in sections)
+
+
+def parse_sections(value: Optional[str]) -> List[str]:
+    """`a,b` from ?sections= (all sections when empty); raises ValueError on unknown names."""
+    if not value:
+        return list(SECTIONS)
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SECTIONS]
+    if unknown:
+        raise ValueError(f"Unknown sections: {', '.join(unknown)}")
+    return list(dict.fromkeys(names))
+
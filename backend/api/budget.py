@@ -0,0 +1,173 @@
+"""
+Time budgets for the analytics endpoints, with a stale fallback.
+
+Each analytics request gets a budget. It is enforced twice:
+    in MySQL   every pooled connection the request checks out runs its
+               SELECTs under SET SESSION MAX_EXECUTION_TIME set to what
+               is left of the budget (db.db_connection.statement_deadline),
+               so a slow query is stopped by the server instead of holding
+               the connection until it finishes
+    in Python  the data-version lookup and the view run on a worker thread
+               and the request stops waiting for them when the budget runs
+               out (run_within)
+
+When the budget runs out, ResponseCache answers with the last good
+response for the same path and query (StaleStore), marked with
+X-Cache: STALE and an Age header, and fills the cache in the background:
+with the timed-out view's own result once it finishes, or if that fails
+by running the view again with the larger ANALYTICS_REFRESH_BUDGET_MS.
+With nothing to fall back on the client gets a 503 with Retry-After, by
+which time the refresh has usually filled the cache.
+
+Streamed responses (?stream=) are not budgeted: their statement runs for
+as long as the client takes to read the rows, and they are never cached,
+so there is no stale copy to fall back on either.
+
+Settings (backend/db/.env):
+    ANALYTICS_BUDGET_MS=2000             # per request; 0 turns budgets off
+    ANALYTICS_BUDGETS=all=5000           # per-route overrides, by the last part
+                                         # of the path, comma-separated
+    ANALYTICS_REFRESH_BUDGET_MS=60000    # for background refreshes; 0 for none
+    ANALYTICS_BUDGET_WORKERS             # threads running budgeted views;
+                                         # default DB_POOL_SIZE, one per pooled
+                                         # connection
+    ANALYTICS_REFRESH_WORKERS=2          # threads running background refreshes
+    STALE_MAX_ENTRIES=256                # last good responses kept per worker
+    STALE_RETRY_AFTER=5                  # Retry-After (seconds) on a 503
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Callable, Dict, Optional, Tuple
+
+from api.profiling import sampled_thread
+from db.db_connection import POOL_SIZE, statement_deadline
+
+# MySQL's ER_QUERY_TIMEOUT: the statement ran past MAX_EXECUTION_TIME
+QUERY_TIMEOUT_ERRNO = 3024
+
+
+def parse_budgets(value: str) -> Dict[str, int]:
+    """'all=5000,rating-variance=3000' -> {route name: milliseconds}."""
+    budgets = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, sep, ms = item.partition("=")
+        if not sep or not ms.strip().isdigit():
+            raise ValueError(f"Unknown ANALYTICS_BUDGETS entry: {item}")
+        budgets[name.strip()] = int(ms)
+    return budgets
+
+
+ANALYTICS_BUDGET_MS = int(os.getenv("ANALYTICS_BUDGET_MS", 2000))
+ANALYTICS_BUDGETS = parse_budgets(os.getenv("ANALYTICS_BUDGETS", "all=5000"))
+ANALYTICS_REFRESH_BUDGET_MS = int(os.getenv("ANALYTICS_REFRESH_BUDGET_MS", 60000))
+ANALYTICS_BUDGET_WORKERS = int(os.getenv("ANALYTICS_BUDGET_WORKERS", POOL_SIZE))
+ANALYTICS_REFRESH_WORKERS = int(os.getenv("ANALYTICS_REFRESH_WORKERS", 2))
+STALE_MAX_ENTRIES = int(os.getenv("STALE_MAX_ENTRIES", 256))
+STALE_RETRY_AFTER = int(os.getenv("STALE_RETRY_AFTER", 5))
+
+_executor = ThreadPoolExecutor(max_workers=ANALYTICS_BUDGET_WORKERS, thread_name_prefix="analytics-budget")
+# Separate, so slow refreshes never hold up the requests' own views
+_refresh_executor = ThreadPoolExecutor(max_workers=ANALYTICS_REFRESH_WORKERS, thread_name_prefix="analytics-refresh")
+
+
+class BudgetExceeded(Exception):
+    """
+    The request's time budget ran out before its response was ready.
+    `running` is the future of the work still going on its budget
+    thread, or None if it never started.
+    """
+
+    def __init__(self, message: str, running: Optional[Future] = None):
+        super().__init__(message)
+        self.running = running
+
+
+def budget_for(path: str) -> Optional[float]:
+    """Seconds allowed for an analytics path, or None when it has no budget."""
+    ms = ANALYTICS_BUDGETS.get(path.rstrip("/").rsplit("/", 1)[-1], ANALYTICS_BUDGET_MS)
+    return ms / 1000 if ms > 0 else None
+
+
+def is_timeout(exc: BaseException) -> bool:
+    """True for a budget that ran out, in Python or in MySQL."""
+    return isinstance(exc, BudgetExceeded) or getattr(exc, "errno", None) == QUERY_TIMEOUT_ERRNO
+
+
+def run_within(seconds: float, fn: Callable[[], object]):
+    """
+    fn() with its statements capped at `seconds`, waiting at most that
+    long for it. Raises BudgetExceeded when it runs over; fn itself
+    carries on (MySQL stops its query soon after), and the exception's
+    `running` future gets its result.
+    """
+
+    if seconds <= 0:
+        raise BudgetExceeded("the budget ran out before it started")
+    submitted = time.monotonic()
+
+    def run():
+        # Time spent queued for a thread counts against the budget too
+        left = seconds - (time.monotonic() - submitted)
+        if left <= 0:
+            raise BudgetExceeded("no thread free within the budget")
+        with statement_deadline(left), sampled_thread():
+            return fn()
+
+    # A copy of the request's context, so the view still sees the request
+    future = _executor.submit(contextvars.copy_context().run, run)
+    try:
+        return future.result(timeout=seconds)
+    except FutureTimeout:
+        raise BudgetExceeded(f"no response within {seconds * 1000:.0f} ms", future) from None
+
+
+def run_in_background(fn: Callable[[], object]) -> None:
+    """fn() on a refresh thread with the refresh budget, in a copy of the current context."""
+
+    def run():
+        if ANALYTICS_REFRESH_BUDGET_MS <= 0:
+            return fn()
+        with statement_deadline(ANALYTICS_REFRESH_BUDGET_MS / 1000):
+            return fn()
+
+    _refresh_executor.submit(contextvars.copy_context().run, run)
+
+
+# (body, mimetype, when it was computed as a time.time())
+StaleEntry = Tuple[bytes, str, float]
+
+
+class StaleStore:
+    """
+    The last good response per path and query, whatever data version it
+    was computed from. Kept in process: it has to be there exactly when
+    the database (or Redis behind it) is struggling.
+    """
+
+    def __init__(self, max_entries: int = STALE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[StaleEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, body: bytes, mimetype: str) -> None:
+        with self._lock:
+            self._entries[key] = (body, mimetype, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,443 @@
+"""
+Response cache for the analytics endpoints.
+
+Analytics responses only change when the ETL loads new data, so they are
+cached under a key made of the data-version stamp, the path and the
+query string. When the ETL bumps the version, old entries stop being
+reachable and the in-process cache is cleared.
+
+The ETag is derived from the same key, so a client that sends it back in
+If-None-Match gets a 304 without the response being recomputed or even
+looked up.
+
+Identical requests that miss the cache at the same time are computed
+once and share the body (api/coalesce.py; X-Cache: COALESCED).
+
+Misses are computed within a time budget (api/budget.py). When it runs
+out, or the view fails, the last good response for the same path and
+query is sent instead, whatever data version it came from (X-Cache:
+STALE, with an Age header), and timed-out ones are recomputed in the
+background.
+
+Settings (backend/db/.env):
+    CACHE_BACKEND=memory           # memory, redis or none
+    CACHE_MAX_ENTRIES=256          # memory backend only
+    CACHE_TTL=3600                 # seconds an entry may live
+    CACHE_REDIS_URL=redis://localhost:6379/0
+    DATA_VERSION_CHECK_INTERVAL=2  # seconds between data-version lookups
+"""
+
+import functools
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+from flask import current_app, jsonify, make_response, request
+
+from api.budget import (STALE_RETRY_AFTER, BudgetExceeded, StaleStore, budget_for, is_timeout, run_in_background,
+                        run_within)
+from api.coalesce import SingleFlight, is_shareable
+
+# (body, mimetype)
+CacheEntry = Tuple[bytes, str]
+
+
+class LRUCache:
+    """In-process LRU cache with a per-entry time to live."""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: CacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    """
+    Cache shared by every worker through Redis.
+
+    Needs the optional `redis` package (pip install redis).
+    """
+
+    def __init__(self, url: str, ttl: float = 3600, prefix: str = "analytics:"):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        values = self._client.hmget(self.prefix + key, "body", "mimetype")
+        if values[0] is None:
+            return None
+        return values[0], values[1].decode()
+
+    def set(self, key: str, value: CacheEntry) -> None:
+        body, mimetype = value
+        pipe = self._client.pipeline()
+        pipe.hset(self.prefix + key, mapping={"body": body, "mimetype": mimetype})
+        pipe.expire(self.prefix + key, int(self.ttl))
+        pipe.execute()
+
+    def clear(self) -> None:
+        # Keys embed the data version, so stale entries are never read
+        # again and expire on their own
+        pass
+
+
+class NullCache:
+    def get(self, key: str) -> Optional[CacheEntry]:
+        return None
+
+    def set(self, key: str, value: CacheEntry) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+def make_cache_backend():
+    backend = os.getenv("CACHE_BACKEND", "memory")
+    ttl = float(os.getenv("CACHE_TTL", 3600))
+    if backend == "memory":
+        return LRUCache(int(os.getenv("CACHE_MAX_ENTRIES", 256)), ttl)
+    if backend == "redis":
+        return RedisCache(os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"), ttl)
+    if backend == "none":
+        return NullCache()
+    raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+
+
+class DataVersion:
+    """
+    Latest data-version stamp, re-read at most every `check_interval`
+    seconds. Callbacks registered with on_change() run when it moves.
+    While one thread re-reads it the others get the last version seen
+    rather than queue behind a lookup that may be stuck.
+    """
+
+    def __init__(self, loader: Callable[[], int], check_interval: float):
+        self._loader = loader
+        self.check_interval = check_interval
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[int], None]] = []
+
+    @property
+    def last_seen(self) -> Optional[int]:
+        return self._version
+
+    @property
+    def due(self) -> bool:
+        """Whether current() would look the version up."""
+        return self._version is None or time.monotonic() - self._checked_at >= self.check_interval
+
+    def on_change(self, callback: Callable[[int], None]) -> None:
+        self._listeners.append(callback)
+
+    def current(self) -> int:
+        if not self.due:
+            return self._version
+        if not self._lock.acquire(blocking=self._version is None):
+            return self._version
+        try:
+            if not self.due:
+                return self._version
+            version = self._loader()
+            changed = self._version is not None and version != self._version
+            self._version = version
+            self._checked_at = time.monotonic()
+        finally:
+            self._lock.release()
+        if changed:
+            for callback in self._listeners:
+                callback(version)
+        return version
+
+
+class ResponseCache:
+    def __init__(self, backend, data_version: DataVersion, cross_worker_flight=None,
+                 stale: Optional[StaleStore] = None):
+        self.backend = backend
+        self.data_version = data_version
+        data_version.on_change(lambda version: backend.clear())
+        self._flight = SingleFlight()
+        self._cross_worker_flight = cross_worker_flight
+        # Outlives data-version changes on purpose
+        self.stale = stale if stale is not None else StaleStore()
+        self._refreshing = set()
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        # Misses answered by another request's computation, in this
+        # worker or in another one
+        self.coalesced = 0
+        self.coalesced_across_workers = 0
+        # Misses that ran out of budget (in Python or in MySQL), what was
+        # sent instead, and the background recomputations that followed
+        self.budget_timeouts = 0
+        self.stale_served = 0
+        self.unavailable = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": type(self.backend).__name__,
+                "data_version": self.data_version.last_seen,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "coalesced": self.coalesced,
+                "coalesced_across_workers": self.coalesced_across_workers,
+                "coalesce_rate": round(
+                    (self.coalesced + self.coalesced_across_workers) / self.misses, 4
+                ) if self.misses else 0.0,
+                "cross_worker_flight": type(self._cross_worker_flight).__name__
+                if self._cross_worker_flight else None,
+                "budget_timeouts": self.budget_timeouts,
+                "stale_served": self.stale_served,
+                "stale_entries": len(self.stale),
+                "unavailable": self.unavailable,
+                "refreshes": self.refreshes,
+                "refresh_failures": self.refresh_failures,
+            }
+
+    @staticmethod
+    def _key(version: int) -> str:
+        query = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+        return f"{version}:{request.path}?{query}"
+
+    @staticmethod
+    def _stale_key(key: str) -> str:
+        # The key without its data version
+        return key.split(":", 1)[1]
+
+    @staticmethod
+    def _response(payload):
+        body, mimetype, status, headers = payload
+        return current_app.response_class(body, status=status, mimetype=mimetype, headers=headers)
+
+    def _store(self, key: str, body: bytes, mimetype: str) -> None:
+        self.backend.set(key, (body, mimetype))
+        self.stale.set(self._stale_key(key), body, mimetype)
+
+    def _version(self, deadline: Optional[float]) -> int:
+        """The data version, not waiting past `deadline` (a time.monotonic()) to look it up."""
+        if deadline is None or not self.data_version.due:
+            return self.data_version.current()
+        return run_within(deadline - time.monotonic(), self.data_version.current)
+
+    def _compute(self, key: str, view, args, kwargs, deadline: Optional[float]):
+        """
+        Run the view, by `deadline` if there is one; returns (payload others
+        can be sent, or None, and the response).
+        """
+        try:
+            if deadline is None:
+                response = make_response(view(*args, **kwargs))
+            else:
+                response = run_within(deadline - time.monotonic(),
+                                      lambda: make_response(view(*args, **kwargs)))
+        except BudgetExceeded as exc:
+            self._count("budget_timeouts")
+            return self._fallback(key, view, args, kwargs, refresh=True, running=exc.running)
+        # Streamed bodies are never held in memory, so never shared or stored
+        if response.is_streamed:
+            return None, response
+        if response.status_code >= 500:
+            # 504: MySQL stopped a query that ran past the budget
+            timed_out = response.status_code == 504
+            if timed_out:
+                self._count("budget_timeouts")
+            return self._fallback(key, view, args, kwargs, refresh=timed_out, failed=response)
+        body = response.get_data()
+        if response.status_code == 200:
+            self._store(key, body, response.mimetype)
+        return (body, response.mimetype, response.status_code, {}), response
+
+    def _fallback(self, key: str, view, args, kwargs, refresh: bool, failed=None, running=None):
+        """
+        What to send for a miss that timed out or failed: the last good
+        response, else the view's own error, else a 503. With `refresh`
+        the cache is filled in the background (see _refresh_later).
+        """
+        if refresh:
+            self._refresh_later(key, view, args, kwargs, running)
+        entry = self.stale.get(self._stale_key(key))
+        if entry is not None:
+            body, mimetype, computed_at = entry
+            headers = {"X-Cache": "STALE", "Age": str(max(0, int(time.time() - computed_at)))}
+            payload = (body, mimetype, 200, headers)
+        elif failed is not None:
+            payload = (failed.get_data(), failed.mimetype, failed.status_code, {})
+        else:
+            self._count("unavailable")
+            body = jsonify({
+                'error': 'Analytics are taking longer than usual; try again shortly',
+                'retry_after': STALE_RETRY_AFTER,
+            }).get_data()
+            payload = (body, "application/json", 503, {"Retry-After": str(STALE_RETRY_AFTER)})
+        return payload, self._response(payload)
+
+    def _refresh_later(self, key: str, view, args, kwargs, running=None) -> None:
+        """
+        Recompute a timed-out key in the background, once at a time per
+        key. When the view that timed out is still `running` (a future),
+        its result is waited for and stored instead; the view is only run
+        again if that fails, so the slow query never runs twice at once.
+        """
+        stale_key = self._stale_key(key)
+        with self._lock:
+            if stale_key in self._refreshing:
+                return
+            self._refreshing.add(stale_key)
+            self.refreshes += 1
+
+        def refresh():
+            try:
+                response = None
+                if running is not None:
+                    try:
+                        response = running.result()
+                    except Exception:
+                        # E.g. MySQL stopped its query at the request's
+                        # budget; run it again with the refresh budget
+                        pass
+                if response is None or response.status_code != 200:
+                    response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self._store(key, response.get_data(), response.mimetype)
+                else:
+                    self._count("refresh_failures")
+            except Exception:
+                self._count("refresh_failures")
+                current_app.logger.exception("Background refresh of %s failed", stale_key)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(stale_key)
+
+        run_in_background(refresh)
+
+    def _coalesced(self, key: str, view, args, kwargs, deadline: Optional[float]):
+        """
+        The response for a cache miss, computed once for all the requests
+        that miss on `key` at the same time.
+        """
+
+        def compute():
+            if self._cross_worker_flight is None:
+                return self._compute(key, view, args, kwargs, deadline)
+            (payload, response), computed = self._cross_worker_flight.do(
+                key, lambda: self._compute(key, view, args, kwargs, deadline)
+            )
+            if not computed:
+                self._count("coalesced_across_workers")
+                if is_shareable(payload):
+                    # Keep it for this worker's later requests too
+                    self._store(key, payload[0], payload[1])
+            return payload, response
+
+        (payload, response), leader = self._flight.do(key, compute)
+        if leader and response is not None:
+            return response, "MISS"
+        if payload is None:
+            # The other request streamed its body; compute our own
+            return make_response(view(*args, **kwargs)), "MISS"
+        if not leader:
+            self._count("coalesced")
+        return self._response(payload), "COALESCED"
+
+    def _unversioned(self, response):
+        """A stale copy or an error, sent without an ETag."""
+        if response.headers.get("X-Cache") == "STALE":
+            self._count("stale_served")
+            # The ETag names the current data, which this isn't
+            response.headers["Cache-Control"] = "no-store"
+        return response
+
+    def cached(self, view):
+        """Decorator for GET views whose output depends only on the data and query args."""
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            # Streams run for as long as the client reads, so have no budget;
+            # other requests spend theirs on the version lookup and the view
+            budget = None if request.args.get("stream") else budget_for(request.path)
+            deadline = None if budget is None else time.monotonic() + budget
+            try:
+                version = self._version(deadline)
+            except Exception as exc:
+                if is_timeout(exc):
+                    self._count("budget_timeouts")
+                # Go on with the version seen last: at worst one ETL run behind
+                version = self.data_version.last_seen
+                if version is None:
+                    if deadline is None:
+                        # Can't tell whether a cached copy is current; skip the cache
+                        return view(*args, **kwargs)
+                    _, response = self._fallback(self._key(version), view, args, kwargs, refresh=False)
+                    return self._unversioned(response)
+
+            key = self._key(version)
+            etag = f"{version}-{hashlib.sha1(key.encode()).hexdigest()[:16]}"
+
+            if request.if_none_match.contains(etag):
+                self._count("not_modified")
+                response = current_app.response_class(status=304)
+            else:
+                entry = self.backend.get(key)
+                if entry is None:
+                    self._count("misses")
+                    response, outcome = self._coalesced(key, view, args, kwargs, deadline)
+                    if response.status_code != 200 or response.is_streamed:
+                        return response
+                    if response.headers.get("X-Cache") == "STALE":
+                        return self._unversioned(response)
+                    response.headers["X-Cache"] = outcome
+                else:
+                    self._count("hits")
+                    body, mimetype = entry
+                    response = current_app.response_class(body, status=200, mimetype=mimetype)
+                    response.headers["X-Cache"] = "HIT"
+
+            response.set_etag(etag)
+            # Let browsers keep the body but revalidate it on every use
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+
+        return wrapper
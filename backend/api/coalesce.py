@@ -0,0 +1,240 @@
+"""
+Coalesce identical concurrent requests into one computation.
+
+When many clients ask the same analytics question at once, every one
+of them misses the response cache and runs the same heavy query.
+ResponseCache runs cache misses through a single flight instead: the
+first request for a key computes the response and the others with the
+same key wait for it and are sent the same body.
+
+Inside a worker this is always on (SingleFlight). Across the workers of
+a gunicorn server it is optional:
+    file   workers take an flock() on a file per key in COALESCE_DIR; the
+           first computes and leaves the body next to the lock, and the
+           others read it from there (one machine only)
+    redis  workers take a Redis lock per key and the others wait for the
+           body to appear in the Redis response cache (needs
+           CACHE_BACKEND=redis)
+
+Settings (backend/db/.env):
+    COALESCE_ACROSS_WORKERS=none  # none, file or redis
+    COALESCE_DIR=<tmp>/analytics-coalesce
+    COALESCE_WAIT=30              # seconds to wait for another computation
+                                  # before computing anyway
+    COALESCE_RESULT_TTL=5         # seconds a file result may be reused
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional, Tuple
+
+COALESCE_ACROSS_WORKERS = os.getenv("COALESCE_ACROSS_WORKERS", "none")
+COALESCE_DIR = os.getenv("COALESCE_DIR", os.path.join(tempfile.gettempdir(), "analytics-coalesce"))
+COALESCE_WAIT = float(os.getenv("COALESCE_WAIT", 30))
+COALESCE_RESULT_TTL = float(os.getenv("COALESCE_RESULT_TTL", 5))
+
+# Seconds between checks while waiting on another worker
+POLL_INTERVAL = 0.02
+
+# (body, mimetype, status, extra headers): what followers are sent
+Payload = Tuple[bytes, str, int, Dict[str, str]]
+# compute() returns the payload (None when it can't be shared, e.g. a
+# streamed body) and the response the computing request sends
+Computed = Tuple[Optional[Payload], object]
+
+
+def is_shareable(payload: Payload) -> bool:
+    """
+    Whether other workers may be sent `payload`: a fresh 200. Errors,
+    503s and stale copies are not passed on; whoever waited computes its
+    own response instead.
+    """
+    return payload[2] == 200 and not payload[3]
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Computed] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Per-process single flight: one thread computes each key, and the
+    threads asking for it meanwhile share the result (or the exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: str, compute: Callable[[], Computed]) -> Tuple[Computed, bool]:
+        """(result, True) in the thread that computed it, (result, False) in the ones that waited."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+
+        try:
+            call.result = compute()
+            return call.result, True
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class FileFlight:
+    """
+    Single flight across the processes of one machine, through lock and
+    result files. Only shareable responses (is_shareable) are left in a
+    result file; after any other the next worker to take the lock
+    computes for itself.
+    """
+
+    def __init__(self, directory: str = COALESCE_DIR, wait: float = COALESCE_WAIT,
+                 result_ttl: float = COALESCE_RESULT_TTL):
+        try:
+            import fcntl
+        except ImportError as exc:
+            raise RuntimeError("COALESCE_ACROSS_WORKERS=file needs fcntl (Linux or macOS)") from exc
+        self._fcntl = fcntl
+        self.directory = directory
+        self.wait = wait
+        self.result_ttl = result_ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key: str):
+        name = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.directory, name + ".lock"), os.path.join(self.directory, name + ".result")
+
+    def _read(self, path: str) -> Optional[Payload]:
+        try:
+            if time.time() - os.path.getmtime(path) > self.result_ttl:
+                return None
+            with open(path, "rb") as f:
+                header, body = f.read().split(b"\n", 1)
+            meta = json.loads(header)
+        except (OSError, ValueError):
+            return None
+        return body, meta["mimetype"], meta["status"], meta["headers"]
+
+    def _write(self, path: str, payload: Payload) -> None:
+        body, mimetype, status, headers = payload
+        header = json.dumps({"status": status, "mimetype": mimetype, "headers": headers})
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(header.encode() + b"\n" + body)
+        os.replace(tmp, path)
+        self._purge()
+
+    def _purge(self) -> None:
+        """
+        Remove files too old to matter; most keys are never asked for
+        again once the data version moves on. Lock files are only removed
+        while nobody holds them (at worst a key is computed twice).
+        """
+        cutoff = time.time() - max(self.result_ttl, self.wait) * 2
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                if not name.endswith(".lock"):
+                    os.remove(path)
+                    continue
+                with open(path, "a") as lock_file:
+                    self._fcntl.flock(lock_file, self._fcntl.LOCK_EX | self._fcntl.LOCK_NB)
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def do(self, key: str, compute: Callable[[], Computed]) -> Tuple[Computed, bool]:
+        lock_path, result_path = self._paths(key)
+        with open(lock_path, "a") as lock_file:
+            deadline = time.monotonic() + self.wait
+            while True:
+                try:
+                    self._fcntl.flock(lock_file, self._fcntl.LOCK_EX | self._fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() > deadline:
+                        # The other worker is taking too long; don't wait on it
+                        return compute(), True
+                    time.sleep(POLL_INTERVAL)
+            try:
+                # Whoever held the lock may have left the result behind
+                payload = self._read(result_path)
+                if payload is not None:
+                    return (payload, None), False
+                result = compute()
+                if result[0] is not None and is_shareable(result[0]):
+                    self._write(result_path, result[0])
+                return result, True
+            finally:
+                self._fcntl.flock(lock_file, self._fcntl.LOCK_UN)
+
+
+class RedisFlight:
+    """
+    Single flight across workers through a Redis lock. Waiters are sent
+    what the holder stored in the Redis response cache, which is only ever
+    a shareable response (is_shareable): never an error, a 503 or a stale
+    copy. When the holder gives up the lock without storing one, the next
+    waiter to take the lock computes for itself.
+    """
+
+    def __init__(self, cache, wait: float = COALESCE_WAIT):
+        self.cache = cache
+        self.wait = wait
+
+    def do(self, key: str, compute: Callable[[], Computed]) -> Tuple[Computed, bool]:
+        client = self.cache._client
+        lock_key = f"{self.cache.prefix}lock:{key}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait
+        while not client.set(lock_key, token, nx=True, px=int(self.wait * 1000)):
+            entry = self.cache.get(key)
+            if entry is not None:
+                body, mimetype = entry
+                return ((body, mimetype, 200, {}), None), False
+            if time.monotonic() > deadline:
+                return compute(), True
+            time.sleep(POLL_INTERVAL)
+        try:
+            return compute(), True
+        finally:
+            # Only release the lock if it is still ours
+            if client.get(lock_key) == token.encode():
+                client.delete(lock_key)
+
+
+def make_cross_worker_flight(backend):
+    """The COALESCE_ACROSS_WORKERS flight for a cache backend, or None."""
+    if COALESCE_ACROSS_WORKERS == "none":
+        return None
+    if COALESCE_ACROSS_WORKERS == "file":
+        return FileFlight()
+    if COALESCE_ACROSS_WORKERS == "redis":
+        from api.cache import RedisCache
+
+        if not isinstance(backend, RedisCache):
+            raise ValueError("COALESCE_ACROSS_WORKERS=redis needs CACHE_BACKEND=redis")
+        return RedisFlight(backend)
+    raise ValueError(f"Unknown COALESCE_ACROSS_WORKERS: {COALESCE_ACROSS_WORKERS}")
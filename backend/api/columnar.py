@@ -0,0 +1,226 @@
+"""
+In-memory columnar engine for the analytics routes.
+
+With ANALYTICS_ENGINE=columnar each worker loads reviews (product,
+rating, sentiment, length) and products into NumPy arrays once, with
+products integer-coded by position, and aggregates them with bincount
+instead of asking MySQL. The per-product rollups and the (length
+bucket, product) groups feed the same section code as /api/analytics/all
+(api/analytics.py), so responses are the same JSON as the SQL path's.
+test_analytics.py checks that for every section on fixture rows, and
+benchmarks/bench_columnar.py on a loaded database. The arrays are
+reloaded when the ETL's data version changes.
+
+Ratings and sentiment scores are loaded as integers scaled by their
+DECIMAL scale (x100, x1000), so all sums are exact.
+
+Needs the optional `numpy` package (pip install numpy).
+"""
+
+import threading
+import time
+from decimal import Decimal
+from typing import Callable, List, Optional
+
+from api.analytics import LENGTH_CATEGORIES, RATING_SCALE, SENTIMENT_SCALE, compute_sections
+
+PRODUCTS_SQL = """
+    SELECT product_id, product_name, category, top_category,
+        price_range, discount_range, discounted_price_usd
+    FROM products
+"""
+
+# Scaled to integers in SQL, so no Decimal objects are built per review
+REVIEWS_SQL = """
+    SELECT
+        product_id,
+        CAST(rating * 100 AS SIGNED),
+        CAST(sentiment_score * 1000 AS SIGNED),
+        review_length
+    FROM reviews
+"""
+
+FETCH_SIZE = 10_000
+
+# review_length < 100, < 500, < 1000, else (see LENGTH_GROUPS_SQL)
+LENGTH_BOUNDS = (100, 500, 1000)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as exc:
+        raise RuntimeError("ANALYTICS_ENGINE=columnar needs numpy (pip install numpy)") from exc
+    return numpy
+
+
+def _scaled(value, scale: int) -> Decimal:
+    return Decimal(int(value)).scaleb(-scale)
+
+
+class ColumnarEngine:
+    """
+    Review columns for one data version, reduced to the per-product rows
+    (products + product_stats) and length groups api/analytics.py reads.
+    """
+
+    def __init__(self, products: List[dict], product_ids, ratings, sentiments, lengths):
+        np = _numpy()
+        self.loaded_at = time.time()
+        self.version = None
+        self.review_count = len(product_ids)
+        n = len(products)
+
+        has_rating = ~np.isnan(ratings)
+        has_sentiment = ~np.isnan(sentiments)
+        paired = has_rating & has_sentiment
+        ratings = np.where(has_rating, ratings, 0.0)
+        sentiments = np.where(has_sentiment, sentiments, 0.0)
+
+        def per_product(mask=None, weights=None, codes=product_ids, length=n):
+            if mask is not None:
+                codes = codes[mask]
+                weights = None if weights is None else weights[mask]
+            return np.bincount(codes, weights=weights, minlength=length)
+
+        review_count = per_product()
+        rating_count = per_product(has_rating)
+        rating_sum = per_product(has_rating, ratings)
+        rating_sum_sq = per_product(has_rating, ratings * ratings)
+        rating_min = np.full(n, np.inf)
+        rating_max = np.full(n, -np.inf)
+        np.minimum.at(rating_min, product_ids[has_rating], ratings[has_rating])
+        np.maximum.at(rating_max, product_ids[has_rating], ratings[has_rating])
+        sentiment_count = per_product(has_sentiment)
+        sentiment_sum = per_product(has_sentiment, sentiments)
+        paired_count = per_product(paired)
+        paired_rating_sum = per_product(paired, ratings)
+        paired_sentiment_sum = per_product(paired, sentiments)
+
+        # product_stats only has rows for products with reviews
+        self.products = []
+        for i in np.flatnonzero(review_count):
+            has_ratings = rating_count[i] > 0
+            self.products.append(dict(
+                products[i],
+                review_count=int(review_count[i]),
+                rating_count=int(rating_count[i]),
+                rating_sum=_scaled(rating_sum[i], RATING_SCALE),
+                rating_sum_sq=_scaled(rating_sum_sq[i], 2 * RATING_SCALE),
+                rating_min=_scaled(rating_min[i], RATING_SCALE) if has_ratings else None,
+                rating_max=_scaled(rating_max[i], RATING_SCALE) if has_ratings else None,
+                sentiment_count=int(sentiment_count[i]),
+                sentiment_sum=_scaled(sentiment_sum[i], SENTIMENT_SCALE),
+                paired_count=int(paired_count[i]),
+                paired_rating_sum=_scaled(paired_rating_sum[i], RATING_SCALE),
+                paired_sentiment_sum=_scaled(paired_sentiment_sum[i], SENTIMENT_SCALE),
+            ))
+
+        # (length bucket, product) groups over rated reviews with a length
+        has_length = ~np.isnan(lengths) & has_rating
+        buckets = np.searchsorted(LENGTH_BOUNDS, lengths[has_length], side="right")
+        groups = buckets * n + product_ids[has_length]
+        size = len(LENGTH_CATEGORIES) * n
+        group_sentiment = has_sentiment[has_length]
+
+        def per_group(mask=None, weights=None):
+            return per_product(mask, weights, codes=groups, length=size)
+
+        group_count = per_group()
+        group_rating_sum = per_group(None, ratings[has_length])
+        group_sentiment_count = per_group(group_sentiment)
+        group_sentiment_sum = per_group(group_sentiment, sentiments[has_length])
+        group_length_sum = per_group(None, lengths[has_length])
+
+        self.length_groups = []
+        for g in np.flatnonzero(group_count):
+            bucket, i = divmod(int(g), n)
+            self.length_groups.append({
+                'length_category': LENGTH_CATEGORIES[bucket],
+                'product_id': products[i]['product_id'],
+                'rating_sum': _scaled(group_rating_sum[g], RATING_SCALE),
+                'review_count': int(group_count[g]),
+                # SUM() of only NULLs is NULL
+                'sentiment_sum': (_scaled(group_sentiment_sum[g], SENTIMENT_SCALE)
+                                  if group_sentiment_count[g] else None),
+                'sentiment_count': int(group_sentiment_count[g]),
+                'length_sum': int(group_length_sum[g]),
+            })
+
+        self.nbytes = sum(a.nbytes for a in (product_ids, ratings, sentiments, lengths))
+
+    def compute(self, sections: List[str], top_n: int = 5, limit: Optional[int] = None) -> dict:
+        return compute_sections(sections, self.products, self.length_groups, top_n, limit)
+
+
+def load_columnar(cursor) -> ColumnarEngine:
+    """Read products and reviews with a tuple cursor and build the engine."""
+    np = _numpy()
+    cursor.execute(PRODUCTS_SQL)
+    columns = [d[0] for d in cursor.description]
+    products = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    codes = {product['product_id']: i for i, product in enumerate(products)}
+
+    chunks = []
+    cursor.execute(REVIEWS_SQL)
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        product_ids, ratings, sentiments, lengths = zip(*rows)
+        chunks.append((
+            # Reviews of unknown products are dropped, as the SQL joins drop them
+            np.fromiter((codes.get(p, -1) for p in product_ids), dtype=np.int64, count=len(rows)),
+            # None becomes NaN (NULL)
+            np.array(ratings, dtype=np.float64),
+            np.array(sentiments, dtype=np.float64),
+            np.array(lengths, dtype=np.float64),
+        ))
+
+    if chunks:
+        product_ids, ratings, sentiments, lengths = (np.concatenate(c) for c in zip(*chunks))
+    else:
+        product_ids = np.zeros(0, dtype=np.int64)
+        ratings = sentiments = lengths = np.zeros(0, dtype=np.float64)
+    known = product_ids >= 0
+    return ColumnarEngine(products, product_ids[known], ratings[known], sentiments[known], lengths[known])
+
+
+class ColumnarHolder:
+    """
+    One engine per process, rebuilt when the data version moves.
+
+    The rebuild happens on the request that notices the new version, so a
+    response cached under that version never comes from older arrays.
+    """
+
+    def __init__(self, loader: Callable[[], ColumnarEngine], version: Callable[[], object]):
+        self._loader = loader
+        self._version = version
+        self._engine: Optional[ColumnarEngine] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> ColumnarEngine:
+        version = self._version()
+        engine = self._engine
+        if engine is not None and engine.version == version:
+            return engine
+        with self._lock:
+            if self._engine is None or self._engine.version != version:
+                engine = self._loader()
+                engine.version = version
+                self._engine = engine
+            return self._engine
+
+    def stats(self) -> dict:
+        engine = self._engine
+        if engine is None:
+            return {'loaded': False}
+        return {
+            'loaded': True,
+            'version': engine.version,
+            'loaded_at': engine.loaded_at,
+            'reviews': engine.review_count,
+            'products': len(engine.products),
+            'array_bytes': engine.nbytes,
+        }
@@ -0,0 +1,75 @@
+"""
+Run a request's independent queries concurrently on pooled connections.
+
+Each task gets its own cursor (and so its own pooled connection). The
+first task runs on the request thread; the rest go to a small shared
+thread pool, so a request takes about as long as its slowest query
+instead of the sum of them.
+
+Two caps keep one request from starving the connection pool:
+    QUERY_FANOUT_WORKERS       # threads (and so extra connections) shared by
+                               # all requests in this process;
+                               # default DB_POOL_SIZE // 2
+    QUERY_FANOUT_PER_REQUEST=4 # queries one request runs at the same time
+"""
+
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from api.profiling import sampled_thread
+from db.db_connection import POOL_SIZE
+
+QUERY_FANOUT_WORKERS = int(os.getenv("QUERY_FANOUT_WORKERS", max(1, POOL_SIZE // 2)))
+QUERY_FANOUT_PER_REQUEST = int(os.getenv("QUERY_FANOUT_PER_REQUEST", 4))
+
+_executor = ThreadPoolExecutor(max_workers=QUERY_FANOUT_WORKERS, thread_name_prefix="query-fanout")
+
+
+def run_concurrently(
+    tasks: Dict[str, Callable[[Any], Any]],
+    cursor_factory: Callable,
+    limit: int = QUERY_FANOUT_PER_REQUEST,
+) -> Dict[str, Any]:
+    """
+    Run each task(cursor) on its own cursor and return {name: result}.
+
+    The first exception raised by a task is re-raised once every task
+    has finished, so no connection is still in use when the caller
+    handles it.
+    """
+    names = list(tasks)
+    if limit <= 1 or len(names) == 1:
+        results = {}
+        for name in names:
+            with cursor_factory() as cursor:
+                results[name] = tasks[name](cursor)
+        return results
+
+    # At most `limit` of this request's queries hold a connection at once,
+    # counting the one on the request thread
+    slots = threading.BoundedSemaphore(limit)
+
+    def run(name):
+        with slots, sampled_thread():
+            with cursor_factory() as cursor:
+                return tasks[name](cursor)
+
+    # Run in copies of the request's context, so its metrics and profile
+    # see these queries
+    futures = {name: _executor.submit(contextvars.copy_context().run, run, name) for name in names[1:]}
+    results, error = {}, None
+    try:
+        results[names[0]] = run(names[0])
+    except Exception as exc:
+        error = exc
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as exc:
+            error = error or exc
+    if error is not None:
+        raise error
+    return results
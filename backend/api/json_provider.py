@@ -0,0 +1,80 @@
+"""
+JSON provider for the Flask app that encodes MySQL values directly.
+
+Rows come out of mysql-connector with DECIMAL columns as Decimal. The
+provider writes those as JSON floats, which is what the handlers used to
+do row by row with float(); queries CAST counts they SUM to integers,
+and turn NULLs the API shows as 0 into 0 with COALESCE.
+
+Settings (backend/db/.env):
+    JSON_PROVIDER=orjson  # orjson (falls back to stdlib if it isn't installed) or stdlib
+"""
+
+import os
+from datetime import date
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(o):
+    if type(o) is Decimal:
+        return float(o)
+    return DefaultJSONProvider.default(o)
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's provider with Decimals written as numbers instead of strings."""
+
+    default = staticmethod(_default)
+
+
+class OrjsonProvider(StdlibJSONProvider):
+    """
+    Encodes with orjson: compact, sorted keys, UTF-8 output. Dates keep
+    Flask's HTTP-date format. Indented output (debug mode) uses the
+    stdlib encoder.
+    """
+
+    options = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+    @staticmethod
+    def _orjson_default(o):
+        # Called for every Decimal, so check for that first
+        if type(o) is Decimal:
+            return float(o)
+        if isinstance(o, date):
+            return http_date(o)
+        return DefaultJSONProvider.default(o)
+
+    def _encode(self, obj) -> bytes:
+        return orjson.dumps(obj, default=self._orjson_default, option=self.options)
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs.get("indent") is not None:
+            return super().dumps(obj, **kwargs)
+        # orjson output is always compact, so `separators` needs no handling
+        return self._encode(obj).decode()
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._encode(obj) + b"\n", mimetype=self.mimetype)
+
+
+def make_json_provider(app):
+    """The provider JSON_PROVIDER names; orjson when available by default."""
+    name = os.getenv("JSON_PROVIDER", "orjson")
+    if name == "orjson" and orjson is not None:
+        return OrjsonProvider(app)
+    if name in ("orjson", "stdlib"):
+        return StdlibJSONProvider(app)
+    raise ValueError(f"Unknown JSON_PROVIDER: {name}")
+
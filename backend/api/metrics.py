@@ -0,0 +1,428 @@
+"""
+Per-request metrics and a slow-query log.
+
+Every request records its latency, the SQL statements its cursors ran,
+the time spent in them (execute plus fetch), the rows fetched and the
+response size. They are kept per route as Prometheus histograms and
+served at GET /api/metrics in the Prometheus text format. Each process
+(gunicorn worker) keeps its own counts.
+
+Cursors are counted by wrapping the ones pooled connections hand out
+(db.db_connection.set_cursor_hook); a cursor belongs to the request
+that was running when it was opened, so queries run by api/fanout.py
+threads and rows read while a response streams are counted too.
+
+Statements slower than SLOW_QUERY_MS are written to the slow-query log
+as one JSON object per line. Quoted strings and numbers in the SQL are
+replaced with "?", and only the types of the parameters are logged.
+
+Settings (backend/db/.env):
+    METRICS_ENABLED=1   # 0 turns off the hooks and /api/metrics
+    SLOW_QUERY_MS=200   # statements at least this slow are logged
+    SLOW_QUERY_LOG=     # file to append to (default: stderr)
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+
+from flask import g, request
+
+from db.db_connection import set_cursor_hook
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "")
+
+# Histogram bucket upper bounds
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+ROWS_BUCKETS = (0, 10, 100, 1000, 10000, 100000, 1000000)
+BYTES_BUCKETS = (1024, 10240, 102400, 1048576, 10485760)
+
+# Label for requests that matched no route, so 404 probes don't add series
+UNMATCHED_ROUTE = "<unmatched>"
+
+_current: ContextVar[Optional["RequestMetrics"]] = ContextVar("request_metrics", default=None)
+
+_QUOTED = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+def redact_sql(sql) -> str:
+    """SQL on one line with its literal values replaced by ?."""
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode("utf-8", "replace")
+    sql = _QUOTED.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def _param_types(params):
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+def _make_slow_query_logger():
+    logger = logging.getLogger("slow_query")
+    if not logger.handlers:
+        handler = logging.FileHandler(SLOW_QUERY_LOG) if SLOW_QUERY_LOG else logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+slow_query_log = _make_slow_query_logger()
+
+
+class RequestMetrics:
+    """Counts for one request, shared by every cursor it opens (possibly on other threads)."""
+
+    def __init__(self, route: str):
+        self.route = route
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+        self.slow_queries = 0
+        # (redacted sql, ms, rows) per statement, when set to a list (api/profiling.py)
+        self.queries: Optional[list] = None
+        self._lock = threading.Lock()
+
+    def add(self, statements: int = 0, seconds: float = 0.0, rows: int = 0, slow_queries: int = 0) -> None:
+        with self._lock:
+            self.statements += statements
+            self.sql_seconds += seconds
+            self.rows += rows
+            self.slow_queries += slow_queries
+
+    def note_query(self, sql, seconds: float, rows: int) -> None:
+        if self.queries is None:
+            return
+        with self._lock:
+            self.queries.append((redact_sql(sql), round(seconds * 1000, 3), rows))
+
+
+class TimedCursor:
+    """
+    Cursor proxy that reports statements, SQL time and rows to a request.
+
+    Time spent fetching counts toward the statement that produced the
+    rows, so the slow-query check runs when the statement is done: on the
+    next execute(), or when the cursor is closed.
+    """
+
+    def __init__(self, cursor, metrics: RequestMetrics, slow_ms: float = SLOW_QUERY_MS):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._slow_seconds = slow_ms / 1000
+        # (sql, params, seconds, rows) of the statement being read
+        self._statement = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _timed(self, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._elapsed = time.perf_counter() - start
+
+    def _finish(self) -> None:
+        if self._statement is None:
+            return
+        sql, params, seconds, rows = self._statement
+        self._statement = None
+        self._metrics.note_query(sql, seconds, rows)
+        if seconds >= self._slow_seconds:
+            self._metrics.add(slow_queries=1)
+            slow_query_log.info(json.dumps({
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "route": self._metrics.route,
+                "ms": round(seconds * 1000, 1),
+                "rows": rows,
+                "sql": redact_sql(sql),
+                "params": _param_types(params),
+            }))
+
+    def _run(self, method, sql, params, *args, **kwargs):
+        self._finish()
+        try:
+            return self._timed(getattr(self._cursor, method), sql, params, *args, **kwargs)
+        finally:
+            self._metrics.add(statements=1, seconds=self._elapsed)
+            self._statement = (sql, params, self._elapsed, 0)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        return self._run("execute", operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        return self._run("executemany", operation, None, seq_params, *args, **kwargs)
+
+    def _fetch(self, method, *args, **kwargs):
+        try:
+            result = self._timed(getattr(self._cursor, method), *args, **kwargs)
+        except Exception:
+            self._metrics.add(seconds=self._elapsed)
+            raise
+        if method == "fetchone":
+            rows = 0 if result is None else 1
+        else:
+            rows = len(result)
+        self._metrics.add(seconds=self._elapsed, rows=rows)
+        if self._statement is not None:
+            sql, params, seconds, total = self._statement
+            self._statement = (sql, params, seconds + self._elapsed, total + rows)
+        return result
+
+    def fetchone(self):
+        return self._fetch("fetchone")
+
+    def fetchmany(self, *args, **kwargs):
+        return self._fetch("fetchmany", *args, **kwargs)
+
+    def fetchall(self):
+        return self._fetch("fetchall")
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
+
+
+class Histogram:
+    """Prometheus histogram with one series per label tuple."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # labels -> [bucket counts..., sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in sorted(self._series.items()):
+            label_text = _labels(self.label_names, labels)
+            for bound, count in zip(self.buckets, series):
+                yield f'{self.name}_bucket{{{label_text},le="{_number(bound)}"}} {count}'
+            yield f'{self.name}_bucket{{{label_text},le="+Inf"}} {series[-1]}'
+            yield f"{self.name}_sum{{{label_text}}} {_number(series[-2])}"
+            yield f"{self.name}_count{{{label_text}}} {series[-1]}"
+
+
+class Counter:
+    """Prometheus counter with one series per label tuple."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._series: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1) -> None:
+        self._series[labels] = self._series.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self._series.items()):
+            if self.label_names:
+                yield f"{self.name}{{{_labels(self.label_names, labels)}}} {_number(value)}"
+            else:
+                yield f"{self.name} {_number(value)}"
+
+
+def _labels(names, values) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """The process's request metrics, updated at the end of each request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        route = ("route", "method")
+        self.requests = Counter("http_requests_total", "Requests handled.", ("route", "method", "status"))
+        self.latency = Histogram("http_request_duration_seconds", "Request latency.", route, SECONDS_BUCKETS)
+        self.statements = Histogram("http_request_sql_statements", "SQL statements run per request.",
+                                    route, COUNT_BUCKETS)
+        self.sql_seconds = Histogram("http_request_sql_seconds", "Time spent in SQL per request.",
+                                     route, SECONDS_BUCKETS)
+        self.rows = Histogram("http_request_rows_fetched", "Rows fetched per request.", route, ROWS_BUCKETS)
+        self.response_bytes = Histogram("http_response_size_bytes", "Response body size.", route, BYTES_BUCKETS)
+        self.slow_queries = Counter("sql_slow_queries_total",
+                                    f"Statements slower than SLOW_QUERY_MS ({_number(SLOW_QUERY_MS)} ms).",
+                                    ("route",))
+
+    def record(self, metrics: RequestMetrics, method: str, status: int, seconds: float, size: int) -> None:
+        labels = (metrics.route, method)
+        with self._lock:
+            self.requests.inc((metrics.route, method, str(status)))
+            self.latency.observe(labels, seconds)
+            self.statements.observe(labels, metrics.statements)
+            self.sql_seconds.observe(labels, metrics.sql_seconds)
+            self.rows.observe(labels, metrics.rows)
+            self.response_bytes.observe(labels, size)
+            if metrics.slow_queries:
+                self.slow_queries.inc((metrics.route,), metrics.slow_queries)
+
+    def snapshot(self) -> Dict[Tuple[str, str], dict]:
+        """Running totals per (route, method): requests, statements, sql_seconds, rows, response_bytes."""
+        with self._lock:
+            return {
+                labels: {
+                    "requests": series[-1],
+                    "statements": self.statements._series[labels][-2],
+                    "sql_seconds": self.sql_seconds._series[labels][-2],
+                    "rows": self.rows._series[labels][-2],
+                    "response_bytes": self.response_bytes._series[labels][-2],
+                }
+                for labels, series in self.latency._series.items()
+            }
+
+    def render(self) -> str:
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.latency, self.statements, self.sql_seconds, self.rows,
+                           self.response_bytes, self.slow_queries):
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def render_counter(name: str, help_text: str, label: str, values: Dict[str, float]) -> str:
+    """One labelled counter in the text format, for totals kept elsewhere (e.g. cache stats)."""
+    counter = Counter(name, help_text, (label,))
+    for key, value in values.items():
+        counter.inc((key,), value)
+    return "\n".join(counter.render()) + "\n"
+
+
+# (metric, key in ConnectionPool.stats(), type, help)
+POOL_METRICS = (
+    ("db_pool_size", "size", "gauge", "Connections the pool may open."),
+    ("db_pool_open", "open", "gauge", "Connections open, in use or idle."),
+    ("db_pool_in_use", "in_use", "gauge", "Connections checked out."),
+    ("db_pool_idle", "idle", "gauge", "Connections open and waiting in the pool."),
+    ("db_pool_checkouts_total", "checkouts", "counter", "Connections handed out."),
+    ("db_pool_wait_seconds_total", "wait_time_total_seconds", "counter",
+     "Time spent waiting for a connection."),
+    ("db_pool_wait_seconds_max", "wait_time_max_seconds", "gauge", "Longest wait for a connection."),
+    ("db_pool_exhausted_total", "exhausted_events", "counter",
+     "Checkouts that found every connection in use and had to wait."),
+    ("db_pool_timeouts_total", "timeouts", "counter", "Checkouts that gave up after DB_POOL_TIMEOUT."),
+    ("db_pool_connections_created_total", "connections_created", "counter", "Connections opened."),
+    ("db_pool_connections_recycled_total", "connections_recycled", "counter",
+     "Connections reopened for being older than DB_POOL_RECYCLE."),
+    ("db_pool_failed_health_checks_total", "failed_health_checks", "counter",
+     "Idle connections that failed their ping and were replaced."),
+    ("db_pool_time_limited_checkouts_total", "time_limited_checkouts", "counter",
+     "Checkouts that ran under a statement deadline."),
+)
+
+
+def render_pool(stats: Dict[str, float]) -> str:
+    """ConnectionPool.stats() in the text format, so pool exhaustion can be alerted on."""
+    lines = []
+    for name, key, kind, help_text in POOL_METRICS:
+        if key not in stats:
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {_number(stats[key])}"]
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _cursor_hook(cursor):
+    metrics = _current.get()
+    return cursor if metrics is None else TimedCursor(cursor, metrics)
+
+
+def _counted(chunks, counter):
+    for chunk in chunks:
+        counter[0] += len(chunk.encode() if isinstance(chunk, str) else chunk)
+        yield chunk
+
+
+def init_app(app) -> None:
+    """Time every request of `app` and count the SQL its pooled cursors run."""
+    if not METRICS_ENABLED:
+        return
+    set_cursor_hook(_cursor_hook)
+
+    def finish(metrics, started, method, status, size):
+        # Only the first call counts: a failed request reaches both hooks
+        if _current.get() is not metrics:
+            return
+        _current.set(None)
+        registry.record(metrics, method, status, time.perf_counter() - started, size)
+
+    @app.before_request
+    def start_request_metrics():
+        rule = request.url_rule
+        g.request_metrics = RequestMetrics(rule.rule if rule is not None else UNMATCHED_ROUTE)
+        g.request_started = time.perf_counter()
+        _current.set(g.request_metrics)
+
+    @app.after_request
+    def record_request_metrics(response):
+        metrics, started, method = g.request_metrics, g.request_started, request.method
+        if not response.is_streamed:
+            finish(metrics, started, method, response.status_code, response.calculate_content_length() or 0)
+            return response
+        # Streamed bodies are counted as they are sent; the request is
+        # recorded when the server closes the response
+        size = [0]
+        response.response = _counted(response.response, size)
+        status = response.status_code
+        response.call_on_close(lambda: finish(metrics, started, method, status, size[0]))
+        return response
+
+    @app.teardown_request
+    def record_failed_request(exc):
+        metrics = g.get("request_metrics")
+        if exc is not None and metrics is not None:
+            finish(metrics, g.request_started, request.method, 500, 0)
@@ -0,0 +1,47 @@
+"""
+Opaque cursors for keyset pagination of a product's reviews.
+
+Reviews are listed by rating DESC, review_id ASC, so a cursor holds the
+(rating, review_id) of the last review on a page and the next page
+starts right after it. MySQL sorts NULL ratings last in that order.
+"""
+
+import base64
+import binascii
+import json
+from decimal import Decimal, InvalidOperation
+from typing import Optional, Tuple
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(rating, review_id: str) -> str:
+    payload = json.dumps([None if rating is None else str(rating), review_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[Optional[Decimal], str]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        rating, review_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(review_id, str):
+            raise InvalidCursor(token)
+        return (None if rating is None else Decimal(rating)), review_id
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, InvalidOperation) as exc:
+        raise InvalidCursor(token) from exc
+
+
+def seek_condition(after: Tuple[Optional[Decimal], str]):
+    """
+    WHERE clause (and params) for the reviews that come after the cursor
+    in rating DESC, review_id ASC order.
+    """
+    rating, review_id = after
+    if rating is None:
+        return "r.rating IS NULL AND r.review_id > %s", (review_id,)
+    return (
+        "(r.rating < %s OR (r.rating = %s AND r.review_id > %s) OR r.rating IS NULL)",
+        (rating, rating, review_id),
+    )
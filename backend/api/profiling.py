@@ -0,0 +1,282 @@
+"""
+Profile single requests on demand, in production if need be.
+
+With PROFILING_ENABLED=1, a request sent with an `X-Profile` header
+(equal to PROFILE_TOKEN when that is set) runs under a sampling
+profiler: a background thread records the request thread's stack every
+PROFILE_INTERVAL_MS, along with the stacks of the threads running parts
+of the request for it (time-budgeted views, api/budget.py, and fanned-out
+queries, api/fanout.py). Other requests are not slowed down, and only one
+request per process is profiled at a time; the response says which
+profile it wrote in `X-Profile-Id`, or `X-Profile-Id: busy`.
+
+Each profile is two files in PROFILE_DIR:
+    <id>.folded  one "frame;frame;frame count" line per distinct stack,
+                 root first, for flamegraph.pl, speedscope or inferno;
+                 stacks of helper threads start with a "[thread name]" frame
+    <id>.json    route, method, query args, status, duration, release
+                 (APP_RELEASE), sample count and the SQL the request ran
+                 with per-statement timings (from api/metrics.py)
+
+Settings (backend/db/.env):
+    PROFILING_ENABLED=0
+    PROFILE_TOKEN=             # required X-Profile value (default: any)
+    PROFILE_DIR=backend/profiles
+    PROFILE_INTERVAL_MS=2      # time between samples
+    APP_RELEASE=               # recorded in each profile, to compare releases
+"""
+
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Optional
+
+from flask import g, request
+
+from api.metrics import UNMATCHED_ROUTE
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", Path(__file__).resolve().parent.parent / "profiles"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 2))
+APP_RELEASE = os.getenv("APP_RELEASE", "")
+
+PROFILE_HEADER = "X-Profile"
+
+# Frames are labelled with paths relative to the backend directory
+BACKEND_DIR = str(Path(__file__).resolve().parent.parent) + os.sep
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(BACKEND_DIR):
+        filename = filename[len(BACKEND_DIR):]
+    else:
+        # Library code: keep the path from the package down
+        parts = Path(filename).parts
+        for marker in ("site-packages", "dist-packages"):
+            if marker in parts:
+                parts = parts[parts.index(marker) + 1:]
+                break
+        else:
+            parts = parts[-2:]
+        filename = "/".join(parts)
+    # ";" separates frames in the folded format
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler:
+    """
+    Counts the stacks one thread is in, sampled every `interval` seconds
+    from another thread, and those of the threads it follow()s meanwhile.
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        # thread id -> name of the helper threads being sampled too
+        self._helpers: Dict[int, str] = {}
+        self._helpers_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def follow(self, thread_id: int, name: str) -> bool:
+        """Sample another thread too, until unfollow(); False if it already is."""
+        with self._helpers_lock:
+            if thread_id == self.thread_id or thread_id in self._helpers:
+                return False
+            self._helpers[thread_id] = name
+            return True
+
+    def unfollow(self, thread_id: int) -> None:
+        with self._helpers_lock:
+            self._helpers.pop(thread_id, None)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            frame = frames.get(self.thread_id)
+            if frame is None:
+                return
+            self._record(frame, [])
+            with self._helpers_lock:
+                helpers = list(self._helpers.items())
+            for thread_id, name in helpers:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self._record(frame, [f"[{name}]"])
+            self.samples += 1
+
+    def _record(self, frame, root: list) -> None:
+        labels = []
+        while frame is not None:
+            labels.append(_frame_label(frame.f_code))
+            frame = frame.f_back
+        self.stacks[";".join(root + labels[::-1])] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+# The sampler of the request whose context this is, see sampled_thread()
+_sampler: ContextVar[Optional[StackSampler]] = ContextVar("profile_sampler", default=None)
+
+
+@contextmanager
+def sampled_thread():
+    """
+    Sample the current thread as part of the profile of the request whose
+    context it is running in, if that request is being profiled, until
+    the block ends. For worker threads doing part of a request's work in
+    a copy of its context (run_within, run_concurrently).
+    """
+    sampler = _sampler.get()
+    thread_id = threading.get_ident()
+    if sampler is None or not sampler.follow(thread_id, threading.current_thread().name):
+        yield
+        return
+    try:
+        yield
+    finally:
+        sampler.unfollow(thread_id)
+
+
+class RequestProfiler:
+    """Starts and writes out the profile of a request that asked for one."""
+
+    def __init__(self, directory: Path = PROFILE_DIR, token: str = PROFILE_TOKEN):
+        self.directory = Path(directory)
+        self.token = token
+        # One profiled request at a time per process
+        self._slot = threading.Lock()
+
+    def wanted(self) -> bool:
+        value = request.headers.get(PROFILE_HEADER)
+        if not value:
+            return False
+        if self.token:
+            return hmac.compare_digest(value.encode(), self.token.encode())
+        return True
+
+    def start(self) -> Optional[StackSampler]:
+        """A running sampler for the current request, or None if another request holds the slot."""
+        if not self._slot.acquire(blocking=False):
+            return None
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+        return sampler
+
+    def finish(self, sampler: StackSampler, profile_id: str, details: dict) -> None:
+        try:
+            sampler.stop()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            details["samples"] = sampler.samples
+            details["interval_ms"] = sampler.interval * 1000
+            (self.directory / f"{profile_id}.folded").write_text(sampler.folded(), encoding="utf-8")
+            (self.directory / f"{profile_id}.json").write_text(json.dumps(details, indent=2), encoding="utf-8")
+        finally:
+            self._slot.release()
+
+    def abandon(self, sampler: StackSampler) -> None:
+        """Stop a sampler without writing anything (the request failed before a response)."""
+        try:
+            sampler.stop()
+        finally:
+            self._slot.release()
+
+
+def _profile_id(route: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", route).strip("-") or "root"
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{slug}-{uuid.uuid4().hex[:8]}"
+
+
+def init_app(app, profiler: Optional[RequestProfiler] = None) -> None:
+    """Profile the requests of `app` that send X-Profile (see the module docstring)."""
+    if not PROFILING_ENABLED:
+        return
+    profiler = profiler or RequestProfiler()
+
+    @app.before_request
+    def start_profile():
+        if not profiler.wanted():
+            return
+        g.profile_sampler = profiler.start()
+        _sampler.set(g.profile_sampler)
+        g.profile_started = time.perf_counter()
+        g.profile_started_at = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+        metrics = g.get("request_metrics")
+        if metrics is not None and g.profile_sampler is not None:
+            metrics.queries = []
+
+    @app.after_request
+    def write_profile(response):
+        sampler = g.pop("profile_sampler", None)
+        _sampler.set(None)
+        if sampler is None:
+            if profiler.wanted():
+                response.headers["X-Profile-Id"] = "busy"
+            return response
+
+        rule = request.url_rule
+        route = rule.rule if rule is not None else UNMATCHED_ROUTE
+        profile_id = _profile_id(route)
+        metrics = g.get("request_metrics")
+        started = g.profile_started
+        details = {
+            "id": profile_id,
+            "release": APP_RELEASE,
+            "route": route,
+            "endpoint": request.endpoint,
+            "method": request.method,
+            "path": request.path,
+            "args": request.args.to_dict(flat=False),
+            "status": response.status_code,
+            "started_at": g.profile_started_at,
+            "sql": None,
+        }
+
+        def finish():
+            details["seconds"] = round(time.perf_counter() - started, 6)
+            if metrics is not None:
+                details["sql"] = {
+                    "statements": metrics.statements,
+                    "seconds": round(metrics.sql_seconds, 6),
+                    "rows": metrics.rows,
+                    "queries": [
+                        {"sql": sql, "ms": ms, "rows": rows} for sql, ms, rows in (metrics.queries or [])
+                    ],
+                }
+            profiler.finish(sampler, profile_id, details)
+
+        response.headers["X-Profile-Id"] = profile_id
+        if response.is_streamed:
+            # Keep sampling while the body is sent
+            response.call_on_close(finish)
+        else:
+            finish()
+        return response
+
+    @app.teardown_request
+    def drop_profile(exc):
+        sampler = g.pop("profile_sampler", None)
+        _sampler.set(None)
+        if sampler is not None:
+            profiler.abandon(sampler)
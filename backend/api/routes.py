@@ -1,124 +1,311 @@
 # 8 Analytical SQL Queries
-from flask import jsonify, request
-from db.db_connection import get_db_connection
+import functools
+import os
+
+from flask import current_app, jsonify, request
+from db.data_version import get_data_version
+from db.db_connection import db_cursor, get_pool_stats
+from db.search_index import SearchIndexHolder, load_search_index
+from api.analytics import (
+    DEFAULT_LIMITS, LENGTH_GROUPS_SQL, PRODUCT_ROWS_SQL, compute_sections, needs_length_groups, parse_sections,
+)
+from api.budget import budget_for, is_timeout
+from api.cache import DataVersion, ResponseCache, make_cache_backend
+from api.coalesce import make_cross_worker_flight
+from api.columnar import ColumnarHolder, load_columnar
+from api import metrics, profiling
+from api.fanout import run_concurrently
+from api.pagination import InvalidCursor, decode_cursor, encode_cursor, seek_condition
+from api.streaming import InvalidStreamFormat, StreamingQuery, stream_format, stream_response
+
+# "index" ranks matches with the in-process inverted index,
+# "like" falls back to LIKE '%word%' on product_name
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "index")
+# Rebuild the search index once it is this many seconds old
+SEARCH_INDEX_MAX_AGE = float(os.getenv("SEARCH_INDEX_MAX_AGE", 300))
+
+
+def _load_search_index():
+    with db_cursor() as cursor:
+        return load_search_index(cursor)
+
+
+search_index = SearchIndexHolder(_load_search_index, SEARCH_INDEX_MAX_AGE)
+
+
+def _load_data_version():
+    with db_cursor() as cursor:
+        return get_data_version(cursor)
+
+
+# New ETL data drops cached analytics responses and rebuilds the search index
+data_version = DataVersion(_load_data_version, float(os.getenv("DATA_VERSION_CHECK_INTERVAL", 2)))
+data_version.on_change(lambda version: search_index.invalidate())
+_cache_backend = make_cache_backend()
+response_cache = ResponseCache(_cache_backend, data_version, make_cross_worker_flight(_cache_backend))
+
+# "sql" runs each analytics query in MySQL; "columnar" answers them from
+# in-memory NumPy arrays (api/columnar.py, needs numpy)
+ANALYTICS_ENGINE = os.getenv("ANALYTICS_ENGINE", "sql")
+
+
+def _load_columnar():
+    with db_cursor(dictionary=False) as cursor:
+        return load_columnar(cursor)
+
+
+columnar = ColumnarHolder(_load_columnar, data_version.current) if ANALYTICS_ENGINE == "columnar" else None
+
+
+def _columnar_section(name):
+    """Answer an analytics route from the columnar engine when it is enabled."""
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if columnar is None:
+                return view(*args, **kwargs)
+            try:
+                fmt = stream_format(request.args.get('stream'))
+            except InvalidStreamFormat as e:
+                return jsonify({'error': str(e)}), 400
+            try:
+                top_n = max(1, int(request.args.get('top_n', 5)))
+                limit = _limit_arg(name)
+                rows = columnar.get().compute([name], top_n, limit)[name]
+                if fmt:
+                    return stream_response(rows, fmt)
+                return jsonify(rows), 200
+            except Exception as e:
+                return _analytics_error(e)
+        return wrapper
+
+    return decorator
+
+
+def _analytics_error(e):
+    """
+    The response for an analytics query that raised: 504 when it ran out
+    of time (ResponseCache then falls back on the last good response),
+    else a 500. The details go to the log, not to the client.
+    """
+    if is_timeout(e):
+        budget = budget_for(request.path)
+        return jsonify({
+            'error': 'Analytics query ran out of time',
+            'budget_ms': int(budget * 1000) if budget else None,
+        }), 504
+    current_app.logger.exception("Analytics query for %s failed", request.path)
+    return jsonify({'error': 'Analytics query failed'}), 500
+
+
+def _fetch_products_with_ratings(cursor, matched_sql, params):
+    """Product rows plus avg_rating/review_count for the ids matched_sql selects."""
+    # Pick the matching products first, then read their rating
+    # rollups in the same statement (one round trip per search)
+    cursor.execute(f"""SELECT 
+        p.product_id, 
+        p.product_name, 
+        p.category, 
+        p.actual_price_usd,
+        p.discounted_price_usd,
+        p.discount_percentage,
+        p.about_product,
+        p.img_link,
+        p.product_link,
+        COALESCE(s.rating_sum / NULLIF(s.rating_count, 0), 0) as avg_rating,
+        COALESCE(s.review_count, 0) as review_count
+        FROM ({matched_sql}) matched
+        JOIN products p ON p.product_id = matched.product_id
+        LEFT JOIN product_stats s ON s.product_id = p.product_id""", tuple(params))
+    return cursor.fetchall()
+
+
+def _limit_arg(section):
+    """?limit= for a flat analytics section (None for the bucketed ones)."""
+    if section not in DEFAULT_LIMITS:
+        return None
+    return max(1, int(request.args.get('limit', DEFAULT_LIMITS[section])))
+
+
+def _analytics_rows(sql, params):
+    """A flat analytics result: streamed if ?stream= asks for it, else one JSON array."""
+    fmt = stream_format(request.args.get('stream'))
+    if fmt:
+        query = StreamingQuery(db_cursor, sql, params)
+        return stream_response(query, fmt, on_close=query.close)
+    with db_cursor() as cursor:
+        cursor.execute(sql, params)
+        return jsonify(cursor.fetchall()), 200
+
+
+def _bucket_results(rows, bucket_field, summary_fields):
+    """
+    Fold windowed analytics rows into one result per bucket.
+
+    Rows come ordered by bucket and then product rank, each carrying the
+    bucket summary as bucket_<field> columns. summary_fields lists
+    (field, value when NULL) pairs for those summary values. DECIMALs are
+    left to the JSON provider, which writes them as floats, so counts are
+    CAST to integers in the SQL.
+    """
+    final_results = []
+    for row in rows:
+        if not final_results or final_results[-1][bucket_field] != row[bucket_field]:
+            result = {bucket_field: row[bucket_field]}
+            for field, default in summary_fields:
+                result[field] = row['bucket_' + field] or default
+            result['top_products'] = []
+            final_results.append(result)
+        final_results[-1]['top_products'].append({
+            'product_id': row['product_id'],
+            'product_name': row['product_name'],
+            'avg_rating': row['avg_rating'] or 0.0,
+            'review_count': row['review_count'] or 0
+        })
+    return final_results
+
 
 def register_routes(app):
+    metrics.init_app(app)
+    profiling.init_app(app)
+
+    if metrics.METRICS_ENABLED:
+        @app.route('/api/metrics', methods=['GET'])
+        def prometheus_metrics():
+            cache = response_cache.stats()
+            body = metrics.registry.render() + metrics.render_counter(
+                'analytics_cache_requests_total', 'Cached analytics requests by outcome.', 'outcome',
+                {name: cache[name] for name in ('hits', 'misses', 'not_modified', 'coalesced',
+                                                'coalesced_across_workers', 'stale_served', 'unavailable')},
+            ) + metrics.render_pool(get_pool_stats())
+            return current_app.response_class(body, content_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
     @app.route('/api/health', methods=['GET'])
     def health_check():
         return jsonify({'status': 'ok', 'message': 'Backend is running'}), 200
     
+    @app.route('/api/health/pool', methods=['GET'])
+    def pool_stats():
+        return jsonify(get_pool_stats()), 200
+    
+    @app.route('/api/health/cache', methods=['GET'])
+    def cache_stats():
+        return jsonify(response_cache.stats()), 200
+    
+    @app.route('/api/health/analytics-engine', methods=['GET'])
+    def analytics_engine_stats():
+        stats = {'engine': ANALYTICS_ENGINE}
+        if columnar is not None:
+            stats.update(columnar.stats())
+        return jsonify(stats), 200
+    
     @app.route('/api/products/search', methods=['GET'])
     def search_products():
         query = request.args.get('q', '')
         if not query:
             return jsonify([]), 200
         
+        words = [word.strip() for word in query.split() if word.strip()]
+        if not words:
+            return jsonify([]), 200
+
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            words = [word.strip() for word in query.split() if word.strip()]
-            if not words:
-                return jsonify([]), 200
-            
-            # Use AND logic - all words must be present
-            like_conditions = []
-            params = []
-            for word in words:
-                like_conditions.append("product_name LIKE %s")
-                params.append(f"%{word}%")
-            
-            sql = f"""SELECT 
-                product_id, 
-                product_name, 
-                category, 
-                actual_price_usd,
-                discounted_price_usd,
-                discount_percentage,
-                about_product,
-                img_link,
-                product_link
-                FROM products WHERE {' AND '.join(like_conditions)} LIMIT 20"""
-            cursor.execute(sql, tuple(params))
-            products = cursor.fetchall()
-            
-            for product in products:
-                product_id = product['product_id']
-                cursor.execute(
-                    """SELECT AVG(rating) as avg_rating, COUNT(*) as review_count 
-                       FROM reviews WHERE product_id = %s""",
-                    (product_id,)
+            if SEARCH_BACKEND == 'index':
+                # Look for new ETL data here too (a cached read most of the
+                # time), so a load schedules an index rebuild even when no
+                # analytics request comes in to notice it
+                data_version.current()
+                # Ranked ids from the inverted index (AND of word prefixes)
+                product_ids = search_index.get().search(query, limit=20)
+                if not product_ids:
+                    return jsonify([]), 200
+                placeholders = ', '.join(['%s'] * len(product_ids))
+                with db_cursor() as cursor:
+                    products = _fetch_products_with_ratings(
+                        cursor,
+                        f"SELECT product_id FROM products WHERE product_id IN ({placeholders})",
+                        product_ids,
+                    )
+                rank = {product_id: i for i, product_id in enumerate(product_ids)}
+                products.sort(key=lambda product: rank[product['product_id']])
+                return jsonify(products), 200
+
+            with db_cursor() as cursor:
+                # Use AND logic - all words must be present
+                like_conditions = []
+                params = []
+                for word in words:
+                    like_conditions.append("product_name LIKE %s")
+                    params.append(f"%{word}%")
+            
+                products = _fetch_products_with_ratings(
+                    cursor,
+                    f"SELECT product_id FROM products WHERE {' AND '.join(like_conditions)} LIMIT 20",
+                    params,
                 )
-                rating_data = cursor.fetchone()
-                product['avg_rating'] = float(rating_data['avg_rating']) if rating_data and rating_data['avg_rating'] else 0.0
-                product['review_count'] = int(rating_data['review_count']) if rating_data and rating_data['review_count'] else 0
-            
-            cursor.close()
-            conn.close()
-            
-            return jsonify(products), 200
+                return jsonify(products), 200
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
     @app.route('/api/products/<product_id>', methods=['GET'])
     def get_product(product_id):
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            cursor.execute(
-                """SELECT 
-                    product_id, 
-                    product_name, 
-                    category, 
-                    actual_price_usd,
-                    discounted_price_usd,
-                    discount_percentage,
-                    about_product,
-                    img_link,
-                    product_link
-                    FROM products WHERE product_id = %s""",
-                (product_id,)
-            )
-            product = cursor.fetchone()
-            
-            if not product:
-                cursor.close()
-                conn.close()
-                return jsonify({'error': 'Product not found'}), 404
-            
-            cursor.execute(
-                """SELECT AVG(rating) as avg_rating, COUNT(*) as review_count 
-                   FROM reviews WHERE product_id = %s""",
-                (product_id,)
-            )
-            rating_data = cursor.fetchone()
-            
-            avg_rating = float(rating_data['avg_rating']) if rating_data['avg_rating'] else 0.0
-            review_count = int(rating_data['review_count']) if rating_data['review_count'] else 0
-            
-            product['avg_rating'] = avg_rating
-            product['review_count'] = review_count
+            with db_cursor() as cursor:
+                cursor.execute(
+                    """SELECT 
+                        p.product_id, 
+                        p.product_name, 
+                        p.category, 
+                        p.actual_price_usd,
+                        p.discounted_price_usd,
+                        p.discount_percentage,
+                        p.about_product,
+                        p.img_link,
+                        p.product_link,
+                        COALESCE(s.rating_sum / NULLIF(s.rating_count, 0), 0) as avg_rating,
+                        COALESCE(s.review_count, 0) as review_count
+                        FROM products p
+                        LEFT JOIN product_stats s ON s.product_id = p.product_id
+                        WHERE p.product_id = %s""",
+                    (product_id,)
+                )
+                product = cursor.fetchone()
             
-            cursor.close()
-            conn.close()
+                if not product:
+                    return jsonify({'error': 'Product not found'}), 404
             
-            return jsonify(product), 200
+                return jsonify(product), 200
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
     @app.route('/api/products/<product_id>/reviews', methods=['GET'])
     def get_product_reviews(product_id):
-        conn = None
-        cursor = None
+        # Reviews by rating DESC, review_id ASC. Passing a page's
+        # next_cursor as `after` seeks through the (product_id, rating DESC,
+        # review_id) index, so deep pages cost the same as the first;
+        # `offset` still works but reads and discards every skipped row.
+        # ?stream=json|ndjson sends large pages row by row (api/streaming.py).
         try:
             limit = int(request.args.get('limit', 5))
             offset = int(request.args.get('offset', 0))
-            
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            cursor.execute("""
+            after_token = request.args.get('after')
+            try:
+                fmt = stream_format(request.args.get('stream'))
+            except InvalidStreamFormat as e:
+                return jsonify({'error': str(e)}), 400
+            
+            seek_sql, seek_params = '', ()
+            if after_token:
+                try:
+                    seek_sql, seek_params = seek_condition(decode_cursor(after_token))
+                except InvalidCursor:
+                    return jsonify({'error': 'Invalid cursor'}), 400
+                seek_sql = 'AND ' + seek_sql
+                offset = 0
+            
+            # One row past the page tells whether there is a next page
+            page_sql = f"""
                 SELECT 
                     r.review_id,
                     r.review_title,
@@ -128,624 +315,498 @@ def register_routes(app):
                     u.user_name
                 FROM reviews r
                 LEFT JOIN users u ON r.user_id = u.user_id
-                WHERE r.product_id = %s
+                WHERE r.product_id = %s {seek_sql}
                 ORDER BY r.rating DESC, r.review_id ASC
                 LIMIT %s OFFSET %s
-            """, (product_id, limit, offset))
-            reviews = cursor.fetchall()
+            """
+            page_params = (product_id, *seek_params, limit + 1, offset)
             
-            # Get total count for pagination
-            cursor.execute(
-                "SELECT COUNT(*) as total FROM reviews WHERE product_id = %s",
-                (product_id,)
-            )
-            total_data = cursor.fetchone()
-            total_count = int(total_data['total']) if total_data else 0
+            def fetch_page(cursor):
+                cursor.execute(page_sql, page_params)
+                return cursor.fetchall()
             
-            # Format results
-            for review in reviews:
-                review['rating'] = float(review['rating']) if review['rating'] else 0.0
+            def fetch_total(cursor):
+                # Total count for pagination, kept up to date by the ETL
+                cursor.execute(
+                    "SELECT review_count as total FROM product_stats WHERE product_id = %s",
+                    (product_id,)
+                )
+                return cursor.fetchone()
             
-            result = {
-                'reviews': reviews,
-                'total': total_count,
-                'limit': limit,
-                'offset': offset,
-                'has_more': (offset + len(reviews)) < total_count
-            }
+            def page_fields(total_data, has_next, last_key):
+                # last_key is the (rating, review_id) of the page's last review
+                next_cursor = None
+                if has_next and last_key:
+                    next_cursor = encode_cursor(*last_key)
+                result = {
+                    'total': int(total_data['total']) if total_data else 0,
+                    'limit': limit,
+                    'next_cursor': next_cursor,
+                    'has_more': has_next
+                }
+                if not after_token:
+                    result['offset'] = offset
+                return result
+            
+            if fmt:
+                with db_cursor() as cursor:
+                    total_data = fetch_total(cursor)
+                query = StreamingQuery(db_cursor, page_sql, page_params)
+                state = {'has_next': False, 'last_key': None}
+                
+                def page_rows():
+                    for i, review in enumerate(query):
+                        if i == limit:
+                            state['has_next'] = True
+                            break
+                        state['last_key'] = (review['rating'], review['review_id'])
+                        review['rating'] = review['rating'] or 0.0
+                        yield review
+                
+                return stream_response(
+                    page_rows(), fmt, field='reviews',
+                    envelope=lambda: page_fields(total_data, state['has_next'], state['last_key']),
+                    on_close=query.close,
+                )
             
-            cursor.close()
-            conn.close()
+            # The page and the total don't depend on each other
+            fetched = run_concurrently({'page': fetch_page, 'total': fetch_total}, db_cursor)
+            reviews = fetched['page']
+            has_next = len(reviews) > limit
+            reviews = reviews[:limit]
+            last_key = (reviews[-1]['rating'], reviews[-1]['review_id']) if reviews else None
             
+            # Unrated reviews show 0.0; the cursor above needs the raw NULL,
+            # so this can't be a COALESCE in the query
+            for review in reviews:
+                review['rating'] = review['rating'] or 0.0
+            
+            result = page_fields(fetched['total'], has_next, last_key)
+            result['reviews'] = reviews
             return jsonify(result), 200
         except Exception as e:
             return jsonify({'error': str(e)}), 500
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
     
     # Analytics Endpoints
+    #
+    # The bucketed endpoints below each run one query: every row is a
+    # (bucket, product) pair carrying the bucket summary (window
+    # aggregates over the whole bucket) and the product's rank inside it,
+    # already filtered to the top_n products per bucket. Category, price
+    # and discount buckets are generated columns on products (see
+    # db/migrations/003_analytics_indexes.sql).
     @app.route('/api/analytics/top-rated-by-category', methods=['GET'])
+    @response_cache.cached
+    @_columnar_section('top-rated-by-category')
     def top_rated_by_category():
-        conn = None
-        cursor = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
+            top_n = max(1, int(request.args.get('top_n', 5)))
             
-            # Get summary stats by first category segment
-            cursor.execute("""
-                SELECT 
-                    SUBSTRING_INDEX(p.category, '|', 1) AS first_category,
-                    AVG(r.rating) as avg_rating,
-                    COUNT(r.review_id) as review_count,
-                    COUNT(DISTINCT p.product_id) as product_count
-                FROM products p
-                JOIN reviews r ON p.product_id = r.product_id
-                WHERE p.category IS NOT NULL AND p.category != ''
-                GROUP BY first_category
-                HAVING COUNT(r.review_id) >= 1
-                ORDER BY avg_rating DESC
-            """)
-            summary_results = cursor.fetchall()
-
-            # Get top 5 products for each first-level category
-            final_results = []
-            for summary in summary_results:
-                first_category = summary['first_category']
-                
-                # Get top 5 products in this first-level category (including all subcategories)
+            with db_cursor() as cursor:
                 cursor.execute("""
-                    SELECT 
-                        p.product_id,
-                        p.product_name,
-                        AVG(r.rating) as avg_rating,
-                        COUNT(r.review_id) as review_count
-                    FROM products p
-                    JOIN reviews r ON p.product_id = r.product_id
-                    WHERE SUBSTRING_INDEX(p.category, '|', 1) = %s
-                    GROUP BY p.product_id, p.product_name
-                    HAVING COUNT(r.review_id) >= 1
-                    ORDER BY avg_rating DESC, review_count DESC
-                    LIMIT 5
-                """, (first_category,))
-                top_products = cursor.fetchall()
-                
-                # Format the result
-                result = {
-                    'category': first_category,
-                    'avg_rating': float(summary['avg_rating']) if summary['avg_rating'] else 0.0,
-                    'review_count': int(summary['review_count']) if summary['review_count'] else 0,
-                    'product_count': int(summary['product_count']) if summary['product_count'] else 0,
-                    'top_products': []
-                }
-                for product in top_products:
-                    result['top_products'].append({
-                        'product_id': product['product_id'],
-                        'product_name': product['product_name'],
-                        'avg_rating': float(product['avg_rating']) if product['avg_rating'] else 0.0,
-                        'review_count': int(product['review_count']) if product['review_count'] else 0
-                    })
+                    SELECT * FROM (
+                        SELECT 
+                            p.top_category AS category,
+                            SUM(s.rating_sum) OVER bucket / SUM(s.rating_count) OVER bucket as bucket_avg_rating,
+                            CAST(SUM(s.review_count) OVER bucket AS SIGNED) as bucket_review_count,
+                            COUNT(*) OVER bucket as bucket_product_count,
+                            p.product_id,
+                            p.product_name,
+                            s.rating_sum / NULLIF(s.rating_count, 0) as avg_rating,
+                            s.review_count,
+                            ROW_NUMBER() OVER (
+                                PARTITION BY p.top_category
+                                ORDER BY s.rating_sum / NULLIF(s.rating_count, 0) DESC,
+                                    s.review_count DESC, p.product_id
+                            ) as product_rank
+                        FROM products p
+                        JOIN product_stats s ON p.product_id = s.product_id
+                        WHERE p.top_category IS NOT NULL
+                            AND s.review_count >= 1
+                        WINDOW bucket AS (PARTITION BY p.top_category)
+                    ) ranked
+                    WHERE product_rank <= %s
+                    ORDER BY bucket_avg_rating DESC, category, product_rank
+                """, (top_n,))
+                final_results = _bucket_results(
+                    cursor.fetchall(),
+                    'category',
+                    [('avg_rating', 0.0), ('review_count', 0), ('product_count', 0)],
+                )
                 
-                final_results.append(result)
-            
-            return jsonify(final_results), 200
+                return jsonify(final_results), 200
         except Exception as e:
-            return jsonify({'error': str(e)}), 500
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
+            return _analytics_error(e)
     
     @app.route('/api/analytics/sentiment-by-price-range', methods=['GET'])
+    @response_cache.cached
+    @_columnar_section('sentiment-by-price-range')
     def sentiment_by_price_range():
-        conn = None
-        cursor = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
+            top_n = max(1, int(request.args.get('top_n', 5)))
             
-            # Get summary stats by price range
-            cursor.execute("""
-                SELECT 
-                    CASE 
-                        WHEN p.discounted_price_usd < 50 THEN '$0-$50'
-                        WHEN p.discounted_price_usd < 150 THEN '$50-$150'
-                        WHEN p.discounted_price_usd < 300 THEN '$150-$300'
-                        WHEN p.discounted_price_usd < 500 THEN '$300-$500'
-                        ELSE '$500+'
-                    END as price_range,
-                    AVG(r.sentiment_score) as avg_sentiment,
-                    AVG(r.rating) as avg_rating,
-                    COUNT(r.review_id) as review_count
-                FROM products p
-                JOIN reviews r ON p.product_id = r.product_id
-                WHERE r.sentiment_score IS NOT NULL 
-                    AND p.discounted_price_usd IS NOT NULL
-                GROUP BY price_range
-                ORDER BY 
-                    CASE price_range
-                        WHEN '$0-$50' THEN 1
-                        WHEN '$50-$150' THEN 2
-                        WHEN '$150-$300' THEN 3
-                        WHEN '$300-$500' THEN 4
-                        WHEN '$500+' THEN 5
-                    END
-            """)
-            summary_results = cursor.fetchall()
-            
-            # Get top 5 products for each price range
-            final_results = []
-            for summary in summary_results:
-                price_range = summary['price_range']
-                
-                # Determine price conditions
-                if price_range == '$0-$50':
-                    price_condition = "p.discounted_price_usd >= 0 AND p.discounted_price_usd < 50"
-                elif price_range == '$50-$150':
-                    price_condition = "p.discounted_price_usd >= 50 AND p.discounted_price_usd < 150"
-                elif price_range == '$150-$300':
-                    price_condition = "p.discounted_price_usd >= 150 AND p.discounted_price_usd < 300"
-                elif price_range == '$300-$500':
-                    price_condition = "p.discounted_price_usd >= 300 AND p.discounted_price_usd < 500"
-                else:  # $500+
-                    price_condition = "p.discounted_price_usd >= 500"
-                
-                # Get top 5 products in this price range
-                cursor.execute(f"""
-                    SELECT 
-                        p.product_id,
-                        p.product_name,
-                        AVG(r.rating) as avg_rating,
-                        COUNT(r.review_id) as review_count
-                    FROM products p
-                    JOIN reviews r ON p.product_id = r.product_id
-                    WHERE {price_condition}
-                        AND p.discounted_price_usd IS NOT NULL
-                    GROUP BY p.product_id, p.product_name
-                    HAVING COUNT(r.review_id) >= 1
-                    ORDER BY avg_rating DESC, review_count DESC
-                    LIMIT 5
-                """)
-                top_products = cursor.fetchall()
-                
-                # Format the result
-                result = {
-                    'price_range': price_range,
-                    'avg_sentiment': float(summary['avg_sentiment']) if summary['avg_sentiment'] else 0.0,
-                    'avg_rating': float(summary['avg_rating']) if summary['avg_rating'] else 0.0,
-                    'review_count': int(summary['review_count']) if summary['review_count'] else 0,
-                    'top_products': []
-                }
-                
-                for product in top_products:
-                    result['top_products'].append({
-                        'product_id': product['product_id'],
-                        'product_name': product['product_name'],
-                        'avg_rating': float(product['avg_rating']) if product['avg_rating'] else 0.0,
-                        'review_count': int(product['review_count']) if product['review_count'] else 0
-                    })
+            with db_cursor() as cursor:
+                # Products without sentiment add zero to the sentiment sums,
+                # so the summary can share the row set of the top products;
+                # a range only appears if it has sentiment-scored reviews
+                cursor.execute("""
+                    SELECT * FROM (
+                        SELECT 
+                            price_range,
+                            SUM(sentiment_sum) OVER bucket / SUM(sentiment_count) OVER bucket as bucket_avg_sentiment,
+                            SUM(paired_rating_sum) OVER bucket / NULLIF(SUM(paired_count) OVER bucket, 0) as bucket_avg_rating,
+                            CAST(SUM(sentiment_count) OVER bucket AS SIGNED) as bucket_review_count,
+                            product_id,
+                            product_name,
+                            avg_rating,
+                            review_count,
+                            ROW_NUMBER() OVER (
+                                PARTITION BY price_range
+                                ORDER BY avg_rating DESC, review_count DESC, product_id
+                            ) as product_rank
+                        FROM (
+                            SELECT 
+                                p.price_range,
+                                p.product_id,
+                                p.product_name,
+                                s.rating_sum / NULLIF(s.rating_count, 0) as avg_rating,
+                                s.review_count,
+                                s.sentiment_sum,
+                                s.sentiment_count,
+                                s.paired_rating_sum,
+                                s.paired_count
+                            FROM products p
+                            JOIN product_stats s ON p.product_id = s.product_id
+                            WHERE p.price_range IS NOT NULL
+                                AND s.review_count >= 1
+                        ) per_product
+                        WINDOW bucket AS (PARTITION BY price_range)
+                    ) ranked
+                    WHERE product_rank <= %s
+                        AND bucket_review_count >= 1
+                    ORDER BY 
+                        CASE price_range
+                            WHEN '$0-$50' THEN 1
+                            WHEN '$50-$150' THEN 2
+                            WHEN '$150-$300' THEN 3
+                            WHEN '$300-$500' THEN 4
+                            WHEN '$500+' THEN 5
+                        END,
+                        product_rank
+                """, (top_n,))
+                final_results = _bucket_results(
+                    cursor.fetchall(),
+                    'price_range',
+                    [('avg_sentiment', 0.0), ('avg_rating', 0.0), ('review_count', 0)],
+                )
                 
-                final_results.append(result)
-            
-            return jsonify(final_results), 200
+                return jsonify(final_results), 200
         except Exception as e:
-            return jsonify({'error': str(e)}), 500
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
+            return _analytics_error(e)
     
     @app.route('/api/analytics/best-value-products', methods=['GET'])
+    @response_cache.cached
+    @_columnar_section('best-value-products')
     def best_value_products():
-        conn = None
-        cursor = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            cursor.execute("""
+            limit = _limit_arg('best-value-products')
+            return _analytics_rows("""
                 SELECT 
                     p.product_id,
                     p.product_name,
                     p.category,
                     p.discounted_price_usd,
-                    AVG(r.rating) as avg_rating,
-                    COUNT(r.review_id) as review_count,
-                    (AVG(r.rating) / NULLIF(p.discounted_price_usd, 0)) * 1000 as value_score
+                    s.rating_sum / s.rating_count as avg_rating,
+                    s.rating_count as review_count,
+                    (s.rating_sum / s.rating_count / NULLIF(p.discounted_price_usd, 0)) * 1000 as value_score
                 FROM products p
-                JOIN reviews r ON p.product_id = r.product_id
+                JOIN product_stats s ON p.product_id = s.product_id
                 WHERE p.discounted_price_usd IS NOT NULL
                     AND p.discounted_price_usd > 0
-                    AND r.rating IS NOT NULL
-                GROUP BY p.product_id, p.product_name, p.category, p.discounted_price_usd
-                HAVING COUNT(r.review_id) >= 1
+                    AND s.rating_count >= 1
                 ORDER BY value_score DESC, avg_rating DESC
-                LIMIT 5
-            """)
-            results = cursor.fetchall()
-            
-            for result in results:
-                result['avg_rating'] = float(result['avg_rating']) if result['avg_rating'] else 0.0
-                result['review_count'] = int(result['review_count']) if result['review_count'] else 0
-                result['discounted_price_usd'] = float(result['discounted_price_usd']) if result['discounted_price_usd'] else 0.0
-                result['value_score'] = float(result['value_score']) if result['value_score'] else 0.0
-            
-            return jsonify(results), 200
+                LIMIT %s
+            """, (limit,))
+        except InvalidStreamFormat as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
-            return jsonify({'error': str(e)}), 500
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
+            return _analytics_error(e)
     
     @app.route('/api/analytics/review-length-rating', methods=['GET'])
+    @response_cache.cached
+    @_columnar_section('review-length-rating')
     def review_length_rating():
-        conn = None
-        cursor = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
+            top_n = max(1, int(request.args.get('top_n', 5)))
             
-            # Get summary stats by length category
-            cursor.execute("""
-                SELECT 
-                    CASE 
-                        WHEN r.review_length < 100 THEN 'Short (<100 chars)'
-                        WHEN r.review_length < 500 THEN 'Medium (100-500 chars)'
-                        WHEN r.review_length < 1000 THEN 'Long (500-1000 chars)'
-                        ELSE 'Very Long (1000+ chars)'
-                    END as length_category,
-                    AVG(r.rating) as avg_rating,
-                    AVG(r.sentiment_score) as avg_sentiment,
-                    AVG(r.review_length) as avg_length,
-                    COUNT(r.review_id) as review_count
-                FROM reviews r
-                WHERE r.review_length IS NOT NULL AND r.rating IS NOT NULL
-                GROUP BY length_category
-                ORDER BY 
-                    CASE length_category
-                        WHEN 'Short (<100 chars)' THEN 1
-                        WHEN 'Medium (100-500 chars)' THEN 2
-                        WHEN 'Long (500-1000 chars)' THEN 3
-                        ELSE 4
-                    END
-            """)
-            summary_results = cursor.fetchall()
-            
-            # Get top 5 products for each length category
-            final_results = []
-            for summary in summary_results:
-                length_category = summary['length_category']
-                
-                # Determine length conditions
-                if length_category == 'Short (<100 chars)':
-                    length_condition = "r.review_length < 100"
-                elif length_category == 'Medium (100-500 chars)':
-                    length_condition = "r.review_length >= 100 AND r.review_length < 500"
-                elif length_category == 'Long (500-1000 chars)':
-                    length_condition = "r.review_length >= 500 AND r.review_length < 1000"
-                else:  # Very Long (1000+ chars)
-                    length_condition = "r.review_length >= 1000"
-                
-                # Get top 5 products in this length category
-                cursor.execute(f"""
-                    SELECT 
-                        p.product_id,
-                        p.product_name,
-                        AVG(r.rating) as avg_rating,
-                        COUNT(r.review_id) as review_count
-                    FROM products p
-                    JOIN reviews r ON p.product_id = r.product_id
-                    WHERE {length_condition}
-                        AND r.review_length IS NOT NULL
-                        AND r.rating IS NOT NULL
-                    GROUP BY p.product_id, p.product_name
-                    HAVING COUNT(r.review_id) >= 1
-                    ORDER BY avg_rating DESC, review_count DESC
-                    LIMIT 5
-                """)
-                top_products = cursor.fetchall()
-                
-                # Format the result
-                result = {
-                    'length_category': length_category,
-                    'avg_rating': float(summary['avg_rating']) if summary['avg_rating'] else 0.0,
-                    'avg_sentiment': float(summary['avg_sentiment']) if summary['avg_sentiment'] else 0.0,
-                    'avg_length': float(summary['avg_length']) if summary['avg_length'] else 0.0,
-                    'review_count': int(summary['review_count']) if summary['review_count'] else 0,
-                    'top_products': []
-                }
-                
-                for product in top_products:
-                    result['top_products'].append({
-                        'product_id': product['product_id'],
-                        'product_name': product['product_name'],
-                        'avg_rating': float(product['avg_rating']) if product['avg_rating'] else 0.0,
-                        'review_count': int(product['review_count']) if product['review_count'] else 0
-                    })
+            with db_cursor() as cursor:
+                # Length is per review, so this one aggregates reviews into
+                # (length category, product) groups before ranking
+                cursor.execute("""
+                    SELECT * FROM (
+                        SELECT 
+                            length_category,
+                            SUM(rating_sum) OVER bucket / SUM(review_count) OVER bucket as bucket_avg_rating,
+                            SUM(sentiment_sum) OVER bucket / SUM(sentiment_count) OVER bucket as bucket_avg_sentiment,
+                            SUM(length_sum) OVER bucket / SUM(review_count) OVER bucket as bucket_avg_length,
+                            CAST(SUM(review_count) OVER bucket AS SIGNED) as bucket_review_count,
+                            product_id,
+                            product_name,
+                            rating_sum / review_count as avg_rating,
+                            review_count,
+                            ROW_NUMBER() OVER (
+                                PARTITION BY length_category
+                                ORDER BY rating_sum / review_count DESC, review_count DESC, product_id
+                            ) as product_rank
+                        FROM (
+                            SELECT 
+                                CASE 
+                                    WHEN r.review_length < 100 THEN 'Short (<100 chars)'
+                                    WHEN r.review_length < 500 THEN 'Medium (100-500 chars)'
+                                    WHEN r.review_length < 1000 THEN 'Long (500-1000 chars)'
+                                    ELSE 'Very Long (1000+ chars)'
+                                END as length_category,
+                                p.product_id,
+                                p.product_name,
+                                SUM(r.rating) as rating_sum,
+                                COUNT(r.review_id) as review_count,
+                                SUM(r.sentiment_score) as sentiment_sum,
+                                COUNT(r.sentiment_score) as sentiment_count,
+                                SUM(r.review_length) as length_sum
+                            FROM products p
+                            JOIN reviews r ON p.product_id = r.product_id
+                            WHERE r.review_length IS NOT NULL AND r.rating IS NOT NULL
+                            GROUP BY length_category, p.product_id
+                        ) per_product
+                        WINDOW bucket AS (PARTITION BY length_category)
+                    ) ranked
+                    WHERE product_rank <= %s
+                    ORDER BY 
+                        CASE length_category
+                            WHEN 'Short (<100 chars)' THEN 1
+                            WHEN 'Medium (100-500 chars)' THEN 2
+                            WHEN 'Long (500-1000 chars)' THEN 3
+                            ELSE 4
+                        END,
+                        product_rank
+                """, (top_n,))
+                final_results = _bucket_results(
+                    cursor.fetchall(),
+                    'length_category',
+                    [('avg_rating', 0.0), ('avg_sentiment', 0.0), ('avg_length', 0.0), ('review_count', 0)],
+                )
                 
-                final_results.append(result)
-            
-            return jsonify(final_results), 200
+                return jsonify(final_results), 200
         except Exception as e:
-            return jsonify({'error': str(e)}), 500
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
+            return _analytics_error(e)
     
     @app.route('/api/analytics/sentiment-by-category', methods=['GET'])
+    @response_cache.cached
+    @_columnar_section('sentiment-by-category')
     def sentiment_by_category():
-        conn = None
-        cursor = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
+            top_n = max(1, int(request.args.get('top_n', 5)))
             
-            # Get summary stats by first category segment
-            cursor.execute("""
-                SELECT 
-                    SUBSTRING_INDEX(p.category, '|', 1) AS first_category,
-                    AVG(r.sentiment_score) as avg_sentiment,
-                    AVG(r.rating) as avg_rating,
-                    COUNT(r.review_id) as review_count,
-                    COUNT(DISTINCT p.product_id) as product_count
-                FROM products p
-                JOIN reviews r ON p.product_id = r.product_id
-                WHERE p.category IS NOT NULL 
-                    AND p.category != ''
-                    AND r.sentiment_score IS NOT NULL
-                GROUP BY first_category
-                HAVING COUNT(r.review_id) >= 1
-                ORDER BY avg_sentiment DESC
-            """)
-            summary_results = cursor.fetchall()
-            
-            # Get top 5 products for each first-level category
-            final_results = []
-            for summary in summary_results:
-                first_category = summary['first_category']
-                
-                # Get top 5 products in this first-level category (including all subcategories)
+            with db_cursor() as cursor:
                 cursor.execute("""
-                    SELECT 
-                        p.product_id,
-                        p.product_name,
-                        AVG(r.rating) as avg_rating,
-                        COUNT(r.review_id) as review_count
-                    FROM products p
-                    JOIN reviews r ON p.product_id = r.product_id
-                    WHERE SUBSTRING_INDEX(p.category, '|', 1) = %s
-                        AND r.sentiment_score IS NOT NULL
-                    GROUP BY p.product_id, p.product_name
-                    HAVING COUNT(r.review_id) >= 1
-                    ORDER BY avg_rating DESC, review_count DESC
-                    LIMIT 5
-                """, (first_category,))
-                top_products = cursor.fetchall()
-                
-                # Format the result
-                result = {
-                    'category': first_category,
-                    'avg_sentiment': float(summary['avg_sentiment']) if summary['avg_sentiment'] else 0.0,
-                    'avg_rating': float(summary['avg_rating']) if summary['avg_rating'] else 0.0,
-                    'review_count': int(summary['review_count']) if summary['review_count'] else 0,
-                    'product_count': int(summary['product_count']) if summary['product_count'] else 0,
-                    'top_products': []
-                }
-                
-                for product in top_products:
-                    result['top_products'].append({
-                        'product_id': product['product_id'],
-                        'product_name': product['product_name'],
-                        'avg_rating': float(product['avg_rating']) if product['avg_rating'] else 0.0,
-                        'review_count': int(product['review_count']) if product['review_count'] else 0
-                    })
+                    SELECT * FROM (
+                        SELECT 
+                            p.top_category AS category,
+                            SUM(s.sentiment_sum) OVER bucket / SUM(s.sentiment_count) OVER bucket as bucket_avg_sentiment,
+                            SUM(s.paired_rating_sum) OVER bucket / NULLIF(SUM(s.paired_count) OVER bucket, 0) as bucket_avg_rating,
+                            CAST(SUM(s.sentiment_count) OVER bucket AS SIGNED) as bucket_review_count,
+                            COUNT(*) OVER bucket as bucket_product_count,
+                            p.product_id,
+                            p.product_name,
+                            s.paired_rating_sum / NULLIF(s.paired_count, 0) as avg_rating,
+                            s.sentiment_count as review_count,
+                            ROW_NUMBER() OVER (
+                                PARTITION BY p.top_category
+                                ORDER BY s.paired_rating_sum / NULLIF(s.paired_count, 0) DESC,
+                                    s.sentiment_count DESC, p.product_id
+                            ) as product_rank
+                        FROM products p
+                        JOIN product_stats s ON p.product_id = s.product_id
+                        WHERE p.top_category IS NOT NULL
+                            AND s.sentiment_count >= 1
+                        WINDOW bucket AS (PARTITION BY p.top_category)
+                    ) ranked
+                    WHERE product_rank <= %s
+                    ORDER BY bucket_avg_sentiment DESC, category, product_rank
+                """, (top_n,))
+                final_results = _bucket_results(
+                    cursor.fetchall(),
+                    'category',
+                    [('avg_sentiment', 0.0), ('avg_rating', 0.0), ('review_count', 0), ('product_count', 0)],
+                )
                 
-                final_results.append(result)
-            
-            return jsonify(final_results), 200
+                return jsonify(final_results), 200
         except Exception as e:
-            return jsonify({'error': str(e)}), 500
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
+            return _analytics_error(e)
     
     @app.route('/api/analytics/discount-review-quality', methods=['GET'])
+    @response_cache.cached
+    @_columnar_section('discount-review-quality')
     def discount_review_quality():
-        conn = None
-        cursor = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            # Get summary stats by discount range
-            cursor.execute("""
-                SELECT 
-                    CASE 
-                        WHEN p.discount_percentage < 25 THEN '0-25% off'
-                        WHEN p.discount_percentage < 50 THEN '25-50% off'
-                        WHEN p.discount_percentage < 75 THEN '50-75% off'
-                        ELSE '75%+ off'
-                    END as discount_range,
-                    AVG(r.rating) as avg_rating,
-                    AVG(r.sentiment_score) as avg_sentiment,
-                    COUNT(r.review_id) as review_count,
-                    COUNT(DISTINCT p.product_id) as product_count
-                FROM products p
-                JOIN reviews r ON p.product_id = r.product_id
-                WHERE p.discount_percentage IS NOT NULL
-                    AND r.rating IS NOT NULL
-                GROUP BY discount_range
-                ORDER BY 
-                    CASE discount_range
-                        WHEN '0-25% off' THEN 1
-                        WHEN '25-50% off' THEN 2
-                        WHEN '50-75% off' THEN 3
-                        ELSE 4
-                    END
-            """)
-            summary_results = cursor.fetchall()
+            top_n = max(1, int(request.args.get('top_n', 5)))
             
-            # Get top 5 products for each discount range
-            final_results = []
-            for summary in summary_results:
-                discount_range = summary['discount_range']
-                
-                # Determine discount conditions
-                if discount_range == '0-25% off':
-                    discount_condition = "p.discount_percentage < 25"
-                elif discount_range == '25-50% off':
-                    discount_condition = "p.discount_percentage >= 25 AND p.discount_percentage < 50"
-                elif discount_range == '50-75% off':
-                    discount_condition = "p.discount_percentage >= 50 AND p.discount_percentage < 75"
-                else:  # 75%+ off
-                    discount_condition = "p.discount_percentage >= 75"
-                
-                # Get top 5 products in this discount range
-                cursor.execute(f"""
-                    SELECT 
-                        p.product_id,
-                        p.product_name,
-                        AVG(r.rating) as avg_rating,
-                        COUNT(r.review_id) as review_count
-                    FROM products p
-                    JOIN reviews r ON p.product_id = r.product_id
-                    WHERE {discount_condition}
-                        AND p.discount_percentage IS NOT NULL
-                        AND r.rating IS NOT NULL
-                    GROUP BY p.product_id, p.product_name
-                    HAVING COUNT(r.review_id) >= 1
-                    ORDER BY avg_rating DESC, review_count DESC
-                    LIMIT 5
-                """)
-                top_products = cursor.fetchall()
-                
-                # Format the result
-                result = {
-                    'discount_range': discount_range,
-                    'avg_rating': float(summary['avg_rating']) if summary['avg_rating'] else 0.0,
-                    'avg_sentiment': float(summary['avg_sentiment']) if summary['avg_sentiment'] else 0.0,
-                    'review_count': int(summary['review_count']) if summary['review_count'] else 0,
-                    'product_count': int(summary['product_count']) if summary['product_count'] else 0,
-                    'top_products': []
-                }
-                
-                for product in top_products:
-                    result['top_products'].append({
-                        'product_id': product['product_id'],
-                        'product_name': product['product_name'],
-                        'avg_rating': float(product['avg_rating']) if product['avg_rating'] else 0.0,
-                        'review_count': int(product['review_count']) if product['review_count'] else 0
-                    })
+            with db_cursor() as cursor:
+                cursor.execute("""
+                    SELECT * FROM (
+                        SELECT 
+                            discount_range,
+                            SUM(rating_sum) OVER bucket / SUM(rating_count) OVER bucket as bucket_avg_rating,
+                            SUM(paired_sentiment_sum) OVER bucket / NULLIF(SUM(paired_count) OVER bucket, 0) as bucket_avg_sentiment,
+                            CAST(SUM(rating_count) OVER bucket AS SIGNED) as bucket_review_count,
+                            COUNT(*) OVER bucket as bucket_product_count,
+                            product_id,
+                            product_name,
+                            rating_sum / rating_count as avg_rating,
+                            rating_count as review_count,
+                            ROW_NUMBER() OVER (
+                                PARTITION BY discount_range
+                                ORDER BY rating_sum / rating_count DESC, rating_count DESC, product_id
+                            ) as product_rank
+                        FROM (
+                            SELECT 
+                                p.discount_range,
+                                p.product_id,
+                                p.product_name,
+                                s.rating_sum,
+                                s.rating_count,
+                                s.paired_sentiment_sum,
+                                s.paired_count
+                            FROM products p
+                            JOIN product_stats s ON p.product_id = s.product_id
+                            WHERE p.discount_range IS NOT NULL
+                                AND s.rating_count >= 1
+                        ) per_product
+                        WINDOW bucket AS (PARTITION BY discount_range)
+                    ) ranked
+                    WHERE product_rank <= %s
+                    ORDER BY 
+                        CASE discount_range
+                            WHEN '0-25% off' THEN 1
+                            WHEN '25-50% off' THEN 2
+                            WHEN '50-75% off' THEN 3
+                            ELSE 4
+                        END,
+                        product_rank
+                """, (top_n,))
+                final_results = _bucket_results(
+                    cursor.fetchall(),
+                    'discount_range',
+                    [('avg_rating', 0.0), ('avg_sentiment', 0.0), ('review_count', 0), ('product_count', 0)],
+                )
                 
-                final_results.append(result)
-            
-            return jsonify(final_results), 200
+                return jsonify(final_results), 200
         except Exception as e:
-            return jsonify({'error': str(e)}), 500
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
+            return _analytics_error(e)
     
     @app.route('/api/analytics/rating-variance', methods=['GET'])
+    @response_cache.cached
+    @_columnar_section('rating-variance')
     def rating_variance():
-        conn = None
-        cursor = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            cursor.execute("""
+            limit = _limit_arg('rating-variance')
+            return _analytics_rows("""
                 SELECT 
                     p.product_id,
                     p.product_name,
                     p.category,
-                    AVG(r.rating) as avg_rating,
-                    STDDEV_POP(r.rating) as rating_stddev,
-                    COUNT(r.review_id) as review_count,
-                    MIN(r.rating) as min_rating,
-                    MAX(r.rating) as max_rating
+                    s.rating_sum / s.rating_count as avg_rating,
+                    -- Population stddev from the sums; the variance is
+                    -- computed in exact DECIMAL so equal ratings give 0
+                    SQRT((s.rating_count * s.rating_sum_sq - s.rating_sum * s.rating_sum)
+                         / (s.rating_count * s.rating_count)) as rating_stddev,
+                    s.rating_count as review_count,
+                    s.rating_min as min_rating,
+                    s.rating_max as max_rating
                 FROM products p
-                JOIN reviews r ON p.product_id = r.product_id
-                WHERE r.rating IS NOT NULL
-                GROUP BY p.product_id, p.product_name, p.category
-                HAVING COUNT(r.review_id) >= 1
+                JOIN product_stats s ON p.product_id = s.product_id
+                WHERE s.rating_count >= 1
                 ORDER BY rating_stddev ASC, avg_rating DESC
-                LIMIT 20
-            """)
-            results = cursor.fetchall()
-            
-            for result in results:
-                result['avg_rating'] = float(result['avg_rating']) if result['avg_rating'] else 0.0
-                result['rating_stddev'] = float(result['rating_stddev']) if result['rating_stddev'] else 0.0
-                result['review_count'] = int(result['review_count']) if result['review_count'] else 0
-                result['min_rating'] = float(result['min_rating']) if result['min_rating'] else 0.0
-                result['max_rating'] = float(result['max_rating']) if result['max_rating'] else 0.0
-            
-            return jsonify(results), 200
+                LIMIT %s
+            """, (limit,))
+        except InvalidStreamFormat as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
-            return jsonify({'error': str(e)}), 500
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
+            return _analytics_error(e)
     
     @app.route('/api/analytics/sentiment-rating-comparison', methods=['GET'])
+    @response_cache.cached
+    @_columnar_section('sentiment-rating-comparison')
     def sentiment_rating_comparison():
-        conn = None
-        cursor = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            cursor.execute("""
+            limit = _limit_arg('sentiment-rating-comparison')
+            return _analytics_rows("""
                 SELECT 
-                    p.product_id,
-                    p.product_name,
-                    p.category,
-                    AVG(r.rating) as avg_rating,
-                    AVG(r.sentiment_score) as avg_sentiment,
-                    COUNT(r.review_id) as review_count,
+                    product_id,
+                    product_name,
+                    category,
+                    avg_rating,
+                    avg_sentiment,
+                    review_count,
                     CASE 
-                        WHEN AVG(r.sentiment_score) > AVG(r.rating) / 5.0 * 1.0 THEN 'Sentiment Higher'
-                        WHEN AVG(r.sentiment_score) < AVG(r.rating) / 5.0 * 0.8 THEN 'Rating Higher'
+                        WHEN avg_sentiment > avg_rating / 5.0 * 1.0 THEN 'Sentiment Higher'
+                        WHEN avg_sentiment < avg_rating / 5.0 * 0.8 THEN 'Rating Higher'
                         ELSE 'Aligned'
                     END as comparison
-                FROM products p
-                JOIN reviews r ON p.product_id = r.product_id
-                WHERE r.rating IS NOT NULL 
-                    AND r.sentiment_score IS NOT NULL
-                GROUP BY p.product_id, p.product_name, p.category
-                HAVING COUNT(r.review_id) >= 1
-                ORDER BY ABS(AVG(r.sentiment_score) - (AVG(r.rating) / 5.0)) DESC
-                LIMIT 30
-            """)
-            results = cursor.fetchall()
-            
-            for result in results:
-                result['avg_rating'] = float(result['avg_rating']) if result['avg_rating'] else 0.0
-                result['avg_sentiment'] = float(result['avg_sentiment']) if result['avg_sentiment'] else 0.0
-                result['review_count'] = int(result['review_count']) if result['review_count'] else 0
-            
+                FROM (
+                    SELECT 
+                        p.product_id,
+                        p.product_name,
+                        p.category,
+                        s.paired_rating_sum / s.paired_count as avg_rating,
+                        s.paired_sentiment_sum / s.paired_count as avg_sentiment,
+                        s.paired_count as review_count
+                    FROM products p
+                    JOIN product_stats s ON p.product_id = s.product_id
+                    WHERE s.paired_count >= 1
+                ) per_product
+                ORDER BY ABS(avg_sentiment - (avg_rating / 5.0)) DESC
+                LIMIT %s
+            """, (limit,))
+        except InvalidStreamFormat as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            return _analytics_error(e)
+    
+    @app.route('/api/analytics/all', methods=['GET'])
+    @response_cache.cached
+    def all_analytics():
+        # The eight analytics above in one response, keyed by route name.
+        # One read of products + product_stats feeds every section; the
+        # review-length section adds one grouped pass over reviews, run
+        # alongside it (see api/analytics.py)
+        try:
+            sections = parse_sections(request.args.get('sections'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        try:
+            top_n = max(1, int(request.args.get('top_n', 5)))
+            # ?limit= applies to the flat sections (see DEFAULT_LIMITS)
+            limit = max(1, int(request.args['limit'])) if request.args.get('limit') else None
+            
+            def fetch_rows(sql):
+                def fetch(cursor):
+                    cursor.execute(sql)
+                    return cursor.fetchall()
+                return fetch
+            
+            if columnar is not None:
+                return jsonify(columnar.get().compute(sections, top_n, limit)), 200
+            
+            tasks = {'products': fetch_rows(PRODUCT_ROWS_SQL)}
+            if needs_length_groups(sections):
+                tasks['length_groups'] = fetch_rows(LENGTH_GROUPS_SQL)
+            fetched = run_concurrently(tasks, db_cursor)
+            
+            results = compute_sections(
+                sections, fetched['products'], fetched.get('length_groups', []), top_n, limit
+            )
             return jsonify(results), 200
         except Exception as e:
-            return jsonify({'error': str(e)}), 500
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-
+            return _analytics_error(e)
@@ -0,0 +1,138 @@
+"""
+Stream large result sets instead of building them in memory.
+
+Routes that can return many rows take ?stream=json or ?stream=ndjson:
+    json    the same document as the normal response, sent in chunks
+            as the rows are read
+    ndjson  one JSON object per line (application/x-ndjson)
+
+Rows come from an unbuffered cursor in fetchmany() batches, so a
+request holds one batch at a time however large `limit` is. The
+response keeps its pooled connection until the last row is sent.
+
+    STREAM_FETCH_SIZE=1000  # rows per fetchmany()
+    STREAM_CHUNK_ROWS=200   # rows per chunk written to the client
+"""
+
+import os
+from contextlib import ExitStack
+from typing import Callable, Iterable, Optional
+
+from flask import current_app
+
+STREAM_FETCH_SIZE = int(os.getenv("STREAM_FETCH_SIZE", 1000))
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", 200))
+
+STREAM_MIMETYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class InvalidStreamFormat(ValueError):
+    pass
+
+
+def stream_format(value: Optional[str]) -> Optional[str]:
+    """The ?stream= value, or None for a normal response."""
+    if not value:
+        return None
+    if value not in STREAM_MIMETYPES:
+        raise InvalidStreamFormat(f"stream must be one of: {', '.join(STREAM_MIMETYPES)}")
+    return value
+
+
+class StreamingQuery:
+    """
+    Run a query on its own pooled cursor and iterate its rows batch by batch.
+
+    The query runs when the object is created, so SQL errors still become
+    a normal error response. close() returns the connection; rows a client
+    hung up on are read off first so the cursor closes cleanly.
+    """
+
+    def __init__(self, cursor_factory: Callable, sql: str, params=(), fetch_size: int = STREAM_FETCH_SIZE):
+        self.fetch_size = fetch_size
+        self._stack = ExitStack()
+        self._cursor = self._stack.enter_context(cursor_factory())
+        self._done = False
+        try:
+            self._cursor.execute(sql, tuple(params))
+        except Exception:
+            self._stack.close()
+            raise
+
+    def __iter__(self):
+        while True:
+            rows = self._cursor.fetchmany(self.fetch_size)
+            if not rows:
+                self._done = True
+                return
+            yield from rows
+
+    def close(self) -> None:
+        try:
+            if not self._done:
+                while self._cursor.fetchmany(self.fetch_size):
+                    pass
+        finally:
+            self._stack.close()
+
+
+def stream_response(
+    rows: Iterable[dict],
+    fmt: str,
+    field: Optional[str] = None,
+    envelope: Optional[Callable[[], dict]] = None,
+    on_close: Optional[Callable[[], None]] = None,
+):
+    """
+    Response that serializes `rows` as they are read, STREAM_CHUNK_ROWS per chunk.
+
+    With `field`, the json format wraps the rows as {field: [...]} plus
+    the keys envelope() returns once the rows are exhausted; ndjson sends
+    those keys as a last line. Without it the rows form a plain array.
+    """
+    provider = current_app.json
+
+    def dumps(value):
+        # Compact, like jsonify() outside debug mode
+        return provider.dumps(value, separators=(",", ":"))
+
+    def chunks(rows, separator):
+        # Join rows into chunks rather than writing one tiny chunk per row
+        parts = []
+        for row in rows:
+            parts.append(dumps(row))
+            if len(parts) == STREAM_CHUNK_ROWS:
+                yield separator.join(parts)
+                parts = []
+        if parts:
+            yield separator.join(parts)
+
+    def generate_json():
+        if field is None:
+            yield "["
+        else:
+            yield "{" + dumps(field) + ":["
+        first = True
+        for chunk in chunks(rows, ","):
+            yield ("" if first else ",") + chunk
+            first = False
+        if field is None:
+            yield "]"
+            return
+        rest = envelope() if envelope else {}
+        yield "]" + ("," + dumps(rest)[1:] if rest else "}")
+
+    def generate_ndjson():
+        for chunk in chunks(rows, "\n"):
+            yield chunk + "\n"
+        if envelope:
+            yield dumps(envelope()) + "\n"
+
+    generate = generate_json if fmt == "json" else generate_ndjson
+    response = current_app.response_class(generate(), mimetype=STREAM_MIMETYPES[fmt])
+    if on_close is not None:
+        response.call_on_close(on_close)
+    return response
@@ -0,0 +1,9 @@
+"""
+Benchmarks for the backend. Run from the backend folder, e.g.:
+    cd backend
+    python -m benchmarks.bench_search
+
+Each prints its results as one JSON document; --output FILE also saves
+it, and benchmarks.compare diffs two saved runs. generate_data writes a
+synthetic review CSV of any size for the ETL and route benchmarks.
+"""
@@ -0,0 +1,46 @@
+"""
+Benchmark output that can be diffed across commits.
+
+Every benchmark prints one JSON document: its name, the commit it ran
+on, the options it was given and its results, with sorted keys and no
+timestamps. --output also writes it to a file, and benchmarks.compare
+lines two such files up.
+"""
+
+import json
+import subprocess
+from pathlib import Path
+
+# Options that say how to run, not what was measured
+NOT_PARAMS = ("output", "force")
+
+
+def add_output_argument(parser):
+    parser.add_argument("--output", help="also write the results to this JSON file")
+
+
+def git_commit():
+    """Short hash of the checked-out commit, with "+dirty" for local changes, or None."""
+    cwd = Path(__file__).resolve().parent
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=cwd, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=cwd, capture_output=True, text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("+dirty" if dirty else "")
+
+
+def report(benchmark, args, results):
+    """Print the results document and write it to args.output when given."""
+    params = {k: v for k, v in sorted(vars(args).items()) if k not in NOT_PARAMS}
+    document = {"benchmark": benchmark, "commit": git_commit(), "params": params, "results": results}
+    text = json.dumps(document, indent=2, sort_keys=True, default=str)
+    print(text)
+    output = getattr(args, "output", None)
+    if output:
+        Path(output).write_text(text + "\n", encoding="utf-8")
+    return document
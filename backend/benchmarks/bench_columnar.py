@@ -0,0 +1,76 @@
+"""
+Benchmark the analytics routes: SQL vs the columnar engine.
+
+Times every /api/analytics/* route with ANALYTICS_ENGINE=sql and with the
+in-memory columnar engine (api/columnar.py) against the database in
+backend/db/.env, with the response cache off, and checks that both
+return byte-identical bodies. Also reports how long the engine takes to
+load and the size of its arrays. Needs numpy.
+
+    cd backend
+    python -m benchmarks.bench_columnar --runs 20
+"""
+
+import argparse
+import os
+import time
+
+os.environ["CACHE_BACKEND"] = "none"
+
+from api import create_app  # noqa: E402
+import api.routes as routes  # noqa: E402
+from api.analytics import SECTIONS  # noqa: E402
+from api.columnar import ColumnarHolder  # noqa: E402
+
+from benchmarks._results import add_output_argument, report  # noqa: E402
+from benchmarks._timing import summarize, timed  # noqa: E402
+
+PATHS = [f"/api/analytics/{name}" for name in SECTIONS] + ["/api/analytics/all"]
+
+
+def time_paths(client, runs):
+    results, bodies = {}, {}
+    for path in PATHS:
+        samples_ms = []
+        for _ in range(runs):
+            with timed(samples_ms):
+                response = client.get(path)
+            assert response.status_code == 200, (path, response.get_json())
+        bodies[path] = response.get_data()
+        results[path] = summarize(samples_ms)
+    return results, bodies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    client = create_app().test_client()
+
+    routes.columnar = None
+    sql, sql_bodies = time_paths(client, args.runs)
+
+    routes.columnar = ColumnarHolder(routes._load_columnar, routes.data_version.current)
+    start = time.perf_counter()
+    routes.columnar.get()
+    load_seconds = time.perf_counter() - start
+    columnar, columnar_bodies = time_paths(client, args.runs)
+
+    report("bench_columnar", args, {
+        "columnar_load_seconds": round(load_seconds, 3),
+        "columnar": routes.columnar.stats(),
+        "routes": {
+            path: {
+                "sql": sql[path],
+                "columnar": columnar[path],
+                "identical": sql_bodies[path] == columnar_bodies[path],
+            }
+            for path in PATHS
+        },
+    })
+
+
+if __name__ == "__main__":
+    main()
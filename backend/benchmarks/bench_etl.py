@@ -0,0 +1,223 @@
+"""
+Benchmark the ETL: per-row inserts vs the batched loader.
+
+Loads the same CSV twice into the database configured in backend/db/.env,
+once the old way (one execute per product, user and review, one commit at
+the end) and once with db/etl.py, and reports rows/s, round trips and a
+CHECKSUM TABLE of the result so both loads can be compared.
+
+Both runs start by emptying products, users, reviews and product_stats,
+so point DB_NAME at a scratch database and pass --force.
+
+    cd backend
+    python -m benchmarks.bench_etl --force --batch-sizes 500 2000 5000 --workers 2 4 8
+
+--workers adds runs of the parallel pipeline (one writer, so the result
+must still match the per-row load) to show how wall time scales with
+cores. --initial-load adds a run of the bulk-load path (db/bulk_load.py)
+with its per-phase timings.
+
+--generate loads a synthetic CSV from benchmarks.generate_data instead
+of --csv (the generator's options apply, e.g. --products 20000
+--reviews-per-product 10), so throughput can be compared across commits
+and dataset shapes.
+"""
+
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+# etl.py is a script that imports its siblings directly
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "db"))
+
+import etl  # noqa: E402
+from bulk_load import run_initial_load  # noqa: E402
+from db_connection import get_db_connection  # noqa: E402
+from product_stats import refresh_product_stats  # noqa: E402
+
+from benchmarks._results import add_output_argument, report  # noqa: E402
+from benchmarks._timing import CountingCursor  # noqa: E402
+from benchmarks.generate_data import add_generator_arguments, generate, generator_options  # noqa: E402
+
+TABLES = ("product_stats", "reviews", "users", "products")
+
+
+class CountingConnection:
+    """Connection proxy whose cursors count execute()/executemany() calls."""
+
+    def __init__(self, conn, counter):
+        self._conn = conn
+        self._counter = counter
+
+    def cursor(self, *args, **kwargs):
+        return _CountingManyCursor(self._conn.cursor(*args, **kwargs), self._counter)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class _CountingManyCursor(CountingCursor):
+    def executemany(self, *args, **kwargs):
+        self._counter["statements"] += 1
+        return self._cursor.executemany(*args, **kwargs)
+
+
+def empty_tables(conn):
+    cursor = conn.cursor()
+    for table in TABLES:
+        cursor.execute(f"DELETE FROM {table}")
+    conn.commit()
+    cursor.close()
+
+
+def checksum(conn):
+    cursor = conn.cursor()
+    cursor.execute("CHECKSUM TABLE products, users, reviews, product_stats")
+    result = {row[0].split(".")[-1]: row[1] for row in cursor.fetchall()}
+    cursor.close()
+    return result
+
+
+def legacy_load(conn, csv_path):
+    """The loader as it was: one statement per row, a single commit at the end."""
+    cursor = conn.cursor()
+    rows = 0
+    touched = set()
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            product, users, reviews = etl.transform_row(row)
+            cursor.execute(etl.PRODUCT_SQL, etl.product_params(product))
+            for user, review in zip(users, reviews):
+                cursor.execute(etl.USER_SQL, user)
+                cursor.execute(etl.REVIEW_SQL, etl.review_params(review, user))
+            if reviews:
+                touched.add(product[0])
+            rows += 1 + len(users) + len(reviews)
+    refresh_product_stats(cursor, touched)
+    conn.commit()
+    cursor.close()
+    return rows
+
+
+def run(label, load, counter):
+    counter["statements"] = 0
+    conn = get_db_connection()
+    try:
+        empty_tables(conn)
+        start = time.perf_counter()
+        rows = load(CountingConnection(conn, counter))
+        seconds = time.perf_counter() - start
+        return {
+            "loader": label,
+            "rows": rows,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(rows / seconds, 1) if seconds else 0.0,
+            "round_trips": counter["statements"],
+            "checksum": checksum(conn),
+        }
+    finally:
+        conn.close()
+
+
+def run_pipeline(csv_path, workers, batch_size):
+    """The pipeline opens its own connections, so round trips aren't counted."""
+    conn = get_db_connection()
+    try:
+        empty_tables(conn)
+        stats = etl.run_parallel_etl(csv_path, workers=workers, batch_size=batch_size,
+                                       sentiment_mode="csv")
+        return {
+            "loader": f"pipeline-{workers}-workers",
+            "rows": stats["products"] + stats["users"] + stats["reviews"],
+            "seconds": stats["seconds"],
+            "rows_per_second": stats["rows_per_second"],
+            "round_trips": None,
+            "checksum": checksum(conn),
+        }
+    finally:
+        conn.close()
+
+
+def run_bulk(csv_path):
+    """etl.py --initial-load; it swaps in new tables, so round trips aren't counted."""
+    conn = get_db_connection()
+    try:
+        empty_tables(conn)
+        stats = run_initial_load(csv_path, sentiment_mode="csv")
+        return {
+            "loader": "initial-load",
+            "rows": stats["products"] + stats["users"] + stats["reviews"],
+            "seconds": stats["seconds"],
+            "rows_per_second": stats["rows_per_second"],
+            "round_trips": None,
+            "phases": stats["phases"],
+            "checksum": checksum(conn),
+        }
+    finally:
+        conn.close()
+
+
+def batched_load(csv_path, batch_size):
+    def load(conn):
+        writer = etl.BatchWriter(conn, batch_size)
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                writer.add(*etl.transform_row(row))
+        stats = writer.close()
+        return stats["products"] + stats["users"] + stats["reviews"]
+    return load
+
+
+def run_all(args):
+    counter = {"statements": 0}
+    results = [run("per-row", lambda conn: legacy_load(conn, args.csv), counter)]
+    for batch_size in args.batch_sizes:
+        results.append(run(f"batched-{batch_size}", batched_load(args.csv, batch_size), counter))
+    pipeline_batch_size = args.batch_sizes[-1] if args.batch_sizes else etl.BATCH_SIZE_DEFAULT
+    for workers in args.workers:
+        results.append(run_pipeline(args.csv, workers, pipeline_batch_size))
+    if args.initial_load:
+        results.append(run_bulk(args.csv))
+
+    reference = results[0]["checksum"]
+    for result in results[1:]:
+        result["same_contents_as_per_row"] = result["checksum"] == reference
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--csv", default=etl.CSV_PATH_DEFAULT)
+    parser.add_argument("--batch-sizes", type=int, nargs="*", default=[500, 2000, 5000])
+    parser.add_argument("--workers", type=int, nargs="*", default=[],
+                        help="worker counts for pipeline runs (batch size: the last --batch-sizes)")
+    parser.add_argument("--initial-load", action="store_true", help="add a run of the bulk-load path")
+    parser.add_argument("--force", action="store_true",
+                        help="allow emptying the tables of the configured database")
+    parser.add_argument("--generate", action="store_true", help="load a generated CSV instead of --csv")
+    add_generator_arguments(parser)
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    if not args.force:
+        raise SystemExit("This empties the configured database's tables; rerun with --force.")
+
+    if args.generate:
+        with tempfile.TemporaryDirectory() as tmp:
+            args.csv = os.path.join(tmp, "reviews.csv")
+            dataset = generate(args.csv, **generator_options(args))
+            results = run_all(args)
+        # Temporary paths differ from run to run; keep them out of the results
+        dataset.pop("path")
+        args.csv = None
+    else:
+        dataset = None
+        results = run_all(args)
+    report("bench_etl", args, {"dataset": dataset, "loaders": results})
+
+
+if __name__ == "__main__":
+    main()
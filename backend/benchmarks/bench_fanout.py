@@ -0,0 +1,55 @@
+"""
+Benchmark api.fanout: independent queries in sequence vs concurrently.
+
+Runs N queries that each take a known time (SELECT SLEEP(...)) against
+the database in backend/db/.env, once one after another on the request
+thread and once through run_concurrently(), and reports the latency of
+each. With the fan-out the total should approach the slowest query,
+up to the QUERY_FANOUT_PER_REQUEST cap.
+
+    cd backend
+    python -m benchmarks.bench_fanout --queries 4 --sleep 0.05
+"""
+
+import argparse
+
+from api.fanout import QUERY_FANOUT_PER_REQUEST, QUERY_FANOUT_WORKERS, run_concurrently
+from db.db_connection import db_cursor
+
+from benchmarks._results import add_output_argument, report
+from benchmarks._timing import summarize, timed
+
+
+def sleep_task(seconds):
+    def task(cursor):
+        cursor.execute("SELECT SLEEP(%s) AS slept", (seconds,))
+        return cursor.fetchone()
+    return task
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=4)
+    parser.add_argument("--sleep", type=float, default=0.05, help="seconds per query")
+    parser.add_argument("--runs", type=int, default=20)
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    tasks = {f"q{i}": sleep_task(args.sleep) for i in range(args.queries)}
+    results = {
+        "queries": args.queries,
+        "query_ms": args.sleep * 1000,
+        "fanout_workers": QUERY_FANOUT_WORKERS,
+        "fanout_per_request": QUERY_FANOUT_PER_REQUEST,
+    }
+    for label, limit in (("sequential", 1), ("concurrent", QUERY_FANOUT_PER_REQUEST)):
+        samples_ms = []
+        for _ in range(args.runs):
+            with timed(samples_ms):
+                run_concurrently(tasks, db_cursor, limit=limit)
+        results[label] = summarize(samples_ms)
+    report("bench_fanout", args, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark JSON encoding: per-row Decimal loops vs the JSON providers.
+
+Part one encodes the rows of one wide query (every product with its
+review rollup, as mysql-connector returns them with Decimal columns)
+three ways: the old handler style of converting each Decimal with
+float()/int() and then using Flask's stock encoder, the stdlib provider
+from api/json_provider.py, and the orjson provider. Part two times the
+analytics routes end to end with each provider, response cache off, and
+reports response sizes.
+
+    cd backend
+    python -m benchmarks.bench_json --runs 50
+"""
+
+import argparse
+import json
+import os
+from decimal import Decimal
+
+os.environ["CACHE_BACKEND"] = "none"
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from api import create_app  # noqa: E402
+from api.analytics import PRODUCT_ROWS_SQL, SECTIONS  # noqa: E402
+from api.json_provider import OrjsonProvider, StdlibJSONProvider, orjson  # noqa: E402
+from db.db_connection import db_cursor  # noqa: E402
+
+from benchmarks._results import add_output_argument, report  # noqa: E402
+from benchmarks._timing import summarize, timed  # noqa: E402
+
+PATHS = [f"/api/analytics/{name}" for name in SECTIONS] + ["/api/analytics/all"]
+
+
+def legacy_convert(rows):
+    """What the handlers did before: float()/int() on every Decimal, NULL as 0."""
+    converted = []
+    for row in rows:
+        row = dict(row)
+        for field, value in row.items():
+            if isinstance(value, Decimal):
+                row[field] = float(value) if value else 0.0
+        converted.append(row)
+    return converted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=50)
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    app = create_app()
+    providers = {"stdlib": StdlibJSONProvider(app)}
+    if orjson is not None:
+        providers["orjson"] = OrjsonProvider(app)
+    stock = DefaultJSONProvider(app)
+
+    with db_cursor() as cursor:
+        cursor.execute(PRODUCT_ROWS_SQL)
+        rows = cursor.fetchall()
+
+    encoders = {"legacy_loop": lambda: stock.dumps(legacy_convert(rows), separators=(",", ":"))}
+    for name, provider in providers.items():
+        encoders[name] = lambda provider=provider: provider.dumps(rows, separators=(",", ":"))
+
+    encoding = {"rows": len(rows)}
+    for name, encode in encoders.items():
+        samples_ms = []
+        for _ in range(args.runs):
+            with timed(samples_ms):
+                body = encode()
+        encoding[name] = dict(summarize(samples_ms), bytes=len(body.encode()))
+
+    client = app.test_client()
+    routes = {}
+    for name, provider in providers.items():
+        app.json = provider
+        for path in PATHS:
+            samples_ms = []
+            for _ in range(args.runs):
+                with timed(samples_ms):
+                    response = client.get(path)
+            assert response.status_code == 200, (path, response.get_json())
+            routes.setdefault(path, {})[name] = dict(summarize(samples_ms), bytes=len(response.get_data()))
+
+    report("bench_json", args, {"encode_product_rows": encoding, "routes": routes})
+
+
+if __name__ == "__main__":
+    main()
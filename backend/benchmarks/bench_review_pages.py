@@ -0,0 +1,142 @@
+"""
+Benchmark /api/products/<id>/reviews: page 1 vs page 1000, offset vs cursor.
+
+Adds a synthetic product with 100k reviews to the database configured in
+backend/db/.env (removed again at the end unless --keep), then times the
+first page and a deep page with ?offset= and with ?after= cursors.
+
+    cd backend
+    python -m benchmarks.bench_review_pages --reviews 100000 --page 1000
+"""
+
+import argparse
+import random
+
+from api import create_app
+from api.pagination import encode_cursor
+from db.db_connection import db_cursor, get_db_connection
+from db.product_stats import refresh_product_stats
+
+from benchmarks._results import add_output_argument, report
+from benchmarks._timing import summarize, timed
+
+PRODUCT_ID = "BENCH-PAGINATION"
+USERS = 1000
+INSERT_CHUNK = 5000
+
+
+def seed(review_count, seed=17):
+    rng = random.Random(seed)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "INSERT IGNORE INTO products (product_id, product_name) VALUES (%s, %s)",
+            (PRODUCT_ID, "Pagination benchmark product"),
+        )
+        cursor.executemany(
+            "INSERT IGNORE INTO users (user_id, user_name) VALUES (%s, %s)",
+            [(f"{PRODUCT_ID}-U{i}", f"user {i}") for i in range(USERS)],
+        )
+        rows = []
+        for i in range(review_count):
+            # Few distinct ratings, so most of the order comes from review_id ties
+            rating = None if rng.random() < 0.02 else rng.choice([1, 2, 3, 3.5, 4, 4.5, 5])
+            rows.append((
+                f"{PRODUCT_ID}-R{i:07d}", PRODUCT_ID, f"{PRODUCT_ID}-U{rng.randrange(USERS)}",
+                "Review title", "Review text " * rng.randint(1, 20), rating, 80,
+            ))
+            if len(rows) == INSERT_CHUNK:
+                _insert_reviews(cursor, rows)
+                rows = []
+        if rows:
+            _insert_reviews(cursor, rows)
+        refresh_product_stats(cursor, [PRODUCT_ID])
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _insert_reviews(cursor, rows):
+    cursor.executemany(
+        """INSERT IGNORE INTO reviews
+           (review_id, product_id, user_id, review_title, review_content, rating, review_length)
+           VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+        rows,
+    )
+
+
+def cleanup():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM product_stats WHERE product_id = %s", (PRODUCT_ID,))
+        cursor.execute("DELETE FROM reviews WHERE product_id = %s", (PRODUCT_ID,))
+        cursor.execute("DELETE FROM users WHERE user_id LIKE %s", (f"{PRODUCT_ID}-U%",))
+        cursor.execute("DELETE FROM products WHERE product_id = %s", (PRODUCT_ID,))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def cursor_before_page(page, limit):
+    """The `after` token a client holds when asking for `page`."""
+    if page <= 1:
+        return None
+    with db_cursor() as cursor:
+        cursor.execute(
+            """SELECT rating, review_id FROM reviews WHERE product_id = %s
+               ORDER BY rating DESC, review_id LIMIT 1 OFFSET %s""",
+            (PRODUCT_ID, (page - 1) * limit - 1),
+        )
+        row = cursor.fetchone()
+    return encode_cursor(row["rating"], row["review_id"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reviews", type=int, default=100_000)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="leave the synthetic product in place")
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    seed(args.reviews)
+    try:
+        client = create_app().test_client()
+        path = f"/api/products/{PRODUCT_ID}/reviews"
+        deep_cursor = cursor_before_page(args.page, args.limit)
+        cases = {
+            "offset_page_1": {"limit": args.limit, "offset": 0},
+            f"offset_page_{args.page}": {"limit": args.limit, "offset": (args.page - 1) * args.limit},
+            "cursor_page_1": {"limit": args.limit},
+            f"cursor_page_{args.page}": {"limit": args.limit, "after": deep_cursor},
+        }
+
+        results = {}
+        first_ids = {}
+        for label, query in cases.items():
+            samples_ms = []
+            for _ in range(args.runs):
+                with timed(samples_ms):
+                    response = client.get(path, query_string=query)
+                assert response.status_code == 200, response.get_json()
+            first_ids[label] = [r["review_id"] for r in response.get_json()["reviews"]]
+            results[label] = summarize(samples_ms)
+
+        # Both modes must return the same deep page
+        results["deep_pages_match"] = (
+            first_ids[f"offset_page_{args.page}"] == first_ids[f"cursor_page_{args.page}"]
+        )
+        report("bench_review_pages", args, results)
+    finally:
+        if not args.keep:
+            cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Benchmark every route in api/routes.py.
+
+Sends each GET route (and a few variants, such as streamed and larger
+review pages) through the Flask test client against the database in
+backend/db/.env, with the response cache off, and reports latency
+percentiles plus the SQL statements, SQL time, rows fetched and
+response bytes per request (from api/metrics.py).
+
+By default it runs against whatever data is loaded. --generate first
+empties the tables and loads a synthetic dataset made by
+benchmarks.generate_data (the generator's options apply), so results
+from different commits are measured on identical data; point DB_NAME at
+a scratch database and pass --force.
+
+    cd backend
+    python -m benchmarks.bench_routes --generate --force --products 5000 --reviews-per-product 20 \\
+        --runs 20 --output /tmp/routes.json
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+os.environ["CACHE_BACKEND"] = "none"
+os.environ["METRICS_ENABLED"] = "1"
+
+from api import create_app  # noqa: E402
+from api import metrics  # noqa: E402
+from db.db_connection import db_cursor  # noqa: E402
+
+from benchmarks._results import add_output_argument, report  # noqa: E402
+from benchmarks._timing import summarize, timed  # noqa: E402
+from benchmarks.generate_data import add_generator_arguments, generate, generator_options  # noqa: E402
+
+# Query strings to send per route ("" is the bare route); {names} are
+# filled in from sample_targets()
+VARIANTS = {
+    "/api/products/search": ["?q={word}", "?q={word}%20{word2}"],
+    "/api/products/<product_id>/reviews": ["", "?limit=100", "?limit=1000&stream=ndjson", "?after={next_cursor}"],
+    "/api/analytics/best-value-products": ["", "?limit=500&stream=json"],
+    "/api/analytics/all": ["", "?sections=best-value-products,rating-variance"],
+}
+# Served by the benchmark harness itself, not worth timing
+SKIP = {"/api/metrics"}
+
+
+def load_generated(args):
+    """Empty the tables and load a generated CSV with the ETL."""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "db"))
+    import etl
+    from benchmarks.bench_etl import empty_tables
+    from db_connection import get_db_connection
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "reviews.csv")
+        dataset = generate(csv_path, **generator_options(args))
+        conn = get_db_connection()
+        try:
+            empty_tables(conn)
+        finally:
+            conn.close()
+        stats = etl.run_etl(csv_path, sentiment_mode="csv")
+    dataset.pop("path")
+    dataset["load_seconds"] = stats["seconds"]
+    return dataset
+
+
+def sample_targets(client):
+    """
+    The most-reviewed product, two words from its name and the cursor of
+    its second review page, so every route has rows to return.
+    """
+    with db_cursor() as cursor:
+        cursor.execute(
+            """SELECT p.product_id, p.product_name FROM products p
+               JOIN product_stats s ON s.product_id = p.product_id
+               ORDER BY s.review_count DESC, p.product_id LIMIT 1"""
+        )
+        row = cursor.fetchone()
+    if row is None:
+        raise SystemExit("No reviewed products found; load data first or pass --generate --force.")
+    words = [w for w in row["product_name"].split() if w.isalpha() and len(w) > 2] or ["a"]
+    page = client.get(f"/api/products/{row['product_id']}/reviews").get_json()
+    return {
+        "product_id": row["product_id"],
+        "word": words[0],
+        "word2": words[-1],
+        "next_cursor": page.get("next_cursor"),
+    }
+
+
+def route_paths(app, targets):
+    """
+    (label, rule, path) for every GET route and its variants, in a stable
+    order. Labels keep the {placeholders}, so they match across datasets.
+    """
+    paths = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if rule.endpoint == "static" or rule.rule in SKIP or "GET" not in rule.methods:
+            continue
+        base = rule.rule.replace("<product_id>", targets["product_id"])
+        for variant in VARIANTS.get(rule.rule, [""]):
+            if "{next_cursor}" in variant and not targets["next_cursor"]:
+                # The product has a single page of reviews
+                continue
+            paths.append((rule.rule + variant, rule.rule, base + variant.format(**targets)))
+    return paths
+
+
+def run(client, paths, runs):
+    results = {}
+    for label, rule, path in paths:
+        before = metrics.registry.snapshot().get((rule, "GET"))
+        samples_ms = []
+        for _ in range(runs):
+            with timed(samples_ms):
+                response = client.get(path)
+                response.get_data()
+                response.close()
+            assert response.status_code == 200, (path, response.status_code)
+        after = metrics.registry.snapshot()[(rule, "GET")]
+        per_request = {
+            key: round((after[key] - (before[key] if before else 0)) / runs, 6 if key == "sql_seconds" else 1)
+            for key in ("statements", "sql_seconds", "rows", "response_bytes")
+        }
+        results[label] = {**summarize(samples_ms), **per_request}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--generate", action="store_true", help="load a generated dataset first")
+    parser.add_argument("--force", action="store_true",
+                        help="allow --generate to empty the tables of the configured database")
+    add_generator_arguments(parser)
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    dataset = None
+    if args.generate:
+        if not args.force:
+            raise SystemExit("--generate empties the configured database's tables; rerun with --force.")
+        dataset = load_generated(args)
+
+    app = create_app()
+    client = app.test_client()
+    targets = sample_targets(client)
+    paths = route_paths(app, targets)
+    # One untimed pass to load the search index and warm the pool
+    for _, _, path in paths:
+        client.get(path).close()
+
+    report("bench_routes", args, {"dataset": dataset, "routes": run(client, paths, args.runs)})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark /api/products/search: round trips and latency per search.
+
+Compares the old per-product rating lookup (one extra query per result)
+with the current endpoint against the database configured in
+backend/db/.env.
+
+    cd backend
+    python -m benchmarks.bench_search --runs 200 --queries "usb cable" phone
+"""
+
+import argparse
+import random
+from contextlib import contextmanager
+
+from flask import jsonify, request
+
+from api import create_app
+import api.routes as routes
+from db.db_connection import db_cursor
+
+from benchmarks._results import add_output_argument, report
+from benchmarks._timing import CountingCursor, summarize, timed
+
+
+def legacy_search(cursor, words):
+    """The search as it was before: 1 product query + 1 query per product."""
+    like_conditions = ["product_name LIKE %s" for _ in words]
+    params = [f"%{word}%" for word in words]
+    cursor.execute(
+        f"""SELECT product_id, product_name, category, actual_price_usd,
+            discounted_price_usd, discount_percentage, about_product,
+            img_link, product_link
+            FROM products WHERE {' AND '.join(like_conditions)} LIMIT 20""",
+        tuple(params),
+    )
+    products = cursor.fetchall()
+    for product in products:
+        cursor.execute(
+            """SELECT AVG(rating) as avg_rating, COUNT(*) as review_count
+               FROM reviews WHERE product_id = %s""",
+            (product["product_id"],),
+        )
+        rating_data = cursor.fetchone()
+        product["avg_rating"] = float(rating_data["avg_rating"]) if rating_data["avg_rating"] else 0.0
+        product["review_count"] = int(rating_data["review_count"]) if rating_data["review_count"] else 0
+    return products
+
+
+def sample_queries(count, seed=7):
+    """Pick search terms from real product names so searches hit rows."""
+    with db_cursor() as cursor:
+        cursor.execute("SELECT product_name FROM products LIMIT 500")
+        names = [row["product_name"] for row in cursor.fetchall()]
+    rng = random.Random(seed)
+    queries = []
+    for name in rng.sample(names, min(count, len(names))):
+        words = [w for w in name.split() if w.isalpha() and len(w) > 2]
+        if words:
+            queries.append(" ".join(words[:2]))
+    return queries
+
+
+def run(queries, runs):
+    counter = {"statements": 0}
+
+    @contextmanager
+    def counting_db_cursor(dictionary=True):
+        with db_cursor(dictionary) as cursor:
+            yield CountingCursor(cursor, counter)
+
+    routes.db_cursor = counting_db_cursor
+    app = create_app()
+
+    # Serve the old implementation through Flask too, so both sides
+    # pay the same request/serialization overhead
+    @app.route("/bench/legacy-search")
+    def legacy_search_route():
+        with counting_db_cursor() as cursor:
+            return jsonify(legacy_search(cursor, request.args["q"].split()))
+
+    client = app.test_client()
+    results = {}
+    for label, path in (("before", "/bench/legacy-search"), ("after", "/api/products/search")):
+        counter["statements"] = 0
+        samples_ms = []
+        for i in range(runs):
+            with timed(samples_ms):
+                response = client.get(path, query_string={"q": queries[i % len(queries)]})
+            assert response.status_code == 200, response.get_json()
+        results[label] = {
+            "round_trips_per_search": counter["statements"] / runs,
+            **summarize(samples_ms),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--queries", nargs="*", help="search strings (default: sampled from products)")
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    queries = args.queries or sample_queries(50)
+    if not queries:
+        raise SystemExit("No products found; load data with db/etl.py first.")
+    report("bench_search", args, run(queries, args.runs))
+
+
+if __name__ == "__main__":
+    main()
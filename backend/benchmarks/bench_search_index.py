@@ -0,0 +1,139 @@
+"""
+Benchmark the product search index at 10k, 100k and 1M products.
+
+For each catalog size this builds the inverted index over synthetic
+products and compares query latency against a linear substring scan over
+product_name, which is what MySQL does for the old LIKE '%word%' search.
+No database is needed.
+
+    cd backend
+    python -m benchmarks.bench_search_index --sizes 10000 100000 1000000
+"""
+
+import argparse
+import itertools
+import random
+import time
+
+from db.search_index import SearchIndex
+
+from benchmarks._results import add_output_argument, report
+from benchmarks._timing import summarize, timed
+
+NOUNS = [
+    "cable", "charger", "phone", "case", "adapter", "speaker", "headphones",
+    "keyboard", "mouse", "monitor", "router", "camera", "tripod", "lamp",
+    "bottle", "kettle", "blender", "mixer", "iron", "fan", "heater", "watch",
+    "battery", "remote", "stand", "holder", "bag", "sleeve", "screen", "guard",
+]
+ADJECTIVES = [
+    "usb", "wireless", "portable", "smart", "fast", "compact", "premium",
+    "durable", "ergonomic", "braided", "magnetic", "bluetooth", "digital",
+    "stainless", "rechargeable", "foldable", "waterproof", "led", "hd", "mini",
+]
+BRANDS = ["boat", "ambrane", "portronics", "syska", "zebronics", "pigeon", "philips", "redmi"]
+CATEGORIES = [
+    "Electronics|Mobiles&Accessories|Chargers",
+    "Electronics|HomeAudio|Speakers",
+    "Computers&Accessories|Accessories&Peripherals|Keyboards",
+    "Home&Kitchen|Kitchen&HomeAppliances|SmallKitchenAppliances",
+    "Home&Kitchen|Heating,Cooling&AirQuality|Fans",
+    "OfficeProducts|OfficePaperProducts|Paper",
+]
+
+
+def description_vocabulary(size=20_000, seed=5):
+    """Pseudo-words for product descriptions; drawn with a Zipf-like skew."""
+    rng = random.Random(seed)
+    letters = "abcdefghiklmnoprstuvy"
+    words = NOUNS + ADJECTIVES
+    while len(words) < size:
+        words.append("".join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(words))))
+    return words, cum_weights
+
+
+def synthetic_products(count, seed=11):
+    rng = random.Random(seed)
+    words, cum_weights = description_vocabulary()
+    for i in range(count):
+        noun = rng.choice(NOUNS)
+        name = " ".join([rng.choice(BRANDS)] + rng.sample(ADJECTIVES, 2) + [noun, f"model{rng.randrange(100_000)}"])
+        about = " ".join(rng.choices(words, cum_weights=cum_weights, k=25))
+        yield {
+            "product_id": f"B{i:09d}",
+            "product_name": name,
+            "category": rng.choice(CATEGORIES),
+            "about_product": about,
+        }
+
+
+def linear_scan(products, words, limit=20):
+    """What LIKE '%w1%' AND LIKE '%w2%' does: check every row."""
+    words = [w.lower() for w in words]
+    hits = []
+    for product in products:
+        name = product["product_name"].lower()
+        if all(w in name for w in words):
+            hits.append(product["product_id"])
+            if len(hits) == limit:
+                break
+    return hits
+
+
+def make_queries(count, seed=3):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        shape = rng.randrange(4)
+        if shape == 0:
+            queries.append(rng.choice(NOUNS))
+        elif shape == 1:
+            queries.append(f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}")
+        elif shape == 2:
+            # A specific model: few or no rows match, so a scan reads everything
+            queries.append(f"{rng.choice(NOUNS)} model{rng.randrange(100_000)}")
+        else:
+            # Prefix of a word, the way a user types
+            word = rng.choice(ADJECTIVES + NOUNS)
+            queries.append(f"{rng.choice(BRANDS)} {word[:max(2, len(word) - 2)]}")
+    return queries
+
+
+def run(size, queries):
+    products = list(synthetic_products(size))
+
+    start = time.perf_counter()
+    index = SearchIndex.build(products)
+    build_seconds = time.perf_counter() - start
+
+    index_ms, scan_ms = [], []
+    for query in queries:
+        with timed(index_ms):
+            index.search(query)
+        with timed(scan_ms):
+            linear_scan(products, query.split())
+
+    return {
+        "products": size,
+        "index_build_seconds": round(build_seconds, 3),
+        "vocabulary_size": len(index.vocabulary),
+        "index_query": summarize(index_ms),
+        "linear_scan_query": summarize(scan_ms),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries)
+    results = [run(size, queries) for size in args.sizes]
+    report("bench_search_index", args, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark the ETL sentiment stage: reviews scored per second.
+
+Scores review texts with VADER in 1..N processes, the way the ETL
+pipeline does, and reports throughput and the content-hash cache hit
+rate. Texts come from the CSV's review_content column (split per review
+like the ETL does) or are synthesized with a share of duplicates. No
+database is needed.
+
+    cd backend
+    python -m benchmarks.bench_sentiment --workers 1 2 4 --reviews 200000
+    python -m benchmarks.bench_sentiment --csv ../cleaned_amazon_reviews.csv
+"""
+
+import argparse
+import csv
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from db import sentiment
+
+from benchmarks._results import add_output_argument, report
+
+WORDS = [
+    "good", "great", "bad", "poor", "excellent", "terrible", "cheap", "quality",
+    "works", "broke", "fast", "slow", "charging", "cable", "value", "money",
+    "not", "very", "really", "love", "hate", "okay", "fine", "worst", "best",
+    "product", "delivery", "sound", "battery", "screen", "build", "after", "days",
+]
+
+
+def synthetic_reviews(count, duplicate_share, seed=13):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        if texts and rng.random() < duplicate_share:
+            texts.append(rng.choice(texts))
+        else:
+            texts.append(" ".join(rng.choices(WORDS, k=rng.randint(3, 40))))
+    return texts
+
+
+def csv_reviews(path, limit):
+    texts = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            texts.extend(r.strip() for r in row.get("review_content", "").split(",") if r.strip())
+            if len(texts) >= limit:
+                break
+    return texts[:limit]
+
+
+def score_chunk(texts):
+    sentiment.score_texts(texts)
+    return os.getpid(), sentiment.cache_stats()
+
+
+def run(texts, workers, chunk_size):
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    # Counters are cumulative per process, so the last report of each process wins
+    per_process = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for pid, stats in pool.map(score_chunk, chunks):
+            per_process[pid] = stats
+    seconds = time.perf_counter() - start
+
+    hits = sum(s["hits"] for s in per_process.values())
+    misses = sum(s["misses"] for s in per_process.values())
+    return {
+        "workers": workers,
+        "reviews": len(texts),
+        "seconds": round(seconds, 3),
+        "reviews_per_second": round(len(texts) / seconds, 1) if seconds else 0.0,
+        "cache_hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4])
+    parser.add_argument("--reviews", type=int, default=100_000)
+    parser.add_argument("--duplicates", type=float, default=0.3,
+                        help="share of synthetic reviews that repeat an earlier one")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--csv", help="score review_content from this CSV instead")
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    if args.csv:
+        texts = csv_reviews(args.csv, args.reviews)
+    else:
+        texts = synthetic_reviews(args.reviews, args.duplicates)
+    report("bench_sentiment", args, [run(texts, workers, args.chunk_size) for workers in args.workers])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark peak memory of a 100k-row response: buffered vs streamed.
+
+Adds the synthetic product from bench_review_pages (removed again at the
+end unless --keep) and requests all of its reviews in one page, once as
+a normal JSON response and once with ?stream=json and ?stream=ndjson.
+Reports the tracemalloc peak while the response is produced and read,
+and the time it takes.
+
+    cd backend
+    python -m benchmarks.bench_streaming --reviews 100000
+"""
+
+import argparse
+import os
+import time
+import tracemalloc
+
+# Measure producing the response, not storing it
+os.environ["CACHE_BACKEND"] = "none"
+
+from api import create_app  # noqa: E402
+
+from benchmarks._results import add_output_argument, report  # noqa: E402
+from benchmarks.bench_review_pages import PRODUCT_ID, cleanup, seed  # noqa: E402
+
+
+def measure(client, path, query):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(path, query_string=query, buffered=False)
+    body_bytes = 0
+    try:
+        assert response.status_code == 200, response.get_data()[:200]
+        for chunk in response.response:
+            body_bytes += len(chunk)
+    finally:
+        response.close()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": round(seconds, 3),
+        "peak_mib": round(peak / 2 ** 20, 1),
+        "body_mib": round(body_bytes / 2 ** 20, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reviews", type=int, default=100_000)
+    parser.add_argument("--keep", action="store_true", help="leave the synthetic product in place")
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    seed(args.reviews)
+    try:
+        client = create_app().test_client()
+        path = f"/api/products/{PRODUCT_ID}/reviews"
+        results = {"rows": args.reviews}
+        for label, extra in (("buffered", {}), ("stream_json", {"stream": "json"}),
+                             ("stream_ndjson", {"stream": "ndjson"})):
+            results[label] = measure(client, path, {"limit": args.reviews, **extra})
+        report("bench_streaming", args, results)
+    finally:
+        if not args.keep:
+            cleanup()
+
+
+if __name__ == "__main__":
+    main()
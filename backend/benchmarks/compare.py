@@ -0,0 +1,86 @@
+"""
+Compare two benchmark result files, e.g. from two commits.
+
+Lines up every number in the "results" of both files by its path
+(route, loader, percentile, ...) and prints the ones that changed by
+more than --threshold percent, largest increases first.
+
+    cd backend
+    git checkout <old-commit> && python -m benchmarks.bench_routes --output /tmp/before.json
+    git checkout <new-commit> && python -m benchmarks.bench_routes --output /tmp/after.json
+    python -m benchmarks.compare /tmp/before.json /tmp/after.json
+"""
+
+import argparse
+import json
+
+
+def flatten(value, prefix=""):
+    """{path: number} for every number in a nested JSON value; list items are keyed by position."""
+    if isinstance(value, bool):
+        return {}
+    if isinstance(value, (int, float)):
+        return {prefix: value}
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        # Lists of labelled runs ({"loader": ...}) are keyed by the label
+        items = [(_label(item, i), item) for i, item in enumerate(value)]
+    else:
+        return {}
+    flat = {}
+    for key, item in items:
+        flat.update(flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+    return flat
+
+
+def _label(item, index):
+    if isinstance(item, dict):
+        for key in ("loader", "name", "route", "path", "engine", "workers", "size"):
+            if key in item:
+                return str(item[key])
+    return str(index)
+
+
+def compare(before, after, threshold=5.0):
+    """(path, before, after, percent change) for numbers that moved more than threshold percent."""
+    old, new = flatten(before.get("results")), flatten(after.get("results"))
+    changes = []
+    for path in sorted(old.keys() & new.keys()):
+        a, b = old[path], new[path]
+        if a == b:
+            continue
+        pct = (b - a) / abs(a) * 100 if a else float("inf")
+        if abs(pct) >= threshold:
+            changes.append((path, a, b, pct))
+    changes.sort(key=lambda change: -change[3])
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=5.0, help="smallest change reported, in percent")
+    args = parser.parse_args()
+
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+    if before.get("benchmark") != after.get("benchmark"):
+        raise SystemExit(f"Different benchmarks: {before.get('benchmark')} vs {after.get('benchmark')}")
+    if before.get("params") != after.get("params"):
+        print("Warning: the runs used different options")
+
+    print(f"{before.get('benchmark')}: {before.get('commit')} -> {after.get('commit')}")
+    changes = compare(before, after, args.threshold)
+    if not changes:
+        print(f"No result changed by {args.threshold:g}% or more")
+    width = max((len(path) for path, *_ in changes), default=0)
+    for path, a, b, pct in changes:
+        print(f"{path:<{width}}  {a:>12g} -> {b:<12g} {pct:+.1f}%")
+
+
+if __name__ == "__main__":
+    main()
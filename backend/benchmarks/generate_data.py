@@ -0,0 +1,204 @@
+"""
+Generate a synthetic cleaned_amazon_reviews.csv for benchmarks.
+
+Writes the columns db/etl.py reads, in the format of the real file: one
+row per product with up to --reviews-per-row reviews, their review_id,
+user_id, user_name, review_title and review_content comma-joined in
+matching order, and categories and about_product pipe-joined. Products
+with more reviews than fit in a row are listed again in further rows
+with the same product values, as in the real data.
+
+The output depends only on the arguments, so a benchmark run on one
+commit can be repeated on another with identical input.
+
+    cd backend
+    python -m benchmarks.generate_data --products 5000 --reviews-per-product 20 --skew 1.1 \\
+        --output /tmp/reviews.csv
+    cd db && python etl.py /tmp/reviews.csv
+
+--skew shapes how reviews are spread over products: 0 gives every
+product the same count, and larger values give a few products most of
+them (a Zipf-like long tail). --categories, --fanout and --depth shape
+the category tree ("Top|Sub|Leaf" with --depth 3).
+"""
+
+import argparse
+import csv
+import json
+import random
+
+from db.sentiment import label_for
+
+# Columns of cleaned_amazon_reviews.csv, in order
+COLUMNS = [
+    "product_id", "product_name", "category", "actual_price_usd", "discounted_price_usd",
+    "discount_percentage", "rating", "rating_count", "about_product", "user_id", "user_name",
+    "review_id", "review_title", "review_content", "img_link", "product_link",
+    "sentiment_score", "sentiment_label",
+]
+
+# No commas: etl.py splits the multi-value columns on them
+WORDS = (
+    "good quality product works fine cable charging fast battery sound screen price value "
+    "cheap poor broke after days month recommend excellent build sturdy light heavy easy "
+    "setup install return refund delivery packaging size fits perfectly original fake "
+    "money worth satisfied disappointed amazing decent average durable comfortable"
+).split()
+TITLE_WORDS = ("great", "good", "okay", "bad", "worth it", "not worth it", "excellent", "decent", "poor")
+ID_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ234567"
+
+
+def _id(rng, prefix, length):
+    return prefix + "".join(rng.choice(ID_ALPHABET) for _ in range(length))
+
+
+def _unique_ids(rng, count, prefix, length):
+    ids, seen = [], set()
+    while len(ids) < count:
+        value = _id(rng, prefix, length)
+        if value not in seen:
+            seen.add(value)
+            ids.append(value)
+    return ids
+
+
+def _sentence(rng, low, high):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def category_paths(categories, fanout, depth):
+    """Every root-to-leaf path of the category tree, as pipe-joined strings."""
+    paths = [[f"Category{i:02d}"] for i in range(categories)]
+    for level in range(1, depth):
+        paths = [
+            path + [f"{path[-1]}-{'Sub' if level < depth - 1 else 'Leaf'}{j}"]
+            for path in paths for j in range(fanout)
+        ]
+    return ["|".join(path) for path in paths]
+
+
+def review_counts(rng, products, per_product, skew):
+    """Reviews per product: products * per_product in total, spread by a Zipf-like weight."""
+    weights = [1.0 / (rank ** skew) for rank in range(1, products + 1)]
+    rng.shuffle(weights)
+    total = products * per_product
+    scale = total / sum(weights)
+    counts = [int(w * scale) for w in weights]
+    # Hand out what rounding down left over, largest remainders first
+    order = sorted(range(products), key=lambda i: (weights[i] * scale - counts[i], -i), reverse=True)
+    for i in order[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def generate(
+    output,
+    products=1000,
+    reviews_per_product=8,
+    skew=1.0,
+    categories=12,
+    fanout=4,
+    depth=3,
+    users=None,
+    reviews_per_row=8,
+    seed=42,
+):
+    """Write the CSV to `output` and return a summary of what it holds."""
+    rng = random.Random(seed)
+    counts = review_counts(rng, products, reviews_per_product, skew)
+    total_reviews = sum(counts)
+    users = users or max(1, total_reviews // 2)
+    paths = category_paths(categories, fanout, depth)
+
+    product_ids = _unique_ids(rng, products, "B0", 8)
+    user_ids = _unique_ids(rng, users, "A", 27)
+    user_names = [f"{rng.choice(WORDS).title()} {rng.choice(ID_ALPHABET)}." for _ in range(users)]
+    review_ids = iter(_unique_ids(rng, total_reviews, "R", 13))
+
+    rows = 0
+    with open(output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for product_id, count in zip(product_ids, counts):
+            actual = round(rng.uniform(2, 800), 2)
+            discount = rng.randint(0, 90)
+            score = round(rng.uniform(-1, 1), 3)
+            product = {
+                "product_id": product_id,
+                "product_name": _sentence(rng, 3, 10).title(),
+                "category": rng.choice(paths),
+                "actual_price_usd": actual,
+                "discounted_price_usd": round(actual * (100 - discount) / 100, 2),
+                "discount_percentage": discount,
+                "rating": round(rng.uniform(1, 5), 1),
+                "rating_count": rng.randint(count, count * 50 + 10),
+                "about_product": "|".join(_sentence(rng, 5, 15) for _ in range(rng.randint(1, 4))),
+                "img_link": f"https://example.com/images/{product_id}.jpg",
+                "product_link": f"https://example.com/dp/{product_id}",
+                "sentiment_score": score,
+                "sentiment_label": label_for(score),
+            }
+            # A product with no reviews still gets one row
+            for start in range(0, max(count, 1), reviews_per_row):
+                in_row = range(start, min(count, start + reviews_per_row))
+                reviewers = [rng.randrange(users) for _ in in_row]
+                writer.writerow([
+                    *(product[c] for c in COLUMNS[:9]),
+                    ",".join(user_ids[u] for u in reviewers),
+                    ",".join(user_names[u] for u in reviewers),
+                    ",".join(next(review_ids) for _ in in_row),
+                    ",".join(rng.choice(TITLE_WORDS) for _ in in_row),
+                    ",".join(_sentence(rng, 3, 60) for _ in in_row),
+                    *(product[c] for c in COLUMNS[14:]),
+                ])
+                rows += 1
+
+    return {
+        "path": output,
+        "rows": rows,
+        "products": products,
+        "reviews": total_reviews,
+        "users": users,
+        "categories": len(paths),
+        "max_reviews_per_product": max(counts, default=0),
+    }
+
+
+def add_generator_arguments(parser):
+    """The generator's options, for benchmarks that generate their own input."""
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--reviews-per-product", type=int, default=8, help="mean reviews per product")
+    parser.add_argument("--skew", type=float, default=1.0,
+                        help="0 spreads reviews evenly; larger values give a few products most of them")
+    parser.add_argument("--categories", type=int, default=12, help="top-level categories")
+    parser.add_argument("--fanout", type=int, default=4, help="subcategories per category")
+    parser.add_argument("--depth", type=int, default=3, help="levels in a category path")
+    parser.add_argument("--users", type=int, help="distinct reviewers (default: reviews / 2)")
+    parser.add_argument("--reviews-per-row", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def generator_options(args):
+    return {
+        "products": args.products,
+        "reviews_per_product": args.reviews_per_product,
+        "skew": args.skew,
+        "categories": args.categories,
+        "fanout": args.fanout,
+        "depth": args.depth,
+        "users": args.users,
+        "reviews_per_row": args.reviews_per_row,
+        "seed": args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", required=True, help="CSV file to write")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+    print(json.dumps(generate(args.output, **generator_options(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Load test a running backend: requests/sec and p50/p95/p99 latency.
+
+Spreads concurrent keep-alive clients over a mix of search, product,
+review and analytics requests for a fixed duration. Product ids and
+search words are sampled from the server's own analytics output, so
+any loaded database works.
+
+    cd backend
+    gunicorn -c gunicorn.conf.py wsgi:app &
+    python -m benchmarks.load_test --url http://localhost:5001 --concurrency 32 --duration 30
+"""
+
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+from benchmarks._results import add_output_argument, report
+from benchmarks._timing import summarize
+
+ANALYTICS_PATHS = [
+    "/api/analytics/top-rated-by-category",
+    "/api/analytics/sentiment-by-price-range",
+    "/api/analytics/best-value-products",
+    "/api/analytics/review-length-rating",
+    "/api/analytics/sentiment-by-category",
+    "/api/analytics/discount-review-quality",
+    "/api/analytics/rating-variance",
+    "/api/analytics/sentiment-rating-comparison",
+]
+
+# Share of requests per endpoint group
+DEFAULT_MIX = {"search": 0.4, "product": 0.25, "reviews": 0.15, "analytics": 0.2}
+
+
+class Client:
+    """One keep-alive HTTP connection, reopened if the server drops it."""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.conn = None
+
+    def get(self, path):
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request("GET", path)
+                response = self.conn.getresponse()
+                body = response.read()
+                return response.status, body
+            except (http.client.HTTPException, ConnectionError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+def discover_targets(base_url, timeout):
+    """Product ids and search words taken from the server's analytics output."""
+    client = Client(base_url, timeout)
+    try:
+        status, body = client.get("/api/analytics/rating-variance")
+        if status != 200:
+            raise SystemExit(f"Could not sample products: HTTP {status} {body[:200]!r}")
+        products = json.loads(body)
+    finally:
+        client.close()
+    if not products:
+        raise SystemExit("No products found; load data with db/etl.py first.")
+
+    words = set()
+    for product in products:
+        words.update(w.lower() for w in product["product_name"].split()[:4] if w.isalpha() and len(w) > 2)
+    return [p["product_id"] for p in products], sorted(words) or ["cable"]
+
+
+def make_request_picker(product_ids, words, mix, seed):
+    rng = random.Random(seed)
+    groups = list(mix)
+    weights = [mix[g] for g in groups]
+
+    def pick():
+        group = rng.choices(groups, weights)[0]
+        if group == "search":
+            query = " ".join(rng.sample(words, min(len(words), rng.randint(1, 2))))
+            return group, f"/api/products/search?q={quote(query)}"
+        if group == "product":
+            return group, f"/api/products/{quote(rng.choice(product_ids))}"
+        if group == "reviews":
+            return group, f"/api/products/{quote(rng.choice(product_ids))}/reviews?limit=10"
+        return group, rng.choice(ANALYTICS_PATHS)
+
+    return pick
+
+
+def worker(base_url, timeout, pick, deadline, samples, errors, lock):
+    client = Client(base_url, timeout)
+    local = {}
+    local_errors = 0
+    try:
+        while time.monotonic() < deadline:
+            group, path = pick()
+            start = time.perf_counter()
+            try:
+                status, _ = client.get(path)
+                ok = status < 400
+            except Exception:
+                ok = False
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            if ok:
+                local.setdefault(group, []).append(elapsed_ms)
+            else:
+                local_errors += 1
+    finally:
+        client.close()
+    with lock:
+        for group, values in local.items():
+            samples.setdefault(group, []).extend(values)
+        errors[0] += local_errors
+
+
+def run(base_url, concurrency, duration, mix, timeout, seed=1):
+    product_ids, words = discover_targets(base_url, timeout)
+    samples, errors, lock = {}, [0], threading.Lock()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(base_url, timeout, make_request_picker(product_ids, words, mix, seed + i),
+                  deadline, samples, errors, lock),
+        )
+        for i in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    all_samples = [value for values in samples.values() for value in values]
+    return {
+        "url": base_url,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2),
+        "requests": len(all_samples),
+        "errors": errors[0],
+        "requests_per_second": round(len(all_samples) / elapsed, 1) if elapsed else 0.0,
+        "latency": summarize(all_samples),
+        "by_endpoint": {group: summarize(values) for group, values in sorted(samples.items())},
+    }
+
+
+def parse_mix(text):
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, text.split(",")):
+        group, _, share = part.partition("=")
+        if group not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown endpoint group: {group}")
+        mix[group] = float(share)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:5001")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    parser.add_argument("--timeout", type=float, default=30, help="per-request timeout, seconds")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="endpoint shares, e.g. search=0.5,analytics=0.5")
+    add_output_argument(parser)
+    args = parser.parse_args()
+    report("load_test", args, run(args.url, args.concurrency, args.duration, args.mix, args.timeout))
+
+
+if __name__ == "__main__":
+    main()
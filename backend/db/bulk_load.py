@@ -0,0 +1,361 @@
+"""
+Bulk-load path for a cold load into the database: etl.py --initial-load.
+
+Instead of upserting batches of rows, the load runs in phases:
+
+    explode       transform the CSV into one TSV file per table
+    load          LOAD DATA LOCAL INFILE each file into a keyless staging
+                  table (<table>_load)
+    build         copy the last occurrence of every key into empty copies
+                  of the tables (<table>_new) that only have a primary key
+    index         add the secondary indexes of the live tables
+    stats         build product_stats from the new reviews
+    swap          RENAME TABLE the new tables in, all in one statement,
+                  and drop the old ones
+    foreign_keys  re-add the foreign keys the live tables had
+
+Keys repeated in the CSV end up as the ETL leaves them: the last
+occurrence wins, except that a review keeps the product and user of its
+first occurrence, which ON DUPLICATE KEY UPDATE never changes. Every
+table is replaced, so rows that are not in the CSV are gone afterwards.
+The API keeps reading the old tables until the swap.
+
+LOAD DATA LOCAL needs local_infile=ON on the server. Without it the
+staging tables are filled with multi-row INSERTs instead, which is
+slower but still skips the upserts and the index maintenance.
+"""
+
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import etl
+from data_version import bump_data_version, get_data_version
+from db_connection import get_bulk_connection
+from product_stats import rebuild_product_stats
+
+# Columns of each TSV file, in the order of product_params(), USER_SQL
+# and review_params()
+TABLE_COLUMNS = {
+    "products": (
+        "product_id", "product_name", "category",
+        "actual_price_usd", "discounted_price_usd", "discount_percentage",
+        "about_product", "img_link", "product_link", "content_hash",
+    ),
+    "users": ("user_id", "user_name"),
+    "reviews": (
+        "review_id", "product_id", "user_id",
+        "review_title", "review_content",
+        "rating", "sentiment_score", "sentiment_label",
+        "review_length", "review_date", "content_hash",
+    ),
+}
+# Swapped together; product_stats is built from reviews rather than loaded
+TABLES = ("products", "users", "reviews", "product_stats")
+# Written to the TSV files as hex
+BINARY_COLUMNS = {"content_hash"}
+# Rows per INSERT when LOAD DATA LOCAL is disabled on the server
+INSERT_BATCH_ROWS = 5000
+
+_TSV_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r", "\0": "\\0"})
+_TSV_ESCAPED = re.compile(r"\\(.)")
+_TSV_UNESCAPES = {"t": "\t", "n": "\n", "r": "\r", "0": "\0"}
+
+
+def tsv_line(seq: int, values: tuple) -> str:
+    """One line of a staging file, in LOAD DATA's default escaping (NULL is \\N)."""
+    fields = [str(seq)]
+    for value in values:
+        if value is None:
+            fields.append("\\N")
+        elif isinstance(value, bytes):
+            fields.append(value.hex())
+        elif isinstance(value, str):
+            fields.append(value.translate(_TSV_ESCAPES))
+        else:
+            fields.append(repr(value))
+    return "\t".join(fields) + "\n"
+
+
+def read_tsv(path: str, columns: List[str]) -> Iterator[tuple]:
+    """Rows of a staging file as INSERT parameters (the LOAD DATA fallback)."""
+    binary = [column in BINARY_COLUMNS for column in columns]
+    with open(path, newline="", encoding="utf-8") as f:
+        for line in f:
+            row = []
+            for field, is_binary in zip(line[:-1].split("\t"), binary):
+                if field == "\\N":
+                    row.append(None)
+                elif is_binary:
+                    row.append(bytes.fromhex(field))
+                else:
+                    row.append(_TSV_ESCAPED.sub(lambda m: _TSV_UNESCAPES.get(m.group(1), m.group(1)), field))
+            yield tuple(row)
+
+
+def explode(
+    csv_path: str,
+    staging_dir: str,
+    workers: int = 1,
+    sentiment_mode: str = etl.SENTIMENT_DEFAULT,
+) -> Tuple[Dict[str, int], etl.Position]:
+    """
+    Write <table>.tsv for products, users and reviews to `staging_dir`,
+    each row numbered in CSV order. Returns the row count of each file
+    and the CSV position read up to.
+    """
+    counts = {table: 0 for table in TABLE_COLUMNS}
+    position: etl.Position = (0, 0)
+    files = {
+        table: open(os.path.join(staging_dir, f"{table}.tsv"), "w", newline="", encoding="utf-8")
+        for table in TABLE_COLUMNS
+    }
+    try:
+        products, users_file, reviews_file = files["products"], files["users"], files["reviews"]
+        for chunk, position in etl.transform_chunks(csv_path, workers, sentiment_mode=sentiment_mode):
+            for product, users, reviews in chunk:
+                counts["products"] += 1
+                products.write(tsv_line(counts["products"], etl.product_params(product)))
+                for user, review in zip(users, reviews):
+                    counts["users"] += 1
+                    users_file.write(tsv_line(counts["users"], user))
+                    counts["reviews"] += 1
+                    reviews_file.write(tsv_line(counts["reviews"], etl.review_params(review, user)))
+    finally:
+        for f in files.values():
+            f.close()
+    return counts, position
+
+
+def secondary_indexes(cursor, table: str) -> Dict[str, str]:
+    """{name: "INDEX name (...)"} for every index of `table` but the primary key."""
+    cursor.execute("""
+        SELECT INDEX_NAME, NON_UNIQUE, INDEX_TYPE, COLUMN_NAME, SUB_PART, COLLATION, EXPRESSION
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME <> 'PRIMARY'
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """, (table,))
+    parts: Dict[str, List[str]] = {}
+    kinds: Dict[str, str] = {}
+    for name, non_unique, index_type, column, sub_part, collation, expression in cursor.fetchall():
+        if expression is not None:
+            part = f"({expression})"
+        else:
+            part = f"`{column}`" + (f"({sub_part})" if sub_part else "")
+        if collation == "D":
+            part += " DESC"
+        parts.setdefault(name, []).append(part)
+        if index_type == "FULLTEXT":
+            kinds[name] = "FULLTEXT INDEX"
+        else:
+            kinds[name] = "INDEX" if int(non_unique) else "UNIQUE INDEX"
+    return {name: f"{kinds[name]} `{name}` ({', '.join(columns)})" for name, columns in parts.items()}
+
+
+def foreign_keys(cursor, tables) -> Dict[str, List[str]]:
+    """{table: ["CONSTRAINT name FOREIGN KEY ...", ...]} for the foreign keys of `tables`."""
+    placeholders = ", ".join(["%s"] * len(tables))
+    cursor.execute(f"""
+        SELECT k.TABLE_NAME, k.CONSTRAINT_NAME, k.COLUMN_NAME,
+            k.REFERENCED_TABLE_NAME, k.REFERENCED_COLUMN_NAME, r.UPDATE_RULE, r.DELETE_RULE
+        FROM information_schema.KEY_COLUMN_USAGE k
+        JOIN information_schema.REFERENTIAL_CONSTRAINTS r
+            ON r.CONSTRAINT_SCHEMA = k.CONSTRAINT_SCHEMA
+            AND r.CONSTRAINT_NAME = k.CONSTRAINT_NAME
+            AND r.TABLE_NAME = k.TABLE_NAME
+        WHERE k.TABLE_SCHEMA = DATABASE() AND k.TABLE_NAME IN ({placeholders})
+            AND k.REFERENCED_TABLE_NAME IS NOT NULL
+        ORDER BY k.TABLE_NAME, k.CONSTRAINT_NAME, k.ORDINAL_POSITION
+    """, tuple(tables))
+    keys: Dict[Tuple[str, str], dict] = {}
+    for table, name, column, referenced_table, referenced_column, on_update, on_delete in cursor.fetchall():
+        key = keys.setdefault((table, name), {
+            "columns": [], "referenced_table": referenced_table, "referenced_columns": [],
+            "on_update": on_update, "on_delete": on_delete,
+        })
+        key["columns"].append(f"`{column}`")
+        key["referenced_columns"].append(f"`{referenced_column}`")
+
+    definitions: Dict[str, List[str]] = {}
+    for (table, name), key in keys.items():
+        definitions.setdefault(table, []).append(
+            f"CONSTRAINT `{name}` FOREIGN KEY ({', '.join(key['columns'])}) "
+            f"REFERENCES `{key['referenced_table']}` ({', '.join(key['referenced_columns'])}) "
+            f"ON UPDATE {key['on_update']} ON DELETE {key['on_delete']}"
+        )
+    return definitions
+
+
+def build_sql(table: str) -> str:
+    """INSERT ... SELECT of the last occurrence of each key from <table>_load into <table>_new."""
+    columns = TABLE_COLUMNS[table]
+    key = columns[0]
+    select, first_values, window = ", ".join(columns), "", ""
+    if table == "reviews":
+        # ON DUPLICATE KEY UPDATE never changes a review's product_id or user_id
+        select = ", ".join(f"first_{c}" if c in ("product_id", "user_id") else c for c in columns)
+        first_values = ("FIRST_VALUE(product_id) OVER first_seen AS first_product_id, "
+                        "FIRST_VALUE(user_id) OVER first_seen AS first_user_id, ")
+        window = " WINDOW first_seen AS (PARTITION BY review_id ORDER BY seq)"
+    return f"""
+        INSERT INTO {table}_new ({", ".join(columns)})
+        SELECT {select} FROM (
+            SELECT l.*, {first_values}ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY seq DESC) AS occurrence
+            FROM {table}_load l{window}
+        ) ranked
+        WHERE occurrence = 1
+        ORDER BY {key}
+    """
+
+
+def _load_staging(conn, cursor, table: str, path: str, local_infile: bool) -> None:
+    columns = ["seq", *TABLE_COLUMNS[table]]
+    cursor.execute(f"DROP TABLE IF EXISTS {table}_load")
+    # Same column types as the live table, no keys besides the row number
+    cursor.execute(f"""
+        CREATE TABLE {table}_load (seq BIGINT PRIMARY KEY) ENGINE=InnoDB
+        SELECT {", ".join(TABLE_COLUMNS[table])} FROM {table} WHERE FALSE
+    """)
+
+    if local_infile:
+        targets = [f"@{c}" if c in BINARY_COLUMNS else c for c in columns]
+        conversions = [f"{c} = UNHEX(@{c})" for c in columns if c in BINARY_COLUMNS]
+        cursor.execute(f"""
+            LOAD DATA LOCAL INFILE %s INTO TABLE {table}_load
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+            LINES TERMINATED BY '\\n'
+            ({", ".join(targets)})
+            {"SET " + ", ".join(conversions) if conversions else ""}
+        """, (path,))
+        conn.commit()
+        return
+
+    sql = f"INSERT INTO {table}_load ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    batch = []
+    for row in read_tsv(path, columns):
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH_ROWS:
+            cursor.executemany(sql, batch)
+            conn.commit()
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+    conn.commit()
+
+
+def _drop_tables(cursor, names: List[str]) -> None:
+    # The old tables still reference each other
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {', '.join(names)}")
+    finally:
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+
+def run_initial_load(
+    csv_path: str = etl.CSV_PATH_DEFAULT,
+    workers: int = 1,
+    sentiment_mode: str = etl.SENTIMENT_DEFAULT,
+    staging_dir: Optional[str] = None,
+    checkpoint_path: Optional[str] = None,
+    verbose: bool = False,
+) -> dict:
+    """
+    Replace products, users, reviews and product_stats with the contents
+    of the CSV, phase by phase (see the module docstring). The TSV files
+    go to a temporary directory inside `staging_dir` and are removed
+    afterwards. With `checkpoint_path` the end of the CSV is saved there,
+    so etl.py --resume later loads only the rows appended since.
+
+    Returns the row counts like run_etl(), plus "phases": seconds per phase.
+    """
+    if sentiment_mode not in etl.SENTIMENT_MODES:
+        raise ValueError(f"Unknown sentiment mode: {sentiment_mode}")
+
+    started = time.perf_counter()
+    phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(name: str):
+        phase_started = time.perf_counter()
+        yield
+        phases[name] = round(time.perf_counter() - phase_started, 3)
+        if verbose:
+            print(f"  {name}: {phases[name]:.1f}s")
+
+    with tempfile.TemporaryDirectory(prefix="initial-load-", dir=staging_dir) as tmp_dir:
+        with phase("explode"):
+            counts, position = explode(csv_path, tmp_dir, workers, sentiment_mode)
+
+        conn = get_bulk_connection()
+        cursor = conn.cursor()
+        try:
+            # Read off the live tables, before they are swapped out
+            indexes = {table: secondary_indexes(cursor, table) for table in TABLES}
+            keys = foreign_keys(cursor, TABLES)
+
+            with phase("load"):
+                cursor.execute("SELECT @@GLOBAL.local_infile")
+                local_infile = bool(int(cursor.fetchone()[0]))
+                if not local_infile and verbose:
+                    print("  local_infile is off on the server; loading with INSERTs")
+                for table in TABLE_COLUMNS:
+                    _load_staging(conn, cursor, table, os.path.join(tmp_dir, f"{table}.tsv"), local_infile)
+
+            with phase("build"):
+                # Left behind by a run that failed after its swap
+                _drop_tables(cursor, [f"{table}_old" for table in TABLES])
+                for table in TABLES:
+                    cursor.execute(f"DROP TABLE IF EXISTS {table}_new")
+                    cursor.execute(f"CREATE TABLE {table}_new LIKE {table}")
+                    if indexes[table]:
+                        cursor.execute(f"ALTER TABLE {table}_new "
+                                       + ", ".join(f"DROP INDEX `{name}`" for name in indexes[table]))
+                for table in TABLE_COLUMNS:
+                    cursor.execute(build_sql(table))
+                    conn.commit()
+                    cursor.execute(f"DROP TABLE {table}_load")
+
+            with phase("index"):
+                for table in TABLES:
+                    if indexes[table]:
+                        cursor.execute(f"ALTER TABLE {table}_new "
+                                       + ", ".join(f"ADD {index}" for index in indexes[table].values()))
+
+            with phase("stats"):
+                rebuild_product_stats(cursor, "product_stats_new", "reviews_new")
+                conn.commit()
+
+            with phase("swap"):
+                cursor.execute("RENAME TABLE " + ", ".join(
+                    f"{table} TO {table}_old, {table}_new TO {table}" for table in TABLES))
+                _drop_tables(cursor, [f"{table}_old" for table in TABLES])
+
+            with phase("foreign_keys"):
+                for table, definitions in keys.items():
+                    cursor.execute(f"ALTER TABLE {table} "
+                                   + ", ".join(f"ADD {definition}" for definition in definitions))
+
+            bump_data_version(cursor)
+            data_version = get_data_version(cursor)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    if checkpoint_path is not None and position[0]:
+        etl.Checkpoint(checkpoint_path, csv_path, etl.read_header(csv_path)).save(position, data_version)
+
+    seconds = time.perf_counter() - started
+    rows = sum(counts.values())
+    return {
+        **counts,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds, 1) if seconds > 0 else 0.0,
+        "phases": phases,
+        "start_row": 0,
+    }
@@ -0,0 +1,22 @@
+"""
+Data-version stamp for the loaded dataset.
+
+The ETL bumps the version in the same transaction as the data it loads,
+so anything cached against an older version (API responses, the search
+index) can tell it is stale by comparing stamps.
+"""
+
+
+def get_data_version(cursor) -> int:
+    cursor.execute("SELECT version FROM data_version WHERE id = 1")
+    row = cursor.fetchone()
+    if row is None:
+        return 0
+    return int(row["version"] if isinstance(row, dict) else row[0])
+
+
+def bump_data_version(cursor) -> None:
+    cursor.execute("""
+        INSERT INTO data_version (id, version) VALUES (1, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1
+    """)
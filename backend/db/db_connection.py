@@ -1,5 +1,10 @@
 import os
-from typing import Optional
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
 
 import mysql.connector
 from mysql.connector import MySQLConnection, Error
@@ -10,22 +15,61 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent
 load_dotenv(BASE_DIR / ".env")
 
-def get_db_connection(
-    host: Optional[str] = None,
-    port: Optional[int] = None,
-    user: Optional[str] = None,
-    password: Optional[str] = None,
-    database: Optional[str] = None,
-) -> MySQLConnection:
+# Pool settings (override in backend/db/.env)
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+# Seconds a request waits for a free connection before giving up
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+# Connections older than this many seconds are closed and reopened
+POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", 3600))
+# Connections idle longer than this many seconds are pinged on checkout
+POOL_PING_INTERVAL = float(os.getenv("DB_POOL_PING_INTERVAL", 5))
 
-    conn_config = {
-        "host": host or os.getenv("DB_HOST", "localhost"),
-        "port": int(port or os.getenv("DB_PORT", 3306)),
-        "user": user or os.getenv("DB_USER", "root"),
-        "password": password or os.getenv("DB_PASSWORD", ""),
-        "database": database or os.getenv("DB_NAME", ""),
+# Wraps every cursor opened on a pooled connection (see set_cursor_hook)
+_cursor_hook: Optional[Callable[[Any], Any]] = None
+
+# time.monotonic() by which the current context's statements must finish
+# (see statement_deadline)
+_statement_deadline: ContextVar[Optional[float]] = ContextVar("statement_deadline", default=None)
+
+
+def set_cursor_hook(hook: Optional[Callable[[Any], Any]]) -> None:
+    """
+    Pass every cursor opened on a pooled connection through hook(cursor),
+    which returns the cursor to use (api/metrics.py counts queries this
+    way). None removes the hook.
+    """
+    global _cursor_hook
+    _cursor_hook = hook
+
+
+@contextmanager
+def statement_deadline(seconds: float):
+    """
+    Cap the SELECTs run in this block at `seconds` from now, in MySQL.
+
+    Pooled connections checked out inside the block (or in threads given
+    a copy of its context) get SET SESSION MAX_EXECUTION_TIME with the
+    time left, and are set back to the server default when returned.
+    MySQL stops a SELECT that runs past it with error 3024.
+    """
+    token = _statement_deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _statement_deadline.reset(token)
+
+
+def _default_config() -> Dict[str, Any]:
+    return {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": int(os.getenv("DB_PORT", 3306)),
+        "user": os.getenv("DB_USER", "root"),
+        "password": os.getenv("DB_PASSWORD", ""),
+        "database": os.getenv("DB_NAME", ""),
     }
 
+
+def _connect(conn_config: Dict[str, Any]) -> MySQLConnection:
     try:
         connection = mysql.connector.connect(**conn_config)
         # Ensure we actually connected
@@ -37,13 +81,363 @@ def get_db_connection(
         raise RuntimeError(f"Error connecting to MySQL: {exc}") from exc
 
 
+class PooledConnection:
+    """
+    Proxy around a pooled MySQL connection.
+
+    Behaves like the underlying connection, except that close()
+    hands the connection back to the pool instead of closing it.
+    """
+
+    def __init__(
+        self,
+        pool: "ConnectionPool",
+        connection: MySQLConnection,
+        created_at: float,
+        time_limited: bool = False,
+    ):
+        self._pool = pool
+        self._connection = connection
+        self._created_at = created_at
+        # MAX_EXECUTION_TIME was set for a statement_deadline() block
+        self._time_limited = time_limited
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._connection.cursor(*args, **kwargs)
+        hook = _cursor_hook
+        return cursor if hook is None else hook(cursor)
+
+    def close(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._pool._release(self._connection, self._created_at, self._time_limited)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Fixed-size pool of MySQL connections.
+
+    Connections are opened lazily up to `size`. On checkout, connections
+    older than `recycle` seconds are reopened and connections idle for
+    longer than `ping_interval` seconds are pinged first, so a dropped
+    connection never reaches a route handler.
+    """
+
+    def __init__(
+        self,
+        conn_config: Dict[str, Any],
+        size: int = POOL_SIZE,
+        timeout: float = POOL_TIMEOUT,
+        recycle: float = POOL_RECYCLE,
+        ping_interval: float = POOL_PING_INTERVAL,
+    ):
+        self.conn_config = conn_config
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+
+        self._cond = threading.Condition()
+        # (connection, created_at, last_used_at)
+        self._idle = deque()
+        self._open = 0
+        self._in_use = 0
+
+        self._checkouts = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._exhausted = 0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._failed_health_checks = 0
+        self._time_limited = 0
+
+    def acquire(self) -> PooledConnection:
+        start = time.monotonic()
+        deadline = start + self.timeout
+        entry = None
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                if not waited:
+                    # Every slot is checked out; count it once per request
+                    self._exhausted += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise RuntimeError(
+                        f"Connection pool exhausted: no connection available "
+                        f"after {self.timeout:.1f}s (pool size {self.size})"
+                    )
+                self._cond.wait(remaining)
+            self._in_use += 1
+
+        try:
+            if entry is None:
+                connection, created_at = self._open_connection()
+            else:
+                connection, created_at = self._check_connection(*entry)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        deadline = _statement_deadline.get()
+        if deadline is not None:
+            try:
+                self._limit_execution_time(connection, deadline)
+            except Error:
+                self._release(connection, created_at, time_limited=True)
+                raise
+
+        waited_for = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._wait_time_total += waited_for
+            self._wait_time_max = max(self._wait_time_max, waited_for)
+
+        return PooledConnection(self, connection, created_at, time_limited=deadline is not None)
+
+    def _limit_execution_time(self, connection, deadline: float) -> None:
+        # At least 1 ms: 0 would mean no limit at all
+        ms = max(1, int((deadline - time.monotonic()) * 1000))
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SET SESSION MAX_EXECUTION_TIME = %s", (ms,))
+        finally:
+            cursor.close()
+        with self._cond:
+            self._time_limited += 1
+
+    def _open_connection(self):
+        connection = _connect(self.conn_config)
+        with self._cond:
+            self._created += 1
+        return connection, time.monotonic()
+
+    def _check_connection(self, connection, created_at, last_used_at):
+        now = time.monotonic()
+        if now - created_at > self.recycle:
+            self._discard(connection)
+            with self._cond:
+                self._recycled += 1
+            return self._open_connection()
+
+        if now - last_used_at > self.ping_interval:
+            try:
+                connection.ping(reconnect=False)
+            except Error:
+                self._discard(connection)
+                with self._cond:
+                    self._failed_health_checks += 1
+                return self._open_connection()
+
+        return connection, created_at
+
+    def _release(self, connection, created_at, time_limited: bool = False) -> None:
+        healthy = True
+        try:
+            # Leave nothing behind for the next borrower: unread rows or an
+            # open transaction would pin an old snapshot of the data, and a
+            # request's MAX_EXECUTION_TIME would cut off the next one's.
+            if connection.unread_result:
+                connection.consume_results()
+            if connection.in_transaction:
+                connection.rollback()
+            if time_limited:
+                cursor = connection.cursor()
+                try:
+                    cursor.execute("SET SESSION MAX_EXECUTION_TIME = DEFAULT")
+                finally:
+                    cursor.close()
+        except Error:
+            healthy = False
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((connection, created_at, time.monotonic()))
+            else:
+                self._open -= 1
+            self._cond.notify()
+
+        if not healthy:
+            self._discard(connection)
+
+    @staticmethod
+    def _discard(connection) -> None:
+        try:
+            connection.close()
+        except Error:
+            pass
+
+    def warm(self, count: int) -> int:
+        """Open up to `count` connections ahead of the first requests. Returns how many opened."""
+        opened = 0
+        for _ in range(count):
+            with self._cond:
+                if self._open >= self.size:
+                    break
+                self._open += 1
+            try:
+                connection, created_at = self._open_connection()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append((connection, created_at, time.monotonic()))
+                self._cond.notify()
+            opened += 1
+        return opened
+
+    def close_all(self) -> None:
+        """Close every idle connection. Checked-out connections close on return."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for connection, _, _ in idle:
+            self._discard(connection)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "size": self.size,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "checkouts": self._checkouts,
+                "wait_time_total_seconds": round(self._wait_time_total, 6),
+                "wait_time_max_seconds": round(self._wait_time_max, 6),
+                "exhausted_events": self._exhausted,
+                "timeouts": self._timeouts,
+                "connections_created": self._created,
+                "connections_recycled": self._recycled,
+                "failed_health_checks": self._failed_health_checks,
+                "time_limited_checkouts": self._time_limited,
+            }
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(_default_config())
+    return _pool
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    return get_pool().stats()
+
+
+def reset_pool() -> None:
+    """
+    Forget the pool inherited from a parent process (call after fork).
+
+    The inherited sockets are shared with the parent, so they are dropped
+    without being closed; the next get_pool() builds a fresh pool.
+    """
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+def get_db_connection(
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    user: Optional[str] = None,
+    password: Optional[str] = None,
+    database: Optional[str] = None,
+) -> MySQLConnection:
+    """
+    Return a MySQL connection.
+
+    With no arguments the connection is borrowed from the shared pool and
+    conn.close() returns it. Passing any argument opens a dedicated,
+    unpooled connection with those settings instead.
+    """
+
+    if host is None and port is None and user is None and password is None and database is None:
+        return get_pool().acquire()
+
+    defaults = _default_config()
+    conn_config = {
+        "host": host or defaults["host"],
+        "port": int(port or defaults["port"]),
+        "user": user or defaults["user"],
+        "password": password or defaults["password"],
+        "database": database or defaults["database"],
+    }
+    return _connect(conn_config)
+
+
+def get_bulk_connection() -> MySQLConnection:
+    """
+    Open a dedicated, unpooled connection that may send local files to
+    the server, for LOAD DATA LOCAL INFILE (see bulk_load.py).
+    """
+    return _connect({**_default_config(), "allow_local_infile": True})
+
+
+@contextmanager
+def db_cursor(dictionary: bool = True):
+    """
+    Borrow a pooled connection and yield a cursor on it.
+
+    The cursor is closed and the connection returned to the pool
+    when the block exits, even if it raised.
+
+        with db_cursor() as cursor:
+            cursor.execute("SELECT ...")
+            rows = cursor.fetchall()
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(dictionary=dictionary)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
+
 if __name__ == "__main__":
 
     try:
         conn = get_db_connection()
         print("Successfully connected to MySQL.")
         conn.close()
+        print(f"Pool stats: {get_pool_stats()}")
     except Exception as e:
         print(f"Connection failed: {e}")
-
-
@@ -6,16 +6,47 @@ Requirements:
 - Environment variables for DB connection set (see db_connection.py).
 - mysql-connector-python installed.
 
-Run from project root or backend folder, e.g.:
-    cd backend
-    python etl.py
+Run from the backend/db folder, e.g.:
+    cd backend/db
+    python etl.py [path/to/reviews.csv] [--batch-size 2000] [--workers 4] [--resume]
+
+After every committed batch the ETL saves a checkpoint next to the CSV
+(<csv>.checkpoint.json): the byte offset and row number it got to and
+the data version that batch produced. --resume continues from there, so
+a crashed load keeps the batches it committed and a CSV that has grown
+since the last run only has its new rows read.
+
+Review sentiment is scored per review with VADER (see sentiment.py);
+pass --sentiment csv to keep the product-level score from the CSV.
+
+Every product and review is stored with a content_hash of the values it
+was loaded from. With --delta only rows whose hash changed are written,
+the data version is only bumped by batches that changed something, and
+the ids of the products that changed are reported (--touched-file).
+
+For a cold load, --initial-load bulk-loads the CSV through staging
+tables and swaps the tables in instead of upserting rows (bulk_load.py).
 """
 
+import argparse
 import csv
+import hashlib
+import json
 import os
-from typing import Optional
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator, List, Optional, Tuple
 
-from db_connection import get_db_connection
+from mysql.connector import Error
+
+from data_version import bump_data_version, get_data_version
+from db_connection import POOL_SIZE, get_db_connection
+from product_stats import refresh_product_stats
+import sentiment
 
 
 CSV_PATH_DEFAULT = os.path.join(
@@ -23,6 +54,91 @@ CSV_PATH_DEFAULT = os.path.join(
     "cleaned_amazon_reviews.csv",
 )
 
+# Rows (products + users + reviews) written per transaction
+BATCH_SIZE_DEFAULT = 2000
+# CSV rows handed to a worker process at a time
+CHUNK_SIZE_DEFAULT = 500
+# Transformed chunks waiting for each writer; the reader blocks when full
+QUEUE_DEPTH = 8
+# MySQL errors worth retrying the batch for: deadlock, lock wait timeout
+RETRYABLE_ERRNOS = (1213, 1205)
+MAX_RETRIES = 5
+# "vader": score each review's text; "csv": copy the CSV's product-level score
+SENTIMENT_MODES = ("vader", "csv")
+SENTIMENT_DEFAULT = "vader"
+
+PRODUCT_SQL = """
+    INSERT INTO products (
+        product_id, product_name, category,
+        actual_price_usd, discounted_price_usd, discount_percentage,
+        about_product, img_link, product_link, content_hash
+    )
+    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+    ON DUPLICATE KEY UPDATE
+        product_name = VALUES(product_name),
+        category = VALUES(category),
+        actual_price_usd = VALUES(actual_price_usd),
+        discounted_price_usd = VALUES(discounted_price_usd),
+        discount_percentage = VALUES(discount_percentage),
+        about_product = VALUES(about_product),
+        img_link = VALUES(img_link),
+        product_link = VALUES(product_link),
+        content_hash = VALUES(content_hash)
+"""
+
+USER_SQL = """
+    INSERT INTO users (user_id, user_name)
+    VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE
+        user_name = VALUES(user_name)
+"""
+
+REVIEW_SQL = """
+    INSERT INTO reviews (
+        review_id, product_id, user_id,
+        review_title, review_content,
+        rating, sentiment_score, sentiment_label,
+        review_length, review_date, content_hash
+    )
+    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+    ON DUPLICATE KEY UPDATE
+        review_title = VALUES(review_title),
+        review_content = VALUES(review_content),
+        rating = VALUES(rating),
+        sentiment_score = VALUES(sentiment_score),
+        sentiment_label = VALUES(sentiment_label),
+        review_length = VALUES(review_length),
+        content_hash = VALUES(content_hash)
+"""
+
+# Keep the IN (...) list of one --delta lookup to a reasonable size
+HASH_LOOKUP_CHUNK_SIZE = 500
+
+
+ProductRow = Tuple
+UserRow = Tuple[str, Optional[str]]
+ReviewRow = Tuple
+# (byte offset, CSV rows read) just past a row; (0, 0) is the start of the file
+Position = Tuple[int, int]
+
+
+def fingerprint(values: tuple) -> bytes:
+    """The content_hash of a row: a 16-byte digest of its values."""
+    return hashlib.blake2b(repr(values).encode("utf-8"), digest_size=16).digest()
+
+
+def product_params(product: ProductRow) -> tuple:
+    """PRODUCT_SQL parameters for a transformed product."""
+    return product + (fingerprint(product),)
+
+
+def review_params(review: ReviewRow, user: UserRow) -> tuple:
+    """
+    REVIEW_SQL parameters for a transformed review. The hash covers the
+    reviewer's name too, so a renamed user counts as a changed review.
+    """
+    return review + (fingerprint(review + user[1:]),)
+
 
 def _safe_float(value: str) -> Optional[float]:
     value = value.strip()
@@ -44,165 +160,824 @@ def _safe_int(value: str) -> Optional[int]:
         return None
 
 
-def run_etl(csv_path: str = CSV_PATH_DEFAULT) -> None:
+def transform_row(row: dict) -> Tuple[ProductRow, List[UserRow], List[ReviewRow]]:
     """
-    Read the cleaned_amazon_reviews.csv file and populate
-    products, users and reviews tables.
+    Turn one CSV row into parameter tuples for PRODUCT_SQL, USER_SQL
+    and REVIEW_SQL.
 
     NOTE: The CSV stores multiple users / reviews for a product
-    in comma-separated lists. This ETL processes ALL reviews
-    from each row and inserts them as separate review records.
+    in comma-separated lists. Every review in the row becomes its
+    own review record.
+    """
+    product_id = row["product_id"]
+
+    # --- PRODUCTS ---
+    category = row.get("category", "")
+    if category:
+        category = category.replace(",", "|")
+
+    about_product = row.get("about_product", "")
+    if about_product:
+        about_product = about_product.replace("|", ". ")
+
+    product = (
+        product_id,
+        row["product_name"],
+        category,
+        _safe_float(row.get("actual_price_usd", "")),
+        _safe_float(row.get("discounted_price_usd", "")),
+        _safe_float(row.get("discount_percentage", "")),
+        about_product,
+        row.get("img_link"),
+        row.get("product_link"),
+    )
+
+    # --- USERS and REVIEWS (process ALL reviews) ---
+    user_ids = [u.strip() for u in row.get("user_id", "").split(",") if u.strip()]
+    user_names = [u.strip() for u in row.get("user_name", "").split(",") if u.strip()]
+    review_ids = [r.strip() for r in row.get("review_id", "").split(",") if r.strip()]
+    review_titles = [r.strip() for r in row.get("review_title", "").split(",") if r.strip()]
+    review_contents = [
+        r.strip() for r in row.get("review_content", "").split(",") if r.strip()
+    ]
+
+    users: List[UserRow] = []
+    reviews: List[ReviewRow] = []
+
+    if not review_ids:
+        # No reviews for this product
+        return product, users, reviews
+
+    # Get product-level rating (used for all reviews if individual ratings not available)
+    rating_value = _safe_float(row.get("rating", ""))
+    # Keep the actual decimal rating value, clamped between 1.0 and 5.0
+    rating_float: Optional[float] = None
+    if rating_value is not None:
+        rating_float = max(1.0, min(5.0, float(rating_value)))
+
+    # Product-level sentiment_score from the CSV; transform() replaces it
+    # with a per-review score unless run with --sentiment csv
+    sentiment_score = _safe_float(row.get("sentiment_score", ""))
+
+    # Process each review
+    for i in range(len(review_ids)):
+        # Get user for this review (match by index)
+        if i < len(user_ids):
+            user_id = user_ids[i]
+            user_name = user_names[i] if i < len(user_names) else None
+        else:
+            # Fallback to first user if not enough users
+            user_id = user_ids[0] if user_ids else None
+            user_name = user_names[0] if user_names else None
+
+        if not user_id:
+            continue
+
+        users.append((user_id, user_name))
+
+        # Get review data for this review
+        review_title = review_titles[i] if i < len(review_titles) else None
+        review_content = review_contents[i] if i < len(review_contents) else None
+
+        # Calculate review_length for this specific review
+        review_length = len(review_content) if review_content else 0
+
+        reviews.append((
+            review_ids[i],
+            product_id,
+            user_id,
+            review_title,
+            review_content,
+            rating_float,
+            sentiment_score,
+            row.get("sentiment_label"),
+            review_length,
+            None,  # review_date not available in CSV
+        ))
+
+    return product, users, reviews
+
+
+def score_reviews(reviews: List[ReviewRow]) -> List[ReviewRow]:
+    """Replace the copied product-level sentiment with a VADER score of each review."""
+    scored = []
+    for review in reviews:
+        score, label = sentiment.score_text(review[4])
+        scored.append(review[:6] + (score, label) + review[8:])
+    return scored
+
+
+def transform(row: dict, sentiment_mode: str = SENTIMENT_DEFAULT):
+    """transform_row() followed by the sentiment stage."""
+    product, users, reviews = transform_row(row)
+    if sentiment_mode == "vader" and reviews:
+        reviews = score_reviews(reviews)
+    return product, users, reviews
+
+
+def transform_chunk(
+    header: List[str],
+    rows: List[List[str]],
+    sentiment_mode: str = SENTIMENT_DEFAULT,
+) -> List[tuple]:
+    """Worker-process entry point: transform() over a chunk of raw CSV rows."""
+    return [transform(_as_dict(header, row), sentiment_mode) for row in rows]
+
+
+def _as_dict(header: List[str], row: List[str]) -> dict:
+    if len(row) < len(header):
+        # Short rows get None for missing fields, as csv.DictReader does
+        row = row + [None] * (len(header) - len(row))
+    return dict(zip(header, row))
+
+
+class _Lines:
+    """
+    Lines of a CSV opened in binary mode, decoded one at a time, keeping
+    count of the bytes handed out so csv.reader's position in the file
+    is known after every row. csv.reader only asks for the lines of the
+    row it is parsing, so a quoted field spanning lines is fine.
     """
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    def __init__(self, f, offset: int = 0):
+        self.f = f
+        self.offset = offset
+        self.terminated = True
 
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+    def __iter__(self):
+        return self
 
+    def __next__(self) -> str:
+        line = self.f.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        self.terminated = line.endswith(b"\n")
+        return line.decode("utf-8")
+
+
+def read_header(csv_path: str) -> Optional[List[str]]:
+    with open(csv_path, "rb") as f:
+        return next(csv.reader(_Lines(f)), None)
+
+
+def read_rows(
+    csv_path: str,
+    start: Position = (0, 0),
+) -> Iterator[Tuple[List[str], List[str], Position]]:
+    """
+    Stream (header, row, position) from the CSV, starting after the row
+    ending at `start`, with one row in memory at a time. `position` is
+    where the file has been read up to once `row` is loaded.
+
+    A last row without a line ending is loaded, but its position is the
+    one before it, so a checkpoint never ends mid-line and a resume reads
+    it again. When resuming (`start` past the header) the file is being
+    appended to, so such a row may still be being written; it is left for
+    the next run instead.
+    """
+    with open(csv_path, "rb") as f:
+        lines = _Lines(f)
+        reader = csv.reader(lines)
+        header = next(reader, None)
+        if header is None:
+            return
+        offset, rows = start
+        if offset:
+            f.seek(offset)
+            lines.offset = offset
+        else:
+            offset = lines.offset
         for row in reader:
-            product_id = row["product_id"]
-
-            # --- PRODUCTS ---
-            product_sql = """
-                INSERT INTO products (
-                    product_id, product_name, category,
-                    actual_price_usd, discounted_price_usd, discount_percentage,
-                    about_product, img_link, product_link
-                )
-                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                ON DUPLICATE KEY UPDATE
-                    product_name = VALUES(product_name),
-                    category = VALUES(category),
-                    actual_price_usd = VALUES(actual_price_usd),
-                    discounted_price_usd = VALUES(discounted_price_usd),
-                    discount_percentage = VALUES(discount_percentage),
-                    about_product = VALUES(about_product),
-                    img_link = VALUES(img_link),
-                    product_link = VALUES(product_link)
-            """
-
-            category = row.get("category", "")
-            if category:
-                category = category.replace(",", "|")
-            
-            about_product = row.get("about_product", "")
-            if about_product:
-                about_product = about_product.replace("|", ". ")
-            
-            cursor.execute(
-                product_sql,
-                (
-                    product_id,
-                    row["product_name"],
-                    category,
-                    _safe_float(row.get("actual_price_usd", "")),
-                    _safe_float(row.get("discounted_price_usd", "")),
-                    _safe_float(row.get("discount_percentage", "")),
-                    about_product,
-                    row.get("img_link"),
-                    row.get("product_link"),
-                ),
+            if not lines.terminated:
+                if row and not start[0]:
+                    yield header, row, (offset, rows)
+                return
+            rows += 1
+            offset = lines.offset
+            if row:
+                yield header, row, (offset, rows)
+
+
+def read_chunks(
+    csv_path: str,
+    chunk_size: int,
+    start: Position = (0, 0),
+) -> Iterator[Tuple[List[str], List[List[str]], Position]]:
+    """Stream (header, rows, position) chunks from the CSV without reading it all in."""
+    chunk = []
+    for header, row, position in read_rows(csv_path, start):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield header, chunk, position
+            chunk = []
+    if chunk:
+        yield header, chunk, position
+
+
+def transform_chunks(
+    csv_path: str,
+    workers: int,
+    chunk_size: int = CHUNK_SIZE_DEFAULT,
+    sentiment_mode: str = SENTIMENT_DEFAULT,
+    start: Position = (0, 0),
+) -> Iterator[Tuple[List[tuple], Position]]:
+    """
+    read_chunks() through transform_chunk() in `workers` processes,
+    yielding (transformed rows, position) in CSV order. At most
+    2 * workers chunks are in flight, so reading slows down to the pace
+    of whoever consumes the results. workers <= 1 transforms in-process.
+    """
+    if workers <= 1:
+        for header, rows, position in read_chunks(csv_path, chunk_size, start):
+            yield transform_chunk(header, rows, sentiment_mode), position
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for header, rows, position in read_chunks(csv_path, chunk_size, start):
+            in_flight.append((pool.submit(transform_chunk, header, rows, sentiment_mode), position))
+            if len(in_flight) >= 2 * workers:
+                future, position = in_flight.popleft()
+                yield future.result(), position
+        while in_flight:
+            future, position = in_flight.popleft()
+            yield future.result(), position
+
+
+class Checkpoint:
+    """
+    How far a load of one CSV has committed, saved as JSON at `path`.
+
+    Saved after each committed batch with the position just past the
+    batch's last row and the data version the batch bumped to. The file
+    is replaced atomically, so a crash leaves the previous checkpoint.
+    A crash between a commit and its checkpoint means the batch is read
+    again on resume, which the upserts make harmless.
+    """
+
+    def __init__(self, path: str, csv_path: str, header: List[str]):
+        self.path = path
+        self.csv_path = os.path.realpath(csv_path)
+        self.header = header
+
+    def load(self) -> Optional[Position]:
+        """
+        The saved position, or None without a checkpoint. Raises ValueError
+        if the checkpoint is for another file or the CSV no longer has the
+        committed rows it describes (replaced or rewritten rather than
+        appended to).
+        """
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        offset = saved["offset"]
+        if saved["csv_path"] != self.csv_path:
+            raise ValueError(f"Checkpoint {self.path} is for another CSV ({saved['csv_path']})")
+        if saved["header"] != self.header:
+            raise ValueError(f"The header of {self.csv_path} changed since checkpoint {self.path} was saved")
+        with open(self.csv_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            f.seek(max(0, offset - 1))
+            last = f.read(1)
+        # The committed rows end with a line break where the CSV still has one
+        if offset > size or last != b"\n":
+            raise ValueError(f"{self.csv_path} changed since checkpoint {self.path} was saved")
+        return offset, saved["rows"]
+
+    def save(self, position: Position, data_version: int) -> None:
+        state = {
+            "csv_path": self.csv_path,
+            "header": self.header,
+            "offset": position[0],
+            "rows": position[1],
+            "data_version": data_version,
+            "saved_at": time.time(),
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class ChunkTracker:
+    """
+    Checkpoints a pipelined load. Chunks are split across writers that
+    commit independently, so the checkpoint only moves past a chunk once
+    every writer has committed its part of it and of all earlier chunks.
+    """
+
+    def __init__(self, checkpoint: Checkpoint):
+        self.checkpoint = checkpoint
+        self._lock = threading.Lock()
+        self._parts_left = {}
+        self._positions = {}
+        self._next = 0
+
+    def add(self, seq: int, parts: int, position: Position) -> None:
+        """Register chunk `seq` before its parts are handed to writers."""
+        with self._lock:
+            self._parts_left[seq] = parts
+            self._positions[seq] = position
+
+    def committed(self, seqs: List[int], data_version: int) -> None:
+        """BatchWriter on_commit callback; `seqs` are the chunk parts it finished."""
+        with self._lock:
+            for seq in seqs:
+                self._parts_left[seq] -= 1
+            position = None
+            while self._parts_left.get(self._next) == 0:
+                del self._parts_left[self._next]
+                position = self._positions.pop(self._next)
+                self._next += 1
+            if position is not None:
+                self.checkpoint.save(position, data_version)
+
+
+class BatchWriter:
+    """
+    Buffers transformed rows and writes them with one executemany per
+    table, committing every `batch_size` rows.
+
+    mysql-connector turns each executemany of an INSERT into a single
+    multi-row INSERT ... ON DUPLICATE KEY UPDATE. Rows keep their CSV order
+    within each table, so the last occurrence of a duplicate key wins,
+    the same as the old one-row-at-a-time loader. Products are written
+    before users and users before the reviews that reference them.
+
+    Duplicate products and users inside a batch are collapsed to their
+    last occurrence and written in key order, so concurrent writers lock
+    rows in the same order. A batch that hits a deadlock or lock wait
+    timeout is rolled back and retried.
+
+    Rows can be added with a `mark`; after each commit on_commit(marks,
+    data_version) gets the marks of the rows that batch committed, which
+    is how the load checkpoints its progress through the CSV.
+
+    With `delta`, each batch first reads the stored content_hash of its
+    products and reviews, and the stored names of its users, and drops
+    the rows that haven't changed. A review is matched on (product_id,
+    review_id); a copy of it under another product than the one it is
+    stored under is dropped too. A batch left with nothing to write
+    doesn't bump the data version. touched_product_ids collects the
+    products whose row or reviews were written.
+    """
+
+    def __init__(
+        self,
+        conn,
+        batch_size: int = BATCH_SIZE_DEFAULT,
+        verbose: bool = False,
+        on_commit: Optional[Callable[[list, int], None]] = None,
+        delta: bool = False,
+    ):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.batch_size = max(1, batch_size)
+        self.verbose = verbose
+        self.on_commit = on_commit
+        self.delta = delta
+        self.data_version: Optional[int] = None
+        self.touched_product_ids = set()
+
+        self._products: List[tuple] = []
+        self._users: List[UserRow] = []
+        self._reviews: List[tuple] = []
+        self._touched_product_ids = set()
+        self._marks = []
+
+        self.started = time.perf_counter()
+        self.totals = {"products": 0, "users": 0, "reviews": 0, "batches": 0, "unchanged": 0}
+
+    def pending(self) -> int:
+        return len(self._products) + len(self._users) + len(self._reviews)
+
+    def add(self, product: ProductRow, users: List[UserRow], reviews: List[ReviewRow],
+            mark=None) -> None:
+        """Add transform_row() output: users[i] is the author of reviews[i]."""
+        self._products.append(product_params(product))
+        self._users.extend(users)
+        self._reviews.extend(review_params(review, user) for review, user in zip(reviews, users))
+        if reviews:
+            self._touched_product_ids.add(product[0])
+        if mark is not None:
+            self._marks.append(mark)
+        if self.pending() >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.pending():
+            return
+
+        products = sorted({p[0]: p for p in self._products}.values(), key=lambda p: p[0])
+        users = sorted({u[0]: u for u in self._users}.values(), key=lambda u: u[0])
+
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                touched, unchanged = self._write(products, users, self._reviews)
+                break
+            except Error as exc:
+                self.conn.rollback()
+                if exc.errno not in RETRYABLE_ERRNOS or attempt == MAX_RETRIES:
+                    raise
+                time.sleep(0.05 * 2 ** attempt)
+
+        self.totals["products"] += len(self._products)
+        self.totals["users"] += len(self._users)
+        self.totals["reviews"] += len(self._reviews)
+        self.totals["batches"] += 1
+        self.totals["unchanged"] += unchanged
+        if self.delta:
+            self.touched_product_ids.update(touched)
+        self._products, self._users, self._reviews = [], [], []
+        self._touched_product_ids = set()
+        marks, self._marks = self._marks, []
+        if self.on_commit is not None:
+            self.on_commit(marks, self.data_version)
+
+        if self.verbose:
+            print(f"  batch {self.totals['batches']}: {self.rows_written():,} rows "
+                  f"({self.rows_per_second():,.0f} rows/s)")
+
+    def _write(self, products: List[tuple], users: List[UserRow], reviews: List[tuple]):
+        """Write and commit one batch; returns (touched product ids, unchanged rows)."""
+        stats_product_ids = self._touched_product_ids
+        unchanged = 0
+        if self.delta:
+            count = len(products) + len(reviews)
+            products, users, reviews = self._changed(products, users, reviews)
+            unchanged = count - len(products) - len(reviews)
+            stats_product_ids = {r[1] for r in reviews}
+
+        if products:
+            self.cursor.executemany(PRODUCT_SQL, products)
+        if users:
+            self.cursor.executemany(USER_SQL, users)
+        if reviews:
+            self.cursor.executemany(REVIEW_SQL, reviews)
+
+        if products or reviews or not self.delta:
+            # --- PRODUCT STATS ---
+            refresh_product_stats(self.cursor, stats_product_ids)
+            bump_data_version(self.cursor)
+        if self.on_commit is not None:
+            self.data_version = get_data_version(self.cursor)
+        self.conn.commit()
+        return stats_product_ids | {p[0] for p in products}, unchanged
+
+    def _changed(self, products: List[tuple], users: List[UserRow], reviews: List[tuple]):
+        """The products, users and reviews of a batch that differ from what is stored."""
+        stored = self._stored("products", "product_id", "content_hash", [p[0] for p in products])
+        products = [p for p in products if stored.get(p[0], b"") != p[-1]]
+
+        # users has no hash: user_name is its only value
+        stored = self._stored("users", "user_id", "user_name", [u[0] for u in users])
+        users = [u for u in users if stored.get(u[0], ()) != u[1]]
+
+        # The CSV repeats review ids across products, and the hash covers
+        # the product, so reviews are matched on (product_id, review_id).
+        # reviews holds one row per review_id, which stays with the first
+        # product it was written under; copies under other products are
+        # left alone rather than overwriting it on every run.
+        review_ids = list(dict.fromkeys(r[0] for r in reviews))
+        stored = self._stored("reviews", "review_id", "content_hash", review_ids, owner="product_id")
+        owned = {review_id for _, review_id in stored}
+        changed = []
+        for review in reviews:
+            key = (review[1], review[0])
+            if key not in stored and review[0] in owned:
+                continue
+            if stored.get(key, b"") != review[-1]:
+                changed.append(review)
+                # A review repeated later in the batch compares against this copy
+                stored[key] = review[-1]
+                owned.add(review[0])
+        return products, users, changed
+
+    def _stored(self, table: str, key: str, column: str, ids: List[str],
+                owner: Optional[str] = None) -> dict:
+        """
+        {id: column} for the rows of `ids` that exist, or with an `owner`
+        column {(owner, id): column}.
+        """
+        select = f"{owner}, {key}" if owner else key
+        values = {}
+        for start in range(0, len(ids), HASH_LOOKUP_CHUNK_SIZE):
+            chunk = ids[start:start + HASH_LOOKUP_CHUNK_SIZE]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            self.cursor.execute(
+                f"SELECT {select}, {column} FROM {table} WHERE {key} IN ({placeholders})",
+                tuple(chunk),
             )
+            if owner:
+                values.update(((row[0], row[1]), row[2]) for row in self.cursor.fetchall())
+            else:
+                values.update(self.cursor.fetchall())
+        return values
+
+    def rows_written(self) -> int:
+        return self.totals["products"] + self.totals["users"] + self.totals["reviews"]
+
+    def rows_per_second(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.rows_written() / elapsed if elapsed > 0 else 0.0
+
+    def close(self) -> dict:
+        self.flush()
+        self.cursor.close()
+        stats = {
+            **self.totals,
+            "seconds": round(time.perf_counter() - self.started, 3),
+            "rows_per_second": round(self.rows_per_second(), 1),
+        }
+        if self.delta:
+            stats["touched_product_ids"] = self.touched_product_ids
+        return stats
+
+
+class WriterThread(threading.Thread):
+    """
+    Pipeline stage that drains a queue of (seq, transformed rows) chunks
+    into a BatchWriter on its own connection, marking each chunk's last
+    row with its seq for the ChunkTracker.
+
+    After a failure it keeps draining (and dropping) chunks so the
+    reader never blocks on a full queue; run_parallel_etl() re-raises
+    the error once the pipeline has stopped.
+    """
 
-            # --- USERS and REVIEWS (process ALL reviews) ---
-            user_ids = [u.strip() for u in row.get("user_id", "").split(",") if u.strip()]
-            user_names = [u.strip() for u in row.get("user_name", "").split(",") if u.strip()]
-            review_ids = [r.strip() for r in row.get("review_id", "").split(",") if r.strip()]
-            review_titles = [r.strip() for r in row.get("review_title", "").split(",") if r.strip()]
-            review_contents = [
-                r.strip() for r in row.get("review_content", "").split(",") if r.strip()
-            ]
-
-            if not review_ids:
-                # No reviews for this product; skip
+    def __init__(self, chunks: "queue.Queue", batch_size: int, verbose: bool,
+                 tracker: Optional[ChunkTracker] = None, delta: bool = False):
+        super().__init__(daemon=True)
+        self.chunks = chunks
+        self.batch_size = batch_size
+        self.verbose = verbose
+        self.tracker = tracker
+        self.delta = delta
+        self.stats: Optional[dict] = None
+        self.error: Optional[BaseException] = None
+
+    def run(self) -> None:
+        conn = None
+        writer = None
+        try:
+            conn = get_db_connection()
+            on_commit = self.tracker.committed if self.tracker is not None else None
+            writer = BatchWriter(conn, self.batch_size, self.verbose, on_commit, self.delta)
+        except BaseException as exc:
+            self.error = exc
+
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                break
+            if self.error is not None:
                 continue
+            seq, rows = chunk
+            try:
+                for i, (product, users, reviews) in enumerate(rows, 1):
+                    writer.add(product, users, reviews, seq if i == len(rows) else None)
+            except BaseException as exc:
+                self.error = exc
+
+        try:
+            if self.error is None:
+                self.stats = writer.close()
+        except BaseException as exc:
+            self.error = exc
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+def _partition(chunk: List[tuple], count: int) -> List[List[tuple]]:
+    """Split transformed rows by product_id so each product has one writer."""
+    parts = [[] for _ in range(count)]
+    for item in chunk:
+        parts[zlib.crc32(item[0][0].encode("utf-8")) % count].append(item)
+    return parts
+
+
+def run_parallel_etl(
+    csv_path: str = CSV_PATH_DEFAULT,
+    workers: int = 2,
+    writers: int = 1,
+    batch_size: int = BATCH_SIZE_DEFAULT,
+    chunk_size: int = CHUNK_SIZE_DEFAULT,
+    verbose: bool = False,
+    sentiment_mode: str = SENTIMENT_DEFAULT,
+    checkpoint: Optional[Checkpoint] = None,
+    start: Position = (0, 0),
+    delta: bool = False,
+) -> dict:
+    """
+    Staged version of run_etl():
+
+        reader (this thread) -> `workers` processes running transform()
+        -> bounded queue per writer -> `writers` threads doing batched upserts
+
+    Chunk results are taken in CSV order and at most 2 * workers chunks
+    are in flight (see transform_chunks()), so the reader slows down to
+    the pace of the writers.
+    Rows are routed to writers by product_id, so each product's
+    product_stats row is refreshed by one writer. With one writer the
+    tables end up exactly as with run_etl(); with more, a user or review
+    that appears under products on different writers keeps the values
+    of whichever writer commits last.
+
+    The checkpoint covers the chunks all writers have committed, see
+    ChunkTracker.
+    """
+    if writers > POOL_SIZE:
+        raise ValueError(f"writers ({writers}) must not exceed DB_POOL_SIZE ({POOL_SIZE})")
+
+    started = time.perf_counter()
+    tracker = ChunkTracker(checkpoint) if checkpoint is not None else None
+    queues = [queue.Queue(maxsize=QUEUE_DEPTH) for _ in range(writers)]
+    threads = [WriterThread(q, batch_size, verbose, tracker, delta) for q in queues]
+    for thread in threads:
+        thread.start()
+
+    def dispatch(seq: int, chunk: List[tuple], position: Position) -> None:
+        if writers == 1:
+            parts = [chunk]
+        else:
+            parts = _partition(chunk, writers)
+        if tracker is not None:
+            tracker.add(seq, sum(1 for part in parts if part), position)
+        for q, part in zip(queues, parts):
+            if part:
+                q.put((seq, part))
+
+    chunks = transform_chunks(csv_path, workers, chunk_size, sentiment_mode, start)
+    try:
+        for seq, (chunk, position) in enumerate(chunks):
+            if any(thread.error for thread in threads):
+                break
+            dispatch(seq, chunk, position)
+    finally:
+        chunks.close()
+        for q in queues:
+            q.put(None)
+        for thread in threads:
+            thread.join()
+
+    for thread in threads:
+        if thread.error is not None:
+            raise thread.error
+
+    totals = {"products": 0, "users": 0, "reviews": 0, "batches": 0, "unchanged": 0}
+    for thread in threads:
+        for key in totals:
+            totals[key] += thread.stats[key]
+    seconds = time.perf_counter() - started
+    rows = totals["products"] + totals["users"] + totals["reviews"]
+    stats = {
+        **totals,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds, 1) if seconds > 0 else 0.0,
+    }
+    if delta:
+        stats["touched_product_ids"] = set().union(
+            *(thread.stats["touched_product_ids"] for thread in threads))
+    return stats
+
+
+def run_etl(
+    csv_path: str = CSV_PATH_DEFAULT,
+    batch_size: int = BATCH_SIZE_DEFAULT,
+    verbose: bool = False,
+    workers: int = 1,
+    writers: int = 1,
+    sentiment_mode: str = SENTIMENT_DEFAULT,
+    checkpoint_path: Optional[str] = None,
+    resume: bool = False,
+    delta: bool = False,
+) -> dict:
+    """
+    Read the cleaned_amazon_reviews.csv file and populate
+    products, users and reviews tables.
 
-            # Get product-level rating (used for all reviews if individual ratings not available)
-            rating_value = _safe_float(row.get("rating", ""))
-            # Keep the actual decimal rating value, clamped between 1.0 and 5.0
-            rating_float: Optional[float] = None
-            if rating_value is not None:
-                rating_float = max(1.0, min(5.0, float(rating_value)))
-
-            # Process each review
-            num_reviews = len(review_ids)
-            for i in range(num_reviews):
-                # Get user for this review (match by index)
-                if i < len(user_ids):
-                    user_id = user_ids[i]
-                    user_name = user_names[i] if i < len(user_names) else None
-                else:
-                    # Fallback to first user if not enough users
-                    user_id = user_ids[0] if user_ids else None
-                    user_name = user_names[0] if user_names else None
-
-                if not user_id:
-                    continue
-
-                # Insert/update user
-                user_sql = """
-                    INSERT INTO users (user_id, user_name)
-                    VALUES (%s, %s)
-                    ON DUPLICATE KEY UPDATE
-                        user_name = VALUES(user_name)
-                """
-                cursor.execute(user_sql, (user_id, user_name))
-
-                # Get review data for this review
-                review_id = review_ids[i]
-                review_title = review_titles[i] if i < len(review_titles) else None
-                review_content = review_contents[i] if i < len(review_contents) else None
-
-                # Calculate review_length for this specific review
-                review_length = len(review_content) if review_content else 0
-
-                # Get sentiment_score if available (might be per-review or per-product)
-                # For now, use product-level sentiment_score for all reviews
-                sentiment_score = _safe_float(row.get("sentiment_score", ""))
-
-                # Insert/update review
-                review_sql = """
-                    INSERT INTO reviews (
-                        review_id, product_id, user_id,
-                        review_title, review_content,
-                        rating, sentiment_score, sentiment_label,
-                        review_length, review_date
-                    )
-                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                    ON DUPLICATE KEY UPDATE
-                        review_title = VALUES(review_title),
-                        review_content = VALUES(review_content),
-                        rating = VALUES(rating),
-                        sentiment_score = VALUES(sentiment_score),
-                        sentiment_label = VALUES(sentiment_label),
-                        review_length = VALUES(review_length)
-                """
-
-                cursor.execute(
-                    review_sql,
-                    (
-                        review_id,
-                        product_id,
-                        user_id,
-                        review_title,
-                        review_content,
-                        rating_float,
-                        sentiment_score,
-                        row.get("sentiment_label"),
-                        review_length,
-                        None,  # review_date not available in CSV
-                    ),
-                )
-
-    conn.commit()
-    cursor.close()
-    conn.close()
+    Rows are written in batches of about `batch_size` rows, one
+    transaction per batch. Each transaction also refreshes the
+    product_stats rollup for the products whose reviews it wrote and
+    bumps the data version. Returns row counts and throughput.
 
+    With workers > 1 or writers > 1 the load runs as a pipeline, see
+    run_parallel_etl(). Sentiment scoring then runs in the worker
+    processes, which is where most of the CPU time goes.
 
-if __name__ == "__main__":
-    print(f"Running ETL using CSV: {CSV_PATH_DEFAULT}")
-    run_etl()
-    print("ETL completed.")
+    With a `checkpoint_path` each commit saves a Checkpoint there, and
+    `resume` starts after the rows the saved checkpoint says were
+    committed (from the top if there is none). "start_row" in the result
+    is the number of CSV rows skipped that way.
 
+    With `delta` only new or changed rows are written (see BatchWriter)
+    and the result has the set of "touched_product_ids"; "unchanged"
+    counts the product and review rows skipped.
+    """
+    if sentiment_mode not in SENTIMENT_MODES:
+        raise ValueError(f"Unknown sentiment mode: {sentiment_mode}")
+
+    checkpoint = None
+    start: Position = (0, 0)
+    if checkpoint_path is not None:
+        checkpoint = Checkpoint(checkpoint_path, csv_path, read_header(csv_path))
+        if resume:
+            start = checkpoint.load() or start
+
+    if workers > 1 or writers > 1:
+        stats = run_parallel_etl(csv_path, max(1, workers), max(1, writers), batch_size,
+                                 verbose=verbose, sentiment_mode=sentiment_mode,
+                                 checkpoint=checkpoint, start=start, delta=delta)
+    else:
+        stats = _run_sequential(csv_path, batch_size, verbose, sentiment_mode, checkpoint, start,
+                                delta)
+    return {**stats, "start_row": start[1]}
+
+
+def _run_sequential(csv_path, batch_size, verbose, sentiment_mode, checkpoint, start,
+                    delta) -> dict:
+    on_commit = None
+    if checkpoint is not None:
+        def on_commit(positions, data_version):
+            if positions:
+                checkpoint.save(positions[-1], data_version)
 
+    conn = get_db_connection()
+    writer = BatchWriter(conn, batch_size, verbose, on_commit, delta)
+
+    try:
+        for header, row, position in read_rows(csv_path, start):
+            writer.add(*transform(_as_dict(header, row), sentiment_mode), position)
+        return writer.close()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the reviews CSV into MySQL.")
+    parser.add_argument("csv_path", nargs="?", default=CSV_PATH_DEFAULT)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE_DEFAULT,
+                        help="rows written per transaction (default %(default)s)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes transforming CSV rows (default %(default)s: no pipeline)")
+    parser.add_argument("--writers", type=int, default=1,
+                        help=f"connections writing in parallel, at most DB_POOL_SIZE ({POOL_SIZE})")
+    parser.add_argument("--sentiment", choices=SENTIMENT_MODES, default=SENTIMENT_DEFAULT,
+                        help="score each review with VADER, or copy the CSV's score (default %(default)s)")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <csv_path>.checkpoint.json)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue after the rows the checkpoint says were committed")
+    parser.add_argument("--delta", action="store_true",
+                        help="only write products and reviews whose values changed")
+    parser.add_argument("--touched-file",
+                        help="with --delta, write the ids of changed products here, one per line "
+                             "('-' for stdout)")
+    parser.add_argument("--initial-load", action="store_true",
+                        help="replace the tables with a bulk load of the CSV (see bulk_load.py)")
+    parser.add_argument("--staging-dir",
+                        help="where --initial-load writes its TSV files (default: the temp directory)")
+    parser.add_argument("--verbose", action="store_true",
+                        help="print progress after every batch (or phase, with --initial-load)")
+    args = parser.parse_args()
+    if args.initial_load and (args.resume or args.delta or args.writers > 1):
+        parser.error("--initial-load can't be combined with --resume, --delta or --writers")
+    if args.touched_file and not args.delta:
+        parser.error("--touched-file needs --delta")
+    if args.writers > POOL_SIZE:
+        parser.error(f"--writers must not exceed DB_POOL_SIZE ({POOL_SIZE})")
+    checkpoint_path = args.checkpoint or args.csv_path + ".checkpoint.json"
+
+    print(f"Running ETL using CSV: {args.csv_path}")
+    try:
+        if args.initial_load:
+            from bulk_load import run_initial_load
+            stats = run_initial_load(args.csv_path, args.workers, args.sentiment, args.staging_dir,
+                                     checkpoint_path, args.verbose)
+        else:
+            stats = run_etl(args.csv_path, args.batch_size, args.verbose, args.workers, args.writers,
+                            args.sentiment, checkpoint_path, args.resume, args.delta)
+    except ValueError as exc:
+        parser.exit(1, f"ETL failed: {exc}\n")
+    if stats["start_row"]:
+        print(f"Resumed after CSV row {stats['start_row']:,} ({checkpoint_path}).")
+    print(f"ETL completed: {stats['products']:,} products, {stats['users']:,} users, "
+          f"{stats['reviews']:,} reviews in {stats['seconds']:.1f}s "
+          f"({stats['rows_per_second']:,.0f} rows/s).")
+    if args.initial_load:
+        print("Phases: " + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in stats["phases"].items()))
+    if args.delta:
+        touched = sorted(stats["touched_product_ids"])
+        print(f"Delta: {stats['unchanged']:,} unchanged rows skipped, "
+              f"{len(touched):,} products changed.")
+        if args.touched_file == "-":
+            print("\n".join(touched))
+        elif args.touched_file:
+            with open(args.touched_file, "w", encoding="utf-8") as f:
+                f.writelines(product_id + "\n" for product_id in touched)
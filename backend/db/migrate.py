@@ -0,0 +1,132 @@
+"""
+Apply the SQL migrations in backend/db/migrations to an existing database.
+
+Migrations run in file-name order and are recorded in schema_migrations,
+so running this again only applies new ones. A database created from
+final_project_mysql_schema.sql already lists the migrations it contains.
+
+MySQL commits DDL statements one by one, so a migration that fails
+halfway is not rolled back; the error says which statement failed.
+
+    cd backend/db
+    python migrate.py [--dry-run]
+"""
+
+import argparse
+import os
+from typing import Callable, Dict, List
+
+from db_connection import get_db_connection
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split a migration file on the semicolons that end a line."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    statements, current = [], []
+    for line in lines:
+        current.append(line)
+        if line.rstrip().endswith(";"):
+            statement = "\n".join(current).strip().rstrip(";").strip()
+            if statement:
+                statements.append(statement)
+            current = []
+    tail = "\n".join(current).strip()
+    if tail:
+        statements.append(tail)
+    return statements
+
+
+def _check_no_orphans(cursor) -> None:
+    """Foreign keys can't be added while rows point at missing parents."""
+    checks = {
+        "reviews without a product": """
+            SELECT COUNT(*) FROM reviews r
+            LEFT JOIN products p ON p.product_id = r.product_id
+            WHERE r.product_id IS NOT NULL AND p.product_id IS NULL""",
+        "reviews without a user": """
+            SELECT COUNT(*) FROM reviews r
+            LEFT JOIN users u ON u.user_id = r.user_id
+            WHERE r.user_id IS NOT NULL AND u.user_id IS NULL""",
+        "product_stats rows without a product": """
+            SELECT COUNT(*) FROM product_stats s
+            LEFT JOIN products p ON p.product_id = s.product_id
+            WHERE p.product_id IS NULL""",
+    }
+    problems = []
+    for label, sql in checks.items():
+        cursor.execute(sql)
+        count = cursor.fetchone()[0]
+        if count:
+            problems.append(f"{count} {label}")
+    if problems:
+        raise RuntimeError(
+            "Cannot add foreign keys: " + ", ".join(problems)
+            + ". Reload with etl.py or delete the orphaned rows first."
+        )
+
+
+# Checks to run before a migration touches anything
+PRECHECKS: Dict[str, Callable] = {
+    "003_analytics_indexes.sql": _check_no_orphans,
+}
+
+
+def pending_migrations(cursor) -> List[str]:
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            name VARCHAR(255) PRIMARY KEY,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB
+    """)
+    cursor.execute("SELECT name FROM schema_migrations")
+    applied = {row[0] for row in cursor.fetchall()}
+    names = sorted(name for name in os.listdir(MIGRATIONS_DIR) if name.endswith(".sql"))
+    return [name for name in names if name not in applied]
+
+
+def apply_migration(conn, cursor, name: str) -> None:
+    with open(os.path.join(MIGRATIONS_DIR, name), encoding="utf-8") as f:
+        statements = split_statements(f.read())
+
+    if name in PRECHECKS:
+        PRECHECKS[name](cursor)
+
+    for i, statement in enumerate(statements, 1):
+        try:
+            cursor.execute(statement)
+        except Exception as exc:
+            conn.rollback()
+            raise RuntimeError(
+                f"{name}: statement {i} of {len(statements)} failed "
+                f"({i - 1} already applied): {exc}\n{statement}"
+            ) from exc
+    cursor.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (name,))
+    conn.commit()
+
+
+def migrate(dry_run: bool = False) -> List[str]:
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        pending = pending_migrations(cursor)
+        conn.commit()
+        for name in pending:
+            print(f"{'Would apply' if dry_run else 'Applying'} {name}")
+            if not dry_run:
+                apply_migration(conn, cursor, name)
+        return pending
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations.")
+    parser.add_argument("--dry-run", action="store_true", help="only list pending migrations")
+    args = parser.parse_args()
+
+    applied = migrate(args.dry_run)
+    if not applied:
+        print("Schema is up to date.")
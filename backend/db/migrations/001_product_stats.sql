@@ -0,0 +1,52 @@
+-- Per-product review rollup (see backend/db/product_stats.py), filled
+-- from the reviews already loaded. Applying it again is harmless: the
+-- backfill recomputes each product's row from its reviews.
+
+CREATE TABLE IF NOT EXISTS product_stats (
+    product_id VARCHAR(50) PRIMARY KEY,
+    review_count INT NOT NULL DEFAULT 0,
+    rating_count INT NOT NULL DEFAULT 0,
+    rating_sum DECIMAL(14,2) NOT NULL DEFAULT 0,
+    rating_sum_sq DECIMAL(18,4) NOT NULL DEFAULT 0,
+    rating_min DECIMAL(3,2),
+    rating_max DECIMAL(3,2),
+    sentiment_count INT NOT NULL DEFAULT 0,
+    sentiment_sum DECIMAL(14,3) NOT NULL DEFAULT 0,
+    paired_count INT NOT NULL DEFAULT 0,
+    paired_rating_sum DECIMAL(14,2) NOT NULL DEFAULT 0,
+    paired_sentiment_sum DECIMAL(14,3) NOT NULL DEFAULT 0
+) ENGINE=InnoDB;
+
+INSERT INTO product_stats (
+    product_id, review_count,
+    rating_count, rating_sum, rating_sum_sq, rating_min, rating_max,
+    sentiment_count, sentiment_sum,
+    paired_count, paired_rating_sum, paired_sentiment_sum
+)
+SELECT
+    product_id,
+    COUNT(*),
+    COUNT(rating),
+    COALESCE(SUM(rating), 0),
+    COALESCE(SUM(rating * rating), 0),
+    MIN(rating),
+    MAX(rating),
+    COUNT(sentiment_score),
+    COALESCE(SUM(sentiment_score), 0),
+    COUNT(CASE WHEN sentiment_score IS NOT NULL THEN rating END),
+    COALESCE(SUM(CASE WHEN sentiment_score IS NOT NULL THEN rating END), 0),
+    COALESCE(SUM(CASE WHEN rating IS NOT NULL THEN sentiment_score END), 0)
+FROM reviews
+GROUP BY product_id
+ON DUPLICATE KEY UPDATE
+    review_count = VALUES(review_count),
+    rating_count = VALUES(rating_count),
+    rating_sum = VALUES(rating_sum),
+    rating_sum_sq = VALUES(rating_sum_sq),
+    rating_min = VALUES(rating_min),
+    rating_max = VALUES(rating_max),
+    sentiment_count = VALUES(sentiment_count),
+    sentiment_sum = VALUES(sentiment_sum),
+    paired_count = VALUES(paired_count),
+    paired_rating_sum = VALUES(paired_rating_sum),
+    paired_sentiment_sum = VALUES(paired_sentiment_sum);
@@ -0,0 +1,10 @@
+-- The ETL data-version stamp. run_etl bumps it with every commit, and the
+-- API compares it to tell when cached responses are out of date.
+
+CREATE TABLE IF NOT EXISTS data_version (
+    id TINYINT PRIMARY KEY,
+    version BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO data_version (id, version) VALUES (1, 0);
@@ -0,0 +1,40 @@
+-- Indexes, generated bucket columns and real foreign keys for the
+-- analytics routes. The inline REFERENCES of the original schema were
+-- ignored by MySQL, so reviews had no index on product_id at all.
+-- migrate.py refuses to run this while reviews point at missing
+-- products or users. Foreign keys need InnoDB tables, MySQL's default
+-- engine; convert any MyISAM table with ALTER TABLE ... ENGINE=InnoDB first.
+
+ALTER TABLE products
+    ADD COLUMN top_category VARCHAR(255) GENERATED ALWAYS AS (
+        CASE WHEN category IS NULL OR category = '' THEN NULL
+             ELSE LEFT(SUBSTRING_INDEX(category, '|', 1), 255) END
+    ) STORED,
+    ADD COLUMN price_range VARCHAR(10) GENERATED ALWAYS AS (
+        CASE WHEN discounted_price_usd IS NULL THEN NULL
+             WHEN discounted_price_usd < 50 THEN '$0-$50'
+             WHEN discounted_price_usd < 150 THEN '$50-$150'
+             WHEN discounted_price_usd < 300 THEN '$150-$300'
+             WHEN discounted_price_usd < 500 THEN '$300-$500'
+             ELSE '$500+' END
+    ) STORED,
+    ADD COLUMN discount_range VARCHAR(12) GENERATED ALWAYS AS (
+        CASE WHEN discount_percentage IS NULL THEN NULL
+             WHEN discount_percentage < 25 THEN '0-25% off'
+             WHEN discount_percentage < 50 THEN '25-50% off'
+             WHEN discount_percentage < 75 THEN '50-75% off'
+             ELSE '75%+ off' END
+    ) STORED;
+
+CREATE INDEX idx_products_top_category ON products (top_category);
+CREATE INDEX idx_products_price_range ON products (price_range);
+CREATE INDEX idx_products_discount_range ON products (discount_range);
+CREATE INDEX idx_reviews_product_rating ON reviews (product_id, rating, sentiment_score, review_length);
+
+ALTER TABLE reviews
+    ADD CONSTRAINT fk_reviews_product FOREIGN KEY (product_id) REFERENCES products (product_id),
+    ADD CONSTRAINT fk_reviews_user FOREIGN KEY (user_id) REFERENCES users (user_id);
+
+ALTER TABLE product_stats
+    ADD CONSTRAINT fk_product_stats_product FOREIGN KEY (product_id)
+        REFERENCES products (product_id) ON DELETE CASCADE;
@@ -0,0 +1,4 @@
+-- Lets /api/products/<id>/reviews seek straight to the page after a
+-- cursor: the index order matches ORDER BY rating DESC, review_id ASC.
+
+CREATE INDEX idx_reviews_product_rating_desc ON reviews (product_id, rating DESC, review_id);
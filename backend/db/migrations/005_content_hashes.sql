@@ -0,0 +1,7 @@
+-- Fingerprints of the CSV values each product and review was last loaded
+-- from, written by the ETL. `etl.py --delta` compares against them and
+-- only writes rows whose values changed. Rows loaded before this
+-- migration have no hash, so the first delta run rewrites them once.
+
+ALTER TABLE products ADD COLUMN content_hash BINARY(16);
+ALTER TABLE reviews ADD COLUMN content_hash BINARY(16);
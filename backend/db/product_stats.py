@@ -0,0 +1,93 @@
+"""
+Maintain the product_stats rollup (one row of review sums per product).
+
+The ETL calls refresh_product_stats() for the products it touched, so the
+analytics routes can aggregate per-product rows instead of re-reading
+every review. To backfill an existing database:
+    cd backend/db
+    python product_stats.py
+"""
+
+from typing import Iterable
+
+# Keep the IN (...) list of one statement to a reasonable size
+REFRESH_CHUNK_SIZE = 500
+
+_AGGREGATE_SQL = """
+    SELECT
+        product_id,
+        COUNT(*),
+        COUNT(rating),
+        COALESCE(SUM(rating), 0),
+        COALESCE(SUM(rating * rating), 0),
+        MIN(rating),
+        MAX(rating),
+        COUNT(sentiment_score),
+        COALESCE(SUM(sentiment_score), 0),
+        COUNT(CASE WHEN sentiment_score IS NOT NULL THEN rating END),
+        COALESCE(SUM(CASE WHEN sentiment_score IS NOT NULL THEN rating END), 0),
+        COALESCE(SUM(CASE WHEN rating IS NOT NULL THEN sentiment_score END), 0)
+    FROM {reviews}
+    {where}
+    GROUP BY product_id
+"""
+
+_UPSERT_SQL = """
+    INSERT INTO {table} (
+        product_id, review_count,
+        rating_count, rating_sum, rating_sum_sq, rating_min, rating_max,
+        sentiment_count, sentiment_sum,
+        paired_count, paired_rating_sum, paired_sentiment_sum
+    )
+    {select}
+    ON DUPLICATE KEY UPDATE
+        review_count = VALUES(review_count),
+        rating_count = VALUES(rating_count),
+        rating_sum = VALUES(rating_sum),
+        rating_sum_sq = VALUES(rating_sum_sq),
+        rating_min = VALUES(rating_min),
+        rating_max = VALUES(rating_max),
+        sentiment_count = VALUES(sentiment_count),
+        sentiment_sum = VALUES(sentiment_sum),
+        paired_count = VALUES(paired_count),
+        paired_rating_sum = VALUES(paired_rating_sum),
+        paired_sentiment_sum = VALUES(paired_sentiment_sum)
+"""
+
+
+def refresh_product_stats(cursor, product_ids: Iterable[str]) -> int:
+    """
+    Recompute product_stats rows for the given products from their reviews.
+
+    Runs inside the caller's transaction, so the rollup commits together
+    with the review upserts that changed it. Returns the number of
+    products refreshed.
+    """
+    product_ids = list(dict.fromkeys(product_ids))
+    for start in range(0, len(product_ids), REFRESH_CHUNK_SIZE):
+        chunk = product_ids[start:start + REFRESH_CHUNK_SIZE]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        select = _AGGREGATE_SQL.format(reviews="reviews",
+                                       where=f"WHERE product_id IN ({placeholders})")
+        cursor.execute(_UPSERT_SQL.format(table="product_stats", select=select), tuple(chunk))
+    return len(product_ids)
+
+
+def rebuild_product_stats(cursor, table: str = "product_stats", reviews: str = "reviews") -> None:
+    """Recompute the whole table from reviews (or the same for copies of both tables)."""
+    cursor.execute(f"DELETE FROM {table}")
+    cursor.execute(_UPSERT_SQL.format(table=table, select=_AGGREGATE_SQL.format(reviews=reviews, where="")))
+
+
+if __name__ == "__main__":
+    from data_version import bump_data_version
+    from db_connection import get_db_connection
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    rebuild_product_stats(cursor)
+    bump_data_version(cursor)
+    conn.commit()
+    cursor.close()
+    conn.close()
+    print("product_stats rebuilt.")
@@ -0,0 +1,206 @@
+"""
+In-process inverted index over products for /api/products/search.
+
+Indexes product_name, category and about_product. Every query word must
+match (AND, like the old LIKE search), a word matches any indexed token
+that starts with it, and results are ranked by a field-weighted TF-IDF
+score.
+
+The index holds only product ids and scores; product rows are still
+read from MySQL for the ids it returns.
+"""
+
+import heapq
+import math
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# A hit in the product name counts more than one in the description
+FIELD_WEIGHTS = (
+    ("product_name", 3.0),
+    ("category", 1.5),
+    ("about_product", 1.0),
+)
+
+# Query words shorter than this only match whole tokens, so a single
+# letter does not expand to half the vocabulary
+MIN_PREFIX_LENGTH = 2
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return TOKEN_RE.findall(text.lower())
+
+
+class SearchIndex:
+    def __init__(self):
+        self.product_ids: List[str] = []
+        # token -> (doc numbers, 1 + log(field-weighted term frequency))
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.vocabulary: List[str] = []
+        self.built_at = 0.0
+
+    @classmethod
+    def build(cls, rows: Iterable[dict]) -> "SearchIndex":
+        """Build an index from rows with product_id and the indexed fields."""
+        index = cls()
+        postings = index.postings
+
+        for doc, row in enumerate(rows):
+            index.product_ids.append(row["product_id"])
+            weights: Dict[str, float] = {}
+            for field, field_weight in FIELD_WEIGHTS:
+                for token in tokenize(row.get(field)):
+                    weights[token] = weights.get(token, 0.0) + field_weight
+            for token, weight in weights.items():
+                entry = postings.get(token)
+                if entry is None:
+                    entry = postings[token] = (array("I"), array("f"))
+                # Docs are appended in increasing order, so each list stays sorted
+                entry[0].append(doc)
+                entry[1].append(1.0 + math.log(weight))
+
+        index.vocabulary = sorted(index.postings)
+        index.built_at = time.time()
+        return index
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def _expand(self, word: str) -> List[str]:
+        """Indexed tokens matched by one query word."""
+        if len(word) < MIN_PREFIX_LENGTH:
+            return [word] if word in self.postings else []
+        terms = []
+        i = bisect_left(self.vocabulary, word)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(word):
+            terms.append(self.vocabulary[i])
+            i += 1
+        return terms
+
+    def _matching_docs(self, terms: List[str], within: Optional[set]) -> set:
+        """Docs containing any of `terms`, optionally restricted to `within`."""
+        if within is None:
+            return set().union(*(self.postings[t][0] for t in terms))
+        matched = set()
+        for term in terms:
+            docs = self.postings[term][0]
+            if len(docs) <= 4 * len(within):
+                matched.update(within.intersection(docs))
+            else:
+                # Few candidates left: probe the sorted posting list instead
+                for doc in within:
+                    i = bisect_left(docs, doc)
+                    if i < len(docs) and docs[i] == doc:
+                        matched.add(doc)
+        return matched
+
+    def _score(self, terms: List[str], docs: set, scores: Dict[int, float]) -> None:
+        total_docs = len(self.product_ids)
+        for term in terms:
+            postings, weights = self.postings[term]
+            idf = math.log(1.0 + total_docs / len(postings))
+            if len(postings) <= 4 * len(docs):
+                for doc, weight in zip(postings, weights):
+                    if doc in docs:
+                        scores[doc] = scores.get(doc, 0.0) + weight * idf
+            else:
+                for doc in docs:
+                    i = bisect_left(postings, doc)
+                    if i < len(postings) and postings[i] == doc:
+                        scores[doc] = scores.get(doc, 0.0) + weights[i] * idf
+
+    def search(self, query: str, limit: int = 20) -> List[str]:
+        """Return up to `limit` product ids matching every word, best first."""
+        words = tokenize(query)
+        if not words or not self.product_ids:
+            return []
+
+        expanded = []
+        for word in dict.fromkeys(words):
+            terms = self._expand(word)
+            if not terms:
+                return []
+            size = sum(len(self.postings[t][0]) for t in terms)
+            expanded.append((size, terms))
+
+        # Intersect starting from the most selective word, then score
+        # only the products that matched every word
+        expanded.sort(key=lambda item: item[0])
+        candidates: Optional[set] = None
+        for _, terms in expanded:
+            candidates = self._matching_docs(terms, candidates)
+            if not candidates:
+                return []
+
+        scores: Dict[int, float] = {}
+        for _, terms in expanded:
+            self._score(terms, candidates, scores)
+
+        # Best score first, then table order
+        ranked = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [self.product_ids[doc] for doc, _ in ranked]
+
+
+def load_search_index(cursor) -> SearchIndex:
+    cursor.execute("""
+        SELECT product_id, product_name, category, about_product
+        FROM products
+        ORDER BY product_id
+    """)
+    return SearchIndex.build(cursor.fetchall())
+
+
+class SearchIndexHolder:
+    """
+    Keeps one built index per process and rebuilds it once it is older
+    than `max_age` seconds. The first search waits for the build; later
+    rebuilds run in the background while the old index keeps serving.
+    """
+
+    def __init__(self, loader, max_age: float):
+        self._loader = loader
+        self.max_age = max_age
+        self._index: Optional[SearchIndex] = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+
+    def get(self) -> SearchIndex:
+        index = self._index
+        if index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._loader()
+                return self._index
+        if time.time() - index.built_at > self.max_age:
+            self._rebuild_in_background()
+        return index
+
+    def invalidate(self) -> None:
+        """Force the next get() to schedule a rebuild."""
+        if self._index is not None:
+            self._index.built_at = 0.0
+
+    def _rebuild_in_background(self) -> None:
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def rebuild():
+            try:
+                self._index = self._loader()
+            except Exception:
+                # Keep serving the old index and retry after another max_age
+                self._index.built_at = time.time()
+            finally:
+                self._rebuilding = False
+
+        threading.Thread(target=rebuild, name="search-index-rebuild", daemon=True).start()
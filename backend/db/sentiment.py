@@ -0,0 +1,78 @@
+"""
+Per-review sentiment scoring with VADER for the ETL.
+
+Needs the vaderSentiment package (pip install vaderSentiment). Scores are
+the VADER compound score, rounded to fit reviews.sentiment_score
+DECIMAL(4,3), and labeled with the usual VADER cut-offs.
+
+Each process keeps an LRU cache keyed by a hash of the review text, so
+the same review text (which is common in the Amazon data, where a
+review shows up under every variant of a product) is scored only once.
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+CACHE_MAX_ENTRIES = 200_000
+
+# (sentiment_score, sentiment_label)
+Sentiment = Tuple[Optional[float], Optional[str]]
+
+_analyzer = None
+_cache = OrderedDict()
+cache_hits = 0
+cache_misses = 0
+
+
+def _get_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        try:
+            from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        except ImportError as exc:
+            raise RuntimeError(
+                "Sentiment scoring needs vaderSentiment (pip install vaderSentiment)"
+            ) from exc
+        _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+
+def label_for(compound: float) -> str:
+    if compound >= POSITIVE_THRESHOLD:
+        return "positive"
+    if compound <= NEGATIVE_THRESHOLD:
+        return "negative"
+    return "neutral"
+
+
+def score_text(text: Optional[str]) -> Sentiment:
+    """Score one review; reviews without text get no sentiment."""
+    global cache_hits, cache_misses
+    if not text:
+        return None, None
+
+    key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    cached = _cache.get(key)
+    if cached is not None:
+        cache_hits += 1
+        _cache.move_to_end(key)
+        return cached
+
+    cache_misses += 1
+    compound = round(_get_analyzer().polarity_scores(text)["compound"], 3)
+    result = (compound, label_for(compound))
+    _cache[key] = result
+    if len(_cache) > CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+    return result
+
+
+def score_texts(texts: Iterable[Optional[str]]) -> List[Sentiment]:
+    return [score_text(text) for text in texts]
+
+
+def cache_stats() -> dict:
+    return {"entries": len(_cache), "hits": cache_hits, "misses": cache_misses}
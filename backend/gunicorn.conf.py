@@ -0,0 +1,76 @@
+"""
+Gunicorn settings for serving the API in production.
+
+    cd backend
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be overridden from the environment (defaults shown):
+    PORT=5001
+    WEB_CONCURRENCY=<2 x CPUs + 1>  # worker processes
+    GUNICORN_THREADS=4              # request threads per worker
+    GUNICORN_TIMEOUT=60             # seconds before a stuck worker is restarted
+    GUNICORN_GRACEFUL_TIMEOUT=30    # seconds in-flight requests get on shutdown/reload
+    GUNICORN_KEEPALIVE=5            # seconds an idle keep-alive connection stays open
+    DB_POOL_WARM=<threads>          # MySQL connections each worker opens at startup
+
+Each worker has its own connection pool, so keep DB_POOL_SIZE at least
+GUNICORN_THREADS, and WEB_CONCURRENCY x DB_POOL_SIZE below MySQL's
+max_connections.
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', 5001)}")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+# Each worker imports the app itself, so no pool, index or cache state is
+# shared across a fork
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    from db.db_connection import reset_pool
+
+    reset_pool()
+
+
+def post_worker_init(worker):
+    from db.db_connection import POOL_SIZE, get_pool
+
+    if POOL_SIZE < threads:
+        worker.log.warning(
+            "DB_POOL_SIZE (%s) is smaller than GUNICORN_THREADS (%s); requests will wait for connections",
+            POOL_SIZE, threads,
+        )
+    warm = int(os.getenv("DB_POOL_WARM", threads))
+    try:
+        opened = get_pool().warm(warm)
+        worker.log.info("Opened %s pooled MySQL connections", opened)
+    except Exception as exc:
+        # Serve anyway; connections are opened on demand
+        worker.log.warning("Pool warm-up failed: %s", exc)
+
+    from api import routes
+
+    if routes.columnar is not None:
+        try:
+            engine = routes.columnar.get()
+            worker.log.info("Loaded columnar analytics: %s reviews", engine.review_count)
+        except Exception as exc:
+            # The first analytics request retries the load
+            worker.log.warning("Columnar analytics load failed: %s", exc)
+
+
+def worker_exit(server, worker):
+    from db.db_connection import get_pool
+
+    get_pool().close_all()
@@ -11,6 +11,8 @@ if __name__ == '__main__':
     print('  - GET /api/health')
     print('  - GET /api/products/search?q=<query>')
     print('  - GET /api/products/<product_id>')
+    print('Development server only; in production run:')
+    print('  gunicorn -c gunicorn.conf.py wsgi:app')
     print('=' * 60)
     app.run(debug=True, port=PORT, host='0.0.0.0')
 
@@ -0,0 +1,238 @@
+"""
+Checks that /api/analytics/all (api/analytics.py) and the columnar
+engine (api/columnar.py) return what each /api/analytics/<section>
+route returns.
+
+ROUTE_OUTPUT is what the routes' SQL gives for the rows below, worked
+out by hand: every DECIMAL with the scale MySQL gives it, written out by
+the JSON provider. The columnar engine loads the reviews those rows sum
+up. No database is needed (the columnar check needs numpy):
+
+    cd backend
+    python -m pytest -q test_analytics.py   # or: python test_analytics.py
+"""
+
+import json
+import math
+from decimal import Decimal as D
+
+from api.analytics import SECTIONS, compute_sections
+from api.columnar import PRODUCTS_SQL, REVIEWS_SQL, load_columnar
+from api.json_provider import _default
+
+
+def _product(product_id, name, category, price_range, discount_range, price, stats):
+    (review_count, rating_count, rating_sum, rating_sum_sq, rating_min, rating_max,
+     sentiment_count, sentiment_sum, paired_count, paired_rating_sum, paired_sentiment_sum) = stats
+    return {
+        'product_id': product_id,
+        'product_name': name,
+        'category': category,
+        'top_category': category.split('|')[0],
+        'price_range': price_range,
+        'discount_range': discount_range,
+        'discounted_price_usd': price,
+        'review_count': review_count,
+        'rating_count': rating_count,
+        'rating_sum': rating_sum,
+        'rating_sum_sq': rating_sum_sq,
+        'rating_min': rating_min,
+        'rating_max': rating_max,
+        'sentiment_count': sentiment_count,
+        'sentiment_sum': sentiment_sum,
+        'paired_count': paired_count,
+        'paired_rating_sum': paired_rating_sum,
+        'paired_sentiment_sum': paired_sentiment_sum,
+    }
+
+
+# (product_id, rating, sentiment_score, review_length) per review
+REVIEWS = [
+    ('B01', D('5.00'), D('0.500'), 50),
+    ('B01', D('3.00'), D('0.250'), 70),
+    ('B02', D('5.00'), D('0.900'), 200),
+    ('B02', D('3.00'), D('-0.200'), 300),
+    ('B02', D('4.50'), None, 400),
+    ('B03', D('3.00'), D('0.100'), 500),
+    ('B03', D('2.00'), D('0.050'), 600),
+    ('B03', D('2.00'), D('0.000'), 700),
+    ('B03', None, D('0.300'), 800),
+    ('B04', D('4.00'), None, 30),
+]
+
+# PRODUCT_ROWS_SQL: products joined with their product_stats rows
+PRODUCT_ROWS = [
+    _product('B01', 'USB Cable', 'Electronics|Cables', '$0-$50', '50-75% off', D('3.00'),
+             (2, 2, D('8.00'), D('34.0000'), D('3.00'), D('5.00'), 2, D('0.750'), 2, D('8.00'), D('0.750'))),
+    _product('B02', 'Wall Charger', 'Electronics|Chargers', '$0-$50', '25-50% off', D('20.00'),
+             (3, 3, D('12.50'), D('54.2500'), D('3.00'), D('5.00'), 2, D('0.700'), 2, D('8.00'), D('0.700'))),
+    _product('B03', 'Desk Lamp', 'Home|Lighting', '$50-$150', '0-25% off', D('60.00'),
+             (4, 3, D('7.00'), D('17.0000'), D('2.00'), D('3.00'), 4, D('0.450'), 3, D('7.00'), D('0.150'))),
+    _product('B04', 'Phone Stand', 'Home|Office', None, '0-25% off', None,
+             (1, 1, D('4.00'), D('16.0000'), D('4.00'), D('4.00'), 0, D('0.000'), 0, D('0.00'), D('0.000'))),
+]
+
+# LENGTH_GROUPS_SQL
+LENGTH_GROUPS = [
+    {'length_category': 'Short (<100 chars)', 'product_id': 'B01', 'rating_sum': D('8.00'),
+     'review_count': 2, 'sentiment_sum': D('0.750'), 'sentiment_count': 2, 'length_sum': D('120')},
+    {'length_category': 'Short (<100 chars)', 'product_id': 'B04', 'rating_sum': D('4.00'),
+     'review_count': 1, 'sentiment_sum': None, 'sentiment_count': 0, 'length_sum': D('30')},
+    {'length_category': 'Medium (100-500 chars)', 'product_id': 'B02', 'rating_sum': D('12.50'),
+     'review_count': 3, 'sentiment_sum': D('0.700'), 'sentiment_count': 2, 'length_sum': D('900')},
+    {'length_category': 'Long (500-1000 chars)', 'product_id': 'B03', 'rating_sum': D('7.00'),
+     'review_count': 3, 'sentiment_sum': D('0.150'), 'sentiment_count': 3, 'length_sum': D('1800')},
+]
+
+
+def _top(product_id, name, avg_rating, review_count):
+    return {'product_id': product_id, 'product_name': name, 'avg_rating': avg_rating, 'review_count': review_count}
+
+
+def _flat(product_id, name, category, **fields):
+    return dict(product_id=product_id, product_name=name, category=category, **fields)
+
+
+ROUTE_OUTPUT = {
+    'top-rated-by-category': [
+        {'category': 'Electronics', 'avg_rating': D('4.100000'), 'review_count': 5, 'product_count': 2,
+         'top_products': [_top('B02', 'Wall Charger', D('4.166667'), 3),
+                          _top('B01', 'USB Cable', D('4.000000'), 2)]},
+        {'category': 'Home', 'avg_rating': D('2.750000'), 'review_count': 5, 'product_count': 2,
+         'top_products': [_top('B04', 'Phone Stand', D('4.000000'), 1),
+                          _top('B03', 'Desk Lamp', D('2.333333'), 4)]},
+    ],
+    'sentiment-by-price-range': [
+        {'price_range': '$0-$50', 'avg_sentiment': D('0.3625000'), 'avg_rating': D('4.000000'), 'review_count': 4,
+         'top_products': [_top('B02', 'Wall Charger', D('4.166667'), 3),
+                          _top('B01', 'USB Cable', D('4.000000'), 2)]},
+        {'price_range': '$50-$150', 'avg_sentiment': D('0.1125000'), 'avg_rating': D('2.333333'), 'review_count': 4,
+         'top_products': [_top('B03', 'Desk Lamp', D('2.333333'), 4)]},
+    ],
+    # value_score: avg_rating (6 decimals) / price rounded to 10 decimals, times 1000
+    'best-value-products': [
+        _flat('B01', 'USB Cable', 'Electronics|Cables', discounted_price_usd=D('3.00'),
+              avg_rating=D('4.000000'), review_count=2, value_score=D('1333.3333333000')),
+        _flat('B02', 'Wall Charger', 'Electronics|Chargers', discounted_price_usd=D('20.00'),
+              avg_rating=D('4.166667'), review_count=3, value_score=D('208.3333500000')),
+        _flat('B03', 'Desk Lamp', 'Home|Lighting', discounted_price_usd=D('60.00'),
+              avg_rating=D('2.333333'), review_count=3, value_score=D('38.8888833000')),
+    ],
+    'review-length-rating': [
+        {'length_category': 'Short (<100 chars)', 'avg_rating': D('4.000000'), 'avg_sentiment': D('0.3750000'),
+         'avg_length': D('50.0000'), 'review_count': 3,
+         'top_products': [_top('B01', 'USB Cable', D('4.000000'), 2),
+                          _top('B04', 'Phone Stand', D('4.000000'), 1)]},
+        {'length_category': 'Medium (100-500 chars)', 'avg_rating': D('4.166667'), 'avg_sentiment': D('0.3500000'),
+         'avg_length': D('300.0000'), 'review_count': 3,
+         'top_products': [_top('B02', 'Wall Charger', D('4.166667'), 3)]},
+        {'length_category': 'Long (500-1000 chars)', 'avg_rating': D('2.333333'), 'avg_sentiment': D('0.0500000'),
+         'avg_length': D('600.0000'), 'review_count': 3,
+         'top_products': [_top('B03', 'Desk Lamp', D('2.333333'), 3)]},
+    ],
+    'sentiment-by-category': [
+        {'category': 'Electronics', 'avg_sentiment': D('0.3625000'), 'avg_rating': D('4.000000'),
+         'review_count': 4, 'product_count': 2,
+         'top_products': [_top('B01', 'USB Cable', D('4.000000'), 2),
+                          _top('B02', 'Wall Charger', D('4.000000'), 2)]},
+        {'category': 'Home', 'avg_sentiment': D('0.1125000'), 'avg_rating': D('2.333333'),
+         'review_count': 4, 'product_count': 1,
+         'top_products': [_top('B03', 'Desk Lamp', D('2.333333'), 4)]},
+    ],
+    'discount-review-quality': [
+        {'discount_range': '0-25% off', 'avg_rating': D('2.750000'), 'avg_sentiment': D('0.0500000'),
+         'review_count': 4, 'product_count': 2,
+         'top_products': [_top('B04', 'Phone Stand', D('4.000000'), 1),
+                          _top('B03', 'Desk Lamp', D('2.333333'), 3)]},
+        {'discount_range': '25-50% off', 'avg_rating': D('4.166667'), 'avg_sentiment': D('0.3500000'),
+         'review_count': 3, 'product_count': 1,
+         'top_products': [_top('B02', 'Wall Charger', D('4.166667'), 3)]},
+        {'discount_range': '50-75% off', 'avg_rating': D('4.000000'), 'avg_sentiment': D('0.3750000'),
+         'review_count': 2, 'product_count': 1,
+         'top_products': [_top('B01', 'USB Cable', D('4.000000'), 2)]},
+    ],
+    # rating_stddev: SQRT() of the DECIMAL variance, a double
+    'rating-variance': [
+        _flat('B04', 'Phone Stand', 'Home|Office', avg_rating=D('4.000000'), rating_stddev=0.0,
+              review_count=1, min_rating=D('4.00'), max_rating=D('4.00')),
+        _flat('B03', 'Desk Lamp', 'Home|Lighting', avg_rating=D('2.333333'), rating_stddev=math.sqrt(0.22222222),
+              review_count=3, min_rating=D('2.00'), max_rating=D('3.00')),
+        _flat('B02', 'Wall Charger', 'Electronics|Chargers', avg_rating=D('4.166667'),
+              rating_stddev=math.sqrt(0.72222222), review_count=3, min_rating=D('3.00'), max_rating=D('5.00')),
+        _flat('B01', 'USB Cable', 'Electronics|Cables', avg_rating=D('4.000000'), rating_stddev=1.0,
+              review_count=2, min_rating=D('3.00'), max_rating=D('5.00')),
+    ],
+    'sentiment-rating-comparison': [
+        _flat('B02', 'Wall Charger', 'Electronics|Chargers', avg_rating=D('4.000000'),
+              avg_sentiment=D('0.3500000'), review_count=2, comparison='Rating Higher'),
+        _flat('B01', 'USB Cable', 'Electronics|Cables', avg_rating=D('4.000000'),
+              avg_sentiment=D('0.3750000'), review_count=2, comparison='Rating Higher'),
+        _flat('B03', 'Desk Lamp', 'Home|Lighting', avg_rating=D('2.333333'),
+              avg_sentiment=D('0.0500000'), review_count=3, comparison='Rating Higher'),
+    ],
+}
+
+
+def _json(value):
+    return json.dumps(value, default=_default, sort_keys=True)
+
+
+def test_every_section_matches_its_route():
+    assert list(ROUTE_OUTPUT) == list(SECTIONS)
+    results = compute_sections(list(SECTIONS), PRODUCT_ROWS, LENGTH_GROUPS)
+    for name, expected in ROUTE_OUTPUT.items():
+        assert _json(results[name]) == _json(expected), name
+
+
+class ColumnarCursor:
+    """Answers load_columnar's two queries from REVIEWS and PRODUCT_ROWS."""
+
+    PRODUCT_COLUMNS = ('product_id', 'product_name', 'category', 'top_category',
+                       'price_range', 'discount_range', 'discounted_price_usd')
+
+    def __init__(self):
+        self.description = None
+        self._rows = []
+
+    def execute(self, sql):
+        if sql is PRODUCTS_SQL:
+            self.description = [(column,) for column in self.PRODUCT_COLUMNS]
+            products = PRODUCT_ROWS + [_product('B05', 'Lamp Shade', 'Home|Lighting', '$0-$50', '0-25% off',
+                                                D('9.00'), (0,) * 11)]
+            self._rows = [tuple(p[column] for column in self.PRODUCT_COLUMNS) for p in products]
+        elif sql is REVIEWS_SQL:
+            # CAST(rating * 100 AS SIGNED), CAST(sentiment_score * 1000 AS SIGNED)
+            self._rows = [(product_id,
+                           None if rating is None else int(rating * 100),
+                           None if sentiment is None else int(sentiment * 1000),
+                           length)
+                          for product_id, rating, sentiment, length in REVIEWS]
+        else:
+            raise AssertionError(sql)
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+
+def test_columnar_engine_matches_sections_and_routes():
+    engine = load_columnar(ColumnarCursor())
+    for top_n, limit in ((5, None), (1, 2)):
+        columnar = engine.compute(list(SECTIONS), top_n, limit)
+        sql = compute_sections(list(SECTIONS), PRODUCT_ROWS, LENGTH_GROUPS, top_n, limit)
+        for name in SECTIONS:
+            assert _json(columnar[name]) == _json(sql[name]), (name, top_n, limit)
+    columnar = engine.compute(list(SECTIONS))
+    for name, expected in ROUTE_OUTPUT.items():
+        assert _json(columnar[name]) == _json(expected), name
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            check()
+            print(f"ok  {name}")
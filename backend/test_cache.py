@@ -0,0 +1,137 @@
+"""
+Checks for the analytics response cache and its time budgets
+(api/cache.py, api/budget.py), on a throwaway Flask app.
+
+    cd backend
+    python -m pytest -q test_cache.py   # or: python test_cache.py
+"""
+
+import threading
+import time
+
+from flask import Flask, jsonify
+
+import api.budget as budget
+from api.cache import DataVersion, LRUCache, ResponseCache
+
+BUDGET_MS = 100
+
+
+class SlowView:
+    """A view taking `seconds` per call, counting its calls."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.seconds)
+        return jsonify({"rows": [1, 2, 3]})
+
+
+def _app(view, loader=lambda: 1, stale=None):
+    app = Flask(__name__)
+    cache = ResponseCache(LRUCache(), DataVersion(loader, check_interval=0), stale=stale)
+    app.add_url_rule("/api/analytics/slow", "slow", cache.cached(view))
+    return app, cache
+
+
+def _with_budget(check):
+    saved = budget.ANALYTICS_BUDGET_MS
+    budget.ANALYTICS_BUDGET_MS = BUDGET_MS
+    try:
+        check()
+    finally:
+        budget.ANALYTICS_BUDGET_MS = saved
+
+
+def _wait_for(condition, seconds=5.0):
+    deadline = time.monotonic() + seconds
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_refresh_keeps_the_timed_out_view_instead_of_running_it_again():
+    def check():
+        view = SlowView(3 * BUDGET_MS / 1000)
+        app, cache = _app(view)
+        client = app.test_client()
+
+        first = client.get("/api/analytics/slow")
+        assert first.status_code == 503
+        _wait_for(lambda: not cache._refreshing)
+        assert view.calls == 1
+        assert cache.refresh_failures == 0
+
+        second = client.get("/api/analytics/slow")
+        assert (second.status_code, second.headers["X-Cache"]) == (200, "HIT")
+        assert second.get_json() == {"rows": [1, 2, 3]}
+
+    _with_budget(check)
+
+
+class FlakyVersion:
+    """A data-version loader that answers 1 until told to fail or hang."""
+
+    def __init__(self):
+        self.mode = "ok"
+
+    def __call__(self):
+        if self.mode == "fail":
+            raise ConnectionError("MySQL is down")
+        if self.mode == "hang":
+            # Waiting for a pooled connection, up to DB_POOL_TIMEOUT
+            time.sleep(1)
+        return 1
+
+
+def test_version_lookup_failing_or_hanging_uses_the_last_version_seen():
+    def check():
+        loader = FlakyVersion()
+        app, cache = _app(SlowView(0), loader)
+        client = app.test_client()
+        assert client.get("/api/analytics/slow").headers["X-Cache"] == "MISS"
+
+        for mode in ("fail", "hang"):
+            loader.mode = mode
+            started = time.monotonic()
+            response = client.get("/api/analytics/slow")
+            assert time.monotonic() - started < 0.5, mode
+            assert (response.status_code, response.headers["X-Cache"]) == (200, "HIT"), mode
+
+    _with_budget(check)
+
+
+def test_version_lookup_failing_or_hanging_with_no_version_seen_serves_stale():
+    def check():
+        app, warm = _app(SlowView(0))
+        assert app.test_client().get("/api/analytics/slow").status_code == 200
+
+        for mode in ("fail", "hang"):
+            # A worker that has not read the version yet, since MySQL went away
+            loader = FlakyVersion()
+            loader.mode = mode
+            app, cache = _app(SlowView(0), loader, stale=warm.stale)
+            started = time.monotonic()
+            response = app.test_client().get("/api/analytics/slow")
+            assert time.monotonic() - started < 0.5, mode
+            assert (response.status_code, response.headers["X-Cache"]) == (200, "STALE"), mode
+            assert response.get_json() == {"rows": [1, 2, 3]}
+
+            # And with nothing to fall back on, a 503 rather than a 500
+            app, cache = _app(SlowView(0), loader)
+            response = app.test_client().get("/api/analytics/slow")
+            assert (response.status_code, response.headers["Retry-After"]) == (503, str(budget.STALE_RETRY_AFTER))
+
+    _with_budget(check)
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            check()
+            print(f"ok  {name}")
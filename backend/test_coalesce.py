@@ -0,0 +1,49 @@
+"""
+Checks for coalescing analytics requests across workers (api/coalesce.py).
+
+    cd backend
+    python -m pytest -q test_coalesce.py   # or: python test_coalesce.py
+"""
+
+import tempfile
+
+from api.coalesce import FileFlight
+
+OK = (b'{"rows": []}', "application/json", 200, {})
+UNAVAILABLE = (b'{"error": "busy"}', "application/json", 503, {"Retry-After": "5"})
+STALE = (b'{"rows": []}', "application/json", 200, {"X-Cache": "STALE", "Age": "42"})
+
+
+def _follow(flight, key, leader_payload):
+    """What a worker asking for `key` after a leader that produced `leader_payload` ends up with."""
+    flight.do(key, lambda: (leader_payload, "leader response"))
+    calls = []
+
+    def compute():
+        calls.append(key)
+        return OK, "own response"
+
+    (payload, _), computed = flight.do(key, compute)
+    return payload, computed, calls
+
+
+def test_good_response_is_shared():
+    with tempfile.TemporaryDirectory() as directory:
+        payload, computed, calls = _follow(FileFlight(directory), "1:/api/analytics/all?", OK)
+        assert (payload, computed, calls) == (OK, False, [])
+
+
+def test_failed_or_stale_response_is_not_shared():
+    with tempfile.TemporaryDirectory() as directory:
+        flight = FileFlight(directory)
+        for leader_payload in (UNAVAILABLE, STALE):
+            key = f"1:/api/analytics/all?{leader_payload[2]}"
+            payload, computed, calls = _follow(flight, key, leader_payload)
+            assert (payload, computed, calls) == (OK, True, [key])
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            check()
+            print(f"ok  {name}")
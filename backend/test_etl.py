@@ -0,0 +1,167 @@
+"""
+Checks for the ETL's CSV reading and change detection (db/etl.py).
+
+No database is needed; BatchWriter writes to a stand-in for the three
+tables it upserts into (FakeTables):
+
+    cd backend
+    python -m pytest -q test_etl.py   # or: python test_etl.py
+"""
+
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "db"))
+
+import etl  # noqa: E402
+
+HEADER = b"product_id,review_id,review_content\r\n"
+
+
+def _csv(data: bytes) -> str:
+    f = tempfile.NamedTemporaryFile(suffix=".csv", delete=False)
+    with f:
+        f.write(data)
+    return f.name
+
+
+def _read(csv_path, start=(0, 0)):
+    return [(row, position) for _, row, position in etl.read_rows(csv_path, start)]
+
+
+def test_last_row_without_line_break_is_loaded():
+    path = _csv(HEADER + b"P1,R1,first\r\nP2,R2,second")
+    try:
+        rows = _read(path)
+        assert [row for row, _ in rows] == [["P1", "R1", "first"], ["P2", "R2", "second"]]
+        # The checkpoint stops before the unterminated row, so a resume reads it again
+        assert rows[1][1] == rows[0][1]
+    finally:
+        os.remove(path)
+
+
+def test_only_row_without_line_break_is_loaded():
+    path = _csv(HEADER + b"P1,R1,only")
+    try:
+        rows = _read(path)
+        assert rows == [(["P1", "R1", "only"], (len(HEADER), 0))]
+    finally:
+        os.remove(path)
+
+
+def test_resume_leaves_a_row_without_line_break_for_later():
+    path = _csv(HEADER + b"P1,R1,first\r\nP2,R2,being writ")
+    try:
+        (_, position), _ = _read(path)
+        assert _read(path, position) == []
+        with open(path, "ab") as f:
+            f.write(b"ten\r\n")
+        assert _read(path, position) == [(["P2", "R2", "being written"], (os.path.getsize(path), 2))]
+    finally:
+        os.remove(path)
+
+
+class FakeTables:
+    """
+    products, users and reviews keyed as in MySQL, with the effect of
+    their ON DUPLICATE KEY UPDATE: a stored review keeps its product_id.
+    Counts the rows sent to each table.
+    """
+
+    SELECT_RE = re.compile(r"SELECT (.+) FROM (\w+) WHERE (\w+) IN")
+    COLUMNS = {
+        "products": ("product_id", "content_hash"),
+        "users": ("user_id", "user_name"),
+        "reviews": ("review_id", "product_id", "content_hash"),
+    }
+
+    def __init__(self):
+        self.rows = {"products": {}, "users": {}, "reviews": {}}
+        self.written = {"products": 0, "users": 0, "reviews": 0}
+        self._result = []
+
+    # connection
+    def cursor(self):
+        return self
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    # cursor
+    def executemany(self, sql, params):
+        if sql is etl.PRODUCT_SQL:
+            table, rows = "products", [(p[0], p[-1]) for p in params]
+        elif sql is etl.USER_SQL:
+            table, rows = "users", [tuple(u) for u in params]
+        else:
+            table, rows = "reviews", [(r[0], r[1], r[-1]) for r in params]
+        for row in rows:
+            stored = self.rows[table].get(row[0])
+            if table == "reviews" and stored is not None:
+                row = (row[0], stored[1], row[2])
+            self.rows[table][row[0]] = row
+        self.written[table] += len(rows)
+
+    def execute(self, sql, params=()):
+        match = self.SELECT_RE.match(sql.strip())
+        self._result = []
+        if match:
+            columns, table, _ = match.groups()
+            columns = [c.strip() for c in columns.split(",")]
+            index = [self.COLUMNS[table].index(c) for c in columns]
+            self._result = [tuple(self.rows[table][key][i] for i in index)
+                            for key in params if key in self.rows[table]]
+
+    def fetchall(self):
+        return self._result
+
+    def close(self):
+        pass
+
+
+REVIEWS_CSV = (
+    b"product_id,product_name,category,rating,user_id,user_name,review_id,review_title,review_content\r\n"
+    # R1 and R2 are listed under both products, with the product's rating
+    b"P1,Cable,Cables,4.0,\"U1,U2\",\"Ann,Bo\",\"R1,R2\",\"Good,Bad\",\"Works,Broke\"\r\n"
+    b"P2,Cable (2m),Cables,3.5,\"U1,U2\",\"Ann,Bo\",\"R1,R2\",\"Good,Bad\",\"Works,Broke\"\r\n"
+    b"P3,Lamp,Lighting,5.0,U3,Cy,R3,Bright,Lights up\r\n"
+)
+
+
+def _load(tables, csv_path, batch_size):
+    writer = etl.BatchWriter(tables, batch_size, delta=True)
+    for header, row, _ in etl.read_rows(csv_path):
+        writer.add(*etl.transform(etl._as_dict(header, row), "csv"))
+    return writer.close()
+
+
+def test_second_delta_run_writes_nothing():
+    path = _csv(REVIEWS_CSV)
+    try:
+        for batch_size in (1, 1000):
+            tables = FakeTables()
+            first = _load(tables, path, batch_size)
+            assert first["touched_product_ids"] == {"P1", "P2", "P3"}
+            # Each review stays with the first product it was listed under
+            assert {r[0]: r[1] for r in tables.rows["reviews"].values()} == {"R1": "P1", "R2": "P1", "R3": "P3"}
+            assert tables.written["reviews"] == 3
+
+            written = dict(tables.written)
+            second = _load(tables, path, batch_size)
+            assert tables.written == written
+            assert second["touched_product_ids"] == set()
+            assert second["unchanged"] == 3 + 5
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            check()
+            print(f"ok  {name}")
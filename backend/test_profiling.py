@@ -0,0 +1,72 @@
+"""
+Checks for the request profiler (api/profiling.py).
+
+    cd backend
+    python -m pytest -q test_profiling.py   # or: python test_profiling.py
+"""
+
+import contextlib
+import threading
+import time
+
+from api import profiling
+from api.budget import run_within
+from api.fanout import run_concurrently
+from api.profiling import StackSampler
+
+
+def _busy_view(seconds=0.1):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+    return "done"
+
+
+@contextlib.contextmanager
+def _profiled():
+    sampler = StackSampler(threading.get_ident(), interval=0.001)
+    token = profiling._sampler.set(sampler)
+    sampler.start()
+    try:
+        yield sampler
+    finally:
+        sampler.stop()
+        profiling._sampler.reset(token)
+
+
+def _sampled_in(sampler, thread_prefix, function):
+    return [stack for stack in sampler.stacks
+            if stack.startswith("[" + thread_prefix) and f"{function} (" in stack]
+
+
+def test_budgeted_view_is_sampled_on_its_thread():
+    with _profiled() as sampler:
+        assert run_within(5, _busy_view) == "done"
+    assert _sampled_in(sampler, "analytics-budget", "_busy_view")
+
+
+def test_fanned_out_queries_are_sampled_on_their_threads():
+    tasks = {name: lambda cursor: _busy_view() for name in ("first", "second", "third")}
+    with _profiled() as sampler:
+        results = run_concurrently(tasks, contextlib.nullcontext, limit=3)
+    assert results == {"first": "done", "second": "done", "third": "done"}
+    assert _sampled_in(sampler, "query-fanout", "_busy_view")
+    # The first task runs on the request thread, whose stacks have no thread frame
+    assert any(not stack.startswith("[") and "_busy_view (" in stack for stack in sampler.stacks)
+
+
+def test_threads_outside_a_profiled_request_are_not_sampled():
+    sampler = StackSampler(threading.get_ident(), interval=0.001)
+    sampler.start()
+    try:
+        run_within(5, _busy_view)
+    finally:
+        sampler.stop()
+    assert not _sampled_in(sampler, "analytics-budget", "_busy_view")
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            check()
+            print(f"ok  {name}")
@@ -0,0 +1,222 @@
+"""
+Script to check the MySQL query plans of every API route.
+
+Calls each route through the Flask test client against the database in
+backend/db/.env, runs EXPLAIN FORMAT=JSON on every statement the route
+executes, and checks the plan against what the schema's indexes should
+give (see db/migrations/). Exits with status 1 if any plan regressed,
+e.g. a full scan of reviews or a bucket column computed from
+products.category again.
+
+    cd backend
+    python test_query_plans.py
+"""
+
+import json
+import os
+import sys
+from contextlib import contextmanager
+
+# Plans are what's being checked, not cached responses
+os.environ["CACHE_BACKEND"] = "none"
+
+from api import create_app  # noqa: E402
+import api.routes as routes  # noqa: E402
+from api.pagination import encode_cursor  # noqa: E402
+from db.db_connection import db_cursor  # noqa: E402
+
+# Route -> expectations per table. Every key is optional:
+#   access:      allowed access_type values
+#   key:         index the table must be read through
+#   covering:    True if the table must be read from the index alone
+#   not_reading: columns the plan must not read
+ROUTE_CHECKS = {
+    "/api/products/search?q={word}": {
+        "products": {"access": ("range", "eq_ref", "const")},
+        "product_stats": {"access": ("eq_ref", "const"), "key": "PRIMARY"},
+    },
+    "/api/products/{product_id}": {
+        "products": {"access": ("const", "eq_ref"), "key": "PRIMARY"},
+        "product_stats": {"access": ("const", "eq_ref"), "key": "PRIMARY"},
+    },
+    "/api/products/{product_id}/reviews?limit=5&offset=0": {
+        "reviews": {"access": ("ref",), "key": "idx_reviews_product_rating_desc"},
+        "users": {"access": ("eq_ref",), "key": "PRIMARY"},
+        "product_stats": {"access": ("const", "eq_ref"), "key": "PRIMARY"},
+    },
+    "/api/products/{product_id}/reviews?limit=5&after={after}": {
+        "reviews": {"access": ("range", "ref"), "key": "idx_reviews_product_rating_desc"},
+        "users": {"access": ("eq_ref",), "key": "PRIMARY"},
+        "product_stats": {"access": ("const", "eq_ref"), "key": "PRIMARY"},
+    },
+    "/api/analytics/top-rated-by-category": {
+        "products": {"not_reading": ("category",)},
+        "product_stats": {},
+    },
+    "/api/analytics/sentiment-by-price-range": {
+        "products": {"not_reading": ("discounted_price_usd",)},
+        "product_stats": {},
+    },
+    "/api/analytics/best-value-products": {
+        "products": {},
+        "product_stats": {},
+    },
+    "/api/analytics/review-length-rating": {
+        "reviews": {"access": ("index", "ref"), "key": "idx_reviews_product_rating", "covering": True},
+        "products": {"access": ("eq_ref",), "key": "PRIMARY"},
+    },
+    "/api/analytics/sentiment-by-category": {
+        "products": {"not_reading": ("category",)},
+        "product_stats": {},
+    },
+    "/api/analytics/discount-review-quality": {
+        "products": {"not_reading": ("discount_percentage",)},
+        "product_stats": {},
+    },
+    "/api/analytics/rating-variance": {
+        "products": {},
+        "product_stats": {},
+    },
+    "/api/analytics/sentiment-rating-comparison": {
+        "products": {},
+        "product_stats": {},
+    },
+    "/api/analytics/all": {
+        "products": {},
+        "product_stats": {},
+        "reviews": {"access": ("index",), "key": "idx_reviews_product_rating", "covering": True},
+    },
+}
+
+# Tables that must never be read with a full table scan
+NO_FULL_SCAN = ("reviews",)
+
+
+class ExplainingCursor:
+    """Cursor proxy that records EXPLAIN FORMAT=JSON of each statement before running it."""
+
+    def __init__(self, cursor, plans):
+        self._cursor = cursor
+        self._plans = plans
+
+    def execute(self, operation, params=None):
+        self._cursor.execute("EXPLAIN FORMAT=JSON " + operation, params)
+        row = self._cursor.fetchone()
+        explain = row["EXPLAIN"] if isinstance(row, dict) else row[0]
+        self._plans.append(json.loads(explain))
+        return self._cursor.execute(operation, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def plan_tables(node):
+    """Yield every table access node of an EXPLAIN FORMAT=JSON plan."""
+    if isinstance(node, dict):
+        if "table_name" in node and "access_type" in node:
+            yield node
+        for value in node.values():
+            yield from plan_tables(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from plan_tables(value)
+
+
+def check_plans(plans, expectations):
+    problems = []
+    tables = [table for plan in plans for table in plan_tables(plan)]
+    seen = {table["table_name"] for table in tables}
+
+    for table in tables:
+        name = table["table_name"]
+        if name in NO_FULL_SCAN and table["access_type"] == "ALL":
+            problems.append(f"full table scan of {name}")
+        expected = expectations.get(name)
+        if expected is None:
+            continue
+        if "access" in expected and table["access_type"] not in expected["access"]:
+            problems.append(f"{name}: access {table['access_type']}, expected one of {expected['access']}")
+        if "key" in expected and table.get("key") != expected["key"]:
+            problems.append(f"{name}: key {table.get('key')}, expected {expected['key']}")
+        if expected.get("covering") and not table.get("using_index"):
+            problems.append(f"{name}: not read from the index alone")
+        for column in expected.get("not_reading", ()):
+            if column in table.get("used_columns", []):
+                problems.append(f"{name}: reads {column}")
+
+    for name in expectations:
+        if name not in seen:
+            problems.append(f"{name}: not in the plan")
+    return problems
+
+
+def sample_ids():
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT p.product_id, p.product_name
+            FROM product_stats s JOIN products p ON p.product_id = s.product_id
+            ORDER BY s.review_count DESC LIMIT 1
+        """)
+        row = cursor.fetchone()
+    if not row:
+        return None
+    word = next((w for w in row["product_name"].split() if w.isalpha()), row["product_name"][:3])
+
+    # A cursor pointing into the middle of that product's reviews
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT rating, review_id FROM reviews WHERE product_id = %s
+            ORDER BY rating DESC, review_id LIMIT 1 OFFSET 5
+        """, (row["product_id"],))
+        middle = cursor.fetchone()
+    after = encode_cursor(middle["rating"], middle["review_id"]) if middle else encode_cursor(None, "")
+    return {"product_id": row["product_id"], "word": word, "after": after}
+
+
+def main():
+    print("=" * 60)
+    print("Checking query plans")
+    print("=" * 60)
+
+    ids = sample_ids()
+    if ids is None:
+        print("\n❌ No reviewed products found; load data with db/etl.py first.")
+        sys.exit(1)
+
+    # Load the search index and data version before plans are captured
+    routes.search_index.get()
+    routes.data_version.current()
+    routes.data_version.check_interval = float("inf")
+
+    plans = []
+
+    @contextmanager
+    def explaining_db_cursor(dictionary=True):
+        with db_cursor(dictionary) as cursor:
+            yield ExplainingCursor(cursor, plans)
+
+    routes.db_cursor = explaining_db_cursor
+    client = create_app().test_client()
+
+    failed = 0
+    for template, expectations in ROUTE_CHECKS.items():
+        path = template.format(**ids)
+        plans.clear()
+        response = client.get(path)
+        problems = [] if response.status_code == 200 else [f"HTTP {response.status_code}"]
+        problems += check_plans(plans, expectations)
+        if problems:
+            failed += 1
+            print(f"\n❌ {path}")
+            for problem in problems:
+                print(f"   - {problem}")
+        else:
+            print(f"✅ {path}")
+
+    print("\n" + "=" * 60)
+    print(f"{len(ROUTE_CHECKS) - failed}/{len(ROUTE_CHECKS)} routes have the expected plans")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
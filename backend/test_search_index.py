@@ -0,0 +1,62 @@
+"""
+Checks for the product search index (db/search_index.py).
+
+The index does not return what the old LIKE query did. The LIKE query
+matched substrings of product_name and returned the first 20 rows in
+table order. The index matches word prefixes in product_name, category
+and about_product, and ranks the matches: a name hit counts more than a
+category or description hit. These checks pin that ranking down.
+
+No database is needed:
+
+    cd backend
+    python -m pytest -q test_search_index.py   # or: python test_search_index.py
+"""
+
+from db.search_index import SearchIndex
+
+PRODUCTS = [
+    # In table order, the LIKE query would return B001 first for "cable"
+    {"product_id": "B001", "product_name": "Phone Stand", "category": "Accessories",
+     "about_product": "Holds a phone while the cable charges it"},
+    {"product_id": "B002", "product_name": "Braided USB Cable", "category": "Electronics|Cables",
+     "about_product": "Fast charging cable"},
+    {"product_id": "B003", "product_name": "USB Wall Charger", "category": "Electronics|Chargers",
+     "about_product": "Charges a phone over any USB cable"},
+    {"product_id": "B004", "product_name": "Desk Lamp", "category": "Home|Lighting",
+     "about_product": "Warm light"},
+]
+
+
+def _index():
+    return SearchIndex.build(PRODUCTS)
+
+
+def test_name_matches_rank_above_description_matches():
+    # B002 has "cable" in its name; B001 and B003 only in the description
+    assert _index().search("cable") == ["B002", "B001", "B003"]
+
+
+def test_matches_outside_the_name_are_found():
+    # LIKE on product_name found nothing for "lighting"
+    assert _index().search("lighting") == ["B004"]
+
+
+def test_words_match_as_prefixes_of_whole_tokens():
+    index = _index()
+    assert index.search("charg") == ["B003", "B002", "B001"]
+    # LIKE '%arger%' matched "Charger"; a word must start a token here
+    assert index.search("arger") == []
+
+
+def test_every_word_must_match():
+    index = _index()
+    assert index.search("usb cable") == ["B002", "B003"]
+    assert index.search("usb lamp") == []
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            check()
+            print(f"ok  {name}")
@@ -0,0 +1,10 @@
+"""
+WSGI entry point for production servers.
+
+    cd backend
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+from api import create_app
+
+app = create_app()
@@ -3,16 +3,19 @@ import React, { useState, useEffect, useRef } from 'react';
 import { X, Send, RotateCcw } from 'lucide-react';
 import { useNavigate } from 'react-router-dom';
 import './chatbot.css';
-import {
-  getTopRatedByCategory,
-  getSentimentByPriceRange,
-  getBestValueProducts,
-  getReviewLengthRating,
-  getSentimentByCategory,
-  getDiscountReviewQuality,
-  getRatingVariance,
-  getSentimentRatingComparison
-} from '../frontend/src/services/api';
+import { getAllAnalytics } from '../frontend/src/services/api';
+
+// Analytical query number -> section of /api/analytics/all
+const ANALYTICS_SECTIONS = [
+  'top-rated-by-category',
+  'sentiment-by-price-range',
+  'best-value-products',
+  'review-length-rating',
+  'sentiment-by-category',
+  'discount-review-quality',
+  'rating-variance',
+  'sentiment-rating-comparison'
+];
 
 // Chatbot Dialog Component
 interface ChatbotDialogProps {
@@ -159,6 +162,8 @@ export function ChatbotStandalone({ currentProduct = null, onSearchProduct }: Ch
   const [message, setMessage] = useState('');
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const messagesContainerRef = useRef<HTMLDivElement>(null);
+  // Every analytics answer comes from one /api/analytics/all request per session
+  const analyticsRef = useRef<Promise<any> | null>(null);
   const [messages, setMessages] = useState(() => {
     const baseTime = Date.now();
     return [
@@ -610,27 +615,20 @@ export function ChatbotStandalone({ currentProduct = null, onSearchProduct }: Ch
   };
 
   const executeAnalyticalQuery = async (queryNum: number): Promise<any> => {
+    const section = ANALYTICS_SECTIONS[queryNum - 1];
+    if (!section) {
+      return [];
+    }
     try {
-      switch(queryNum) {
-        case 1:
-          return await getTopRatedByCategory();
-        case 2:
-          return await getSentimentByPriceRange();
-        case 3:
-          return await getBestValueProducts();
-        case 4:
-          return await getReviewLengthRating();
-        case 5:
-          return await getSentimentByCategory();
-        case 6:
-          return await getDiscountReviewQuality();
-        case 7:
-          return await getRatingVariance();
-        case 8:
-          return await getSentimentRatingComparison();
-        default:
-          return [];
+      if (!analyticsRef.current) {
+        analyticsRef.current = getAllAnalytics().catch((error) => {
+          // Let the next question retry
+          analyticsRef.current = null;
+          throw error;
+        });
       }
+      const analytics = await analyticsRef.current;
+      return analytics[section] || [];
     } catch (error) {
       console.error('Error executing analytical query:', error);
       throw error;
@@ -11,22 +11,97 @@ CREATE TABLE products (
     discount_percentage DECIMAL(5,2),
     about_product TEXT,
     img_link TEXT,
-    product_link TEXT
-);
+    product_link TEXT,
+    -- Fingerprint of the CSV values last loaded, for etl.py --delta
+    content_hash BINARY(16),
+    -- Buckets the analytics routes group by, stored so they can be indexed
+    -- (category is TEXT and SUBSTRING_INDEX() on it can't use an index)
+    top_category VARCHAR(255) GENERATED ALWAYS AS (
+        CASE WHEN category IS NULL OR category = '' THEN NULL
+             ELSE LEFT(SUBSTRING_INDEX(category, '|', 1), 255) END
+    ) STORED,
+    price_range VARCHAR(10) GENERATED ALWAYS AS (
+        CASE WHEN discounted_price_usd IS NULL THEN NULL
+             WHEN discounted_price_usd < 50 THEN '$0-$50'
+             WHEN discounted_price_usd < 150 THEN '$50-$150'
+             WHEN discounted_price_usd < 300 THEN '$150-$300'
+             WHEN discounted_price_usd < 500 THEN '$300-$500'
+             ELSE '$500+' END
+    ) STORED,
+    discount_range VARCHAR(12) GENERATED ALWAYS AS (
+        CASE WHEN discount_percentage IS NULL THEN NULL
+             WHEN discount_percentage < 25 THEN '0-25% off'
+             WHEN discount_percentage < 50 THEN '25-50% off'
+             WHEN discount_percentage < 75 THEN '50-75% off'
+             ELSE '75%+ off' END
+    ) STORED
+) ENGINE=InnoDB;
+CREATE INDEX idx_products_top_category ON products (top_category);
+CREATE INDEX idx_products_price_range ON products (price_range);
+CREATE INDEX idx_products_discount_range ON products (discount_range);
+
 CREATE TABLE users (
     user_id VARCHAR(50) PRIMARY KEY,
     user_name TEXT
-);
+) ENGINE=InnoDB;
 
 CREATE TABLE reviews (
     review_id VARCHAR(50) PRIMARY KEY,
-    product_id VARCHAR(50) REFERENCES products(product_id),
-    user_id VARCHAR(50) REFERENCES users(user_id),
+    product_id VARCHAR(50),
+    user_id VARCHAR(50),
     review_title TEXT,
     review_content TEXT,
     rating DECIMAL(3,2),
     sentiment_score DECIMAL(4,3),
     sentiment_label VARCHAR(10),
     review_length INT,
-    rating_count INT
-);
\ No newline at end of file
+    rating_count INT,
+    content_hash BINARY(16),
+    CONSTRAINT fk_reviews_product FOREIGN KEY (product_id) REFERENCES products (product_id),
+    CONSTRAINT fk_reviews_user FOREIGN KEY (user_id) REFERENCES users (user_id)
+) ENGINE=InnoDB;
+-- Covers the per-product review aggregates (product_stats refresh,
+-- review-length analytics) without reading the row data
+CREATE INDEX idx_reviews_product_rating ON reviews (product_id, rating, sentiment_score, review_length);
+-- Matches the review listing order, for keyset pagination
+CREATE INDEX idx_reviews_product_rating_desc ON reviews (product_id, rating DESC, review_id);
+
+-- Per-product review rollup, maintained by backend/db/etl.py.
+-- Sums instead of averages so rows can be re-aggregated exactly:
+-- "paired" columns cover reviews that have both a rating and a sentiment score.
+CREATE TABLE product_stats (
+    product_id VARCHAR(50) PRIMARY KEY,
+    review_count INT NOT NULL DEFAULT 0,
+    rating_count INT NOT NULL DEFAULT 0,
+    rating_sum DECIMAL(14,2) NOT NULL DEFAULT 0,
+    rating_sum_sq DECIMAL(18,4) NOT NULL DEFAULT 0,
+    rating_min DECIMAL(3,2),
+    rating_max DECIMAL(3,2),
+    sentiment_count INT NOT NULL DEFAULT 0,
+    sentiment_sum DECIMAL(14,3) NOT NULL DEFAULT 0,
+    paired_count INT NOT NULL DEFAULT 0,
+    paired_rating_sum DECIMAL(14,2) NOT NULL DEFAULT 0,
+    paired_sentiment_sum DECIMAL(14,3) NOT NULL DEFAULT 0,
+    CONSTRAINT fk_product_stats_product FOREIGN KEY (product_id)
+        REFERENCES products (product_id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- Bumped by the ETL on every commit; the API uses it to invalidate cached responses.
+CREATE TABLE data_version (
+    id TINYINT PRIMARY KEY,
+    version BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
+INSERT INTO data_version (id, version) VALUES (1, 0);
+
+-- Migrations in backend/db/migrations already contained in this file
+CREATE TABLE schema_migrations (
+    name VARCHAR(255) PRIMARY KEY,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
+INSERT INTO schema_migrations (name) VALUES
+    ('001_product_stats.sql'),
+    ('002_data_version.sql'),
+    ('003_analytics_indexes.sql'),
+    ('004_reviews_keyset_index.sql'),
+    ('005_content_hashes.sql');
@@ -192,3 +192,18 @@ export async function getSentimentRatingComparison() {
   }
 }
 
+// All eight analytics in one request, keyed by route name
+export async function getAllAnalytics(sections?: string[]) {
+  try {
+    const query = sections && sections.length ? `?sections=${sections.join(',')}` : '';
+    const response = await fetch(`${API_BASE_URL}/analytics/all${query}`);
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new Error(errorData.error || `Failed to fetch data: ${response.status}`);
+    }
+    return await response.json();
+  } catch (error) {
+    console.error('Error fetching analytics:', error);
+    throw error;
+  }
+}